@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tagging time of the qubes in a tutorial's scope
+
+Compares tagging qubes by running a qvm-tags process per qube (simulated by
+a Python interpreter making one admin call of LATENCY seconds and waited
+for) with AdminClient, which makes the same calls concurrently through a
+single in-process client, for growing scope sizes.
+
+Usage: python3 benchmarks/bench_admin_calls.py [--latency SECONDS]
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+import qubes_tutorial.admin as admin
+
+SCOPE_SIZES = [1, 2, 4, 8, 16]
+
+
+class SlowTags(set):
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def add(self, tag):
+        time.sleep(self.latency)
+        super().add(tag)
+
+
+class SlowQube:
+
+    def __init__(self, latency):
+        self.tags = SlowTags(latency)
+
+
+class SlowApp:
+    """ qubesadmin.Qubes whose calls take 'latency' seconds """
+
+    def __init__(self, qube_names, latency):
+        self.domains = {name: SlowQube(latency) for name in qube_names}
+
+
+def tag_with_processes(qube_names, latency):
+    for _ in qube_names:
+        subprocess.check_call([sys.executable, "-c",
+                               "import time; time.sleep({})".format(latency)])
+
+def tag_with_client(qube_names, latency):
+    client = admin.AdminClient(SlowApp(qube_names, latency))
+    client.add_tag(qube_names)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='seconds of each admin call')
+    args = parser.parse_args()
+
+    print("qubes  processes  AdminClient")
+    for scope_size in SCOPE_SIZES:
+        qube_names = ["qube-{}".format(n) for n in range(scope_size)]
+        times = []
+        for tag in [tag_with_processes, tag_with_client]:
+            start_time = time.perf_counter()
+            tag(qube_names, args.latency)
+            times.append(time.perf_counter() - start_time)
+        print("{:5} {:9.0f}ms {:10.0f}ms".format(
+            scope_size, times[0] * 1000, times[1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
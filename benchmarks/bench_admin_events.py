@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Qubes Admin event storm filtering
+
+Fires a storm of Qubes Admin events (mostly property changes and events of
+qubes the tutorial doesn't use) through QubesAdminWatcher, subscribed the
+way it is to qubesadmin's EventsDispatcher, and counts the interactions
+forwarded to the tutorial with and without the tutorial's events filter.
+Forwarding an interaction (D-Bus message and queue entry) is replaced by a
+counter.
+
+Usage: python3 benchmarks/bench_admin_events.py [-n EVENTS]
+"""
+import argparse
+import fnmatch
+import logging
+import random
+import time
+from unittest.mock import patch
+
+logging.disable(logging.INFO)
+
+import qubes_tutorial.analysis as analysis
+import qubes_tutorial.interactions as interactions
+import qubes_tutorial.watchers as watchers
+
+SCOPE = ["personal", "work"]
+QUBES = SCOPE + ["dom0", "vault", "untrusted", "sys-net", "sys-usb",
+                 "sys-firewall"]
+EVENTS = ["domain-start", "domain-shutdown", "domain-spawn",
+          "domain-pre-start", "property-set:label", "property-set:netvm",
+          "property-reset:netvm", "domain-feature-set:gui",
+          "domain-tag-add:created-by-dom0", "connection-established"]
+
+# interactions of a typical tutorial
+TUTORIAL_INTERACTIONS = [
+    "qubes-events:work:domain-start",
+    "qubes-events:personal:domain-shutdown",
+    "qubes-qrexec-qubes.Filecopy+:work:personal",
+    "ui-callback:next",
+]
+
+
+class FnmatchDispatcher:
+    """ Dispatches like qubesadmin.events.EventsDispatcher.handle """
+
+    def __init__(self):
+        self.handlers = {}
+
+    def add_handler(self, event, handler):
+        self.handlers.setdefault(event, set()).add(handler)
+
+    def handle(self, subject, event, **kwargs):
+        handlers = [h_func for h_name, h_func_set in self.handlers.items()
+                    for h_func in h_func_set
+                    if fnmatch.fnmatch(event, h_name)]
+        for handler in handlers:
+            handler(subject, event, **kwargs)
+
+
+def generate_events(num_events, seed=0):
+    rng = random.Random(seed)
+    return [(rng.choice(QUBES), rng.choice(EVENTS))
+            for _ in range(num_events)]
+
+
+def bench(watcher, events):
+    dispatcher = FnmatchDispatcher()
+    watcher.add_handlers(dispatcher)
+    with patch.object(watchers.interactions, 'register') as register:
+        start_time = time.perf_counter()
+        for subject, event_name in events:
+            dispatcher.handle(subject, event_name)
+        elapsed = time.perf_counter() - start_time
+    return register.call_count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', type=int, default=200000,
+                        help='number of events')
+    args = parser.parse_args()
+
+    events = generate_events(args.n)
+    index = analysis.TutorialIndex()
+    for interaction in TUTORIAL_INTERACTIONS:
+        index.add_interaction(
+            interactions.Interaction.from_string(interaction))
+    events_filter = index.events_filter
+    for name, watcher in [
+            ("unfiltered", watchers.QubesAdminWatcher(None)),
+            ("scope", watchers.QubesAdminWatcher(SCOPE)),
+            ("tutorial", watchers.QubesAdminWatcher(SCOPE, events_filter))]:
+        forwarded, elapsed = bench(watcher, events)
+        print(f"{name:10} {forwarded / elapsed:10.0f} interactions/s "
+              f"forwarded ({forwarded} of {len(events)} events, "
+              f"{len(events) / elapsed:.0f} events/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Controller loop benchmark
+
+Measures, for the tutorial controller main loop:
+  - idle wakeups per second (calls to process_interactions with nothing to do)
+  - latency between an interaction being registered and the next step's UI
+    being set up
+
+Needs a D-Bus session bus (the tutorial registers its interactions listener).
+The UI and extensions are not needed: the calls of each step transition go
+to in-process stand-ins, which reply at once and timestamp the UI setup.
+
+Usage: python3 benchmarks/bench_controller_loop.py [--idle SECONDS] [-n N]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from gi.repository import GLib
+
+import qubes_tutorial.tutorial as tutorial
+
+
+class TimestampComponents:
+    """
+    Replies to every call at once, recording when a step's UI is set up
+    (see tutorial.DBusComponents)
+    """
+
+    def __init__(self):
+        self.setup_times = []
+
+    def get_method(self, component_name, function_name):
+        def method(*args, reply_handler=None, error_handler=None,
+                   timeout=None):
+            if function_name in ('setup_ui', 'transition_ui'):
+                self.setup_times.append(time.perf_counter())
+            if reply_handler:
+                reply_handler()
+        return method
+
+
+def build_linear_tutorial(num_steps):
+    tut = tutorial.Tutorial(components=TimestampComponents())
+    previous_step = None
+    for step_n in range(num_steps):
+        step = tutorial.Step("start" if step_n == 0 else f"step-{step_n}")
+        tut.add_step(step)
+        if previous_step:
+            tut.add_transition(previous_step, "bench:next", step)
+        previous_step = step
+    tut.current_step = tut.get_first_step()
+    return tut
+
+
+def count_calls(tut):
+    counter = {"calls": 0}
+    process_interactions = tut.process_interactions
+
+    def counting_process_interactions():
+        counter["calls"] += 1
+        process_interactions()
+
+    tut.process_interactions = counting_process_interactions
+    return counter
+
+
+def bench_idle(tut, duration):
+    counter = count_calls(tut)
+    cpu_start = time.process_time()
+    GLib.timeout_add(int(duration * 1000), tut.main_loop.quit)
+    tut.main_loop.run()
+    cpu = time.process_time() - cpu_start
+    return counter["calls"] / duration, cpu / duration
+
+
+def bench_latency(tut, num_interactions):
+    setup_times = tut.components.setup_times
+    del setup_times[:]
+    sent_times = []
+
+    def producer():
+        for _ in range(num_interactions):
+            time.sleep(0.005)
+            sent_times.append(time.perf_counter())
+            tut.interactions_listener.register_interaction(
+                "bench:next", "", "")
+        time.sleep(0.05)
+        GLib.idle_add(tut.main_loop.quit)
+
+    tut.listen_for_interactions()
+    threading.Thread(target=producer, daemon=True).start()
+    tut.main_loop.run()
+    return [(setup - sent) * 1000
+            for sent, setup in zip(sent_times, setup_times)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--idle', type=float, default=5.0,
+                        help='seconds to measure the idle loop for')
+    parser.add_argument('-n', type=int, default=200,
+                        help='number of interactions for the latency test')
+    args = parser.parse_args()
+
+    tut = build_linear_tutorial(args.n + 2)
+    wakeups, cpu = bench_idle(tut, args.idle)
+    print(f"idle wakeups/s: {wakeups:.2f}")
+    print(f"idle CPU usage: {cpu * 100:.3f}%")
+
+    latencies = bench_latency(tut, args.n)
+    print("interaction -> step UI setup latency (ms): "
+          f"median {statistics.median(latencies):.3f} "
+          f"max {max(latencies):.3f}")
+
+
+if __name__ == '__main__':
+    main()
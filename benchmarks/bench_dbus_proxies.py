@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+D-Bus proxy round trips per step transition
+
+Counts the proxy objects created (each one an introspection round trip to
+the remote process) during a simulated series of step transitions, with and
+without the shared proxy cache. Uses a counting stand-in for the session bus
+so no D-Bus daemon, UI or extension has to be running.
+
+Usage: python3 benchmarks/bench_dbus_proxies.py [-n TRANSITIONS] [-e ITEMS]
+"""
+import argparse
+
+import qubes_tutorial.extensions as extensions
+import qubes_tutorial.proxies as proxies
+
+
+class CountingBus:
+
+    def __init__(self):
+        self.get_object_calls = 0
+
+    def get_object(self, bus_name, object_path, introspect=True):
+        self.get_object_calls += 1
+        return CountingProxy()
+
+    def watch_name_owner(self, bus_name, callback):
+        pass
+
+
+class CountingProxy:
+
+    def get_dbus_method(self, method_name, interface):
+        return lambda *args, **kwargs: None
+
+
+def transition_calls(num_items):
+    """ D-Bus calls made by one step transition """
+    ui = ('org.qubes.tutorial.ui', '/', 'org.qubes.tutorial.ui')
+    calls = [ui + ('transition_ui',)]
+    for item_n in range(num_items):
+        bus_name = extensions._get_bus_name_from_component_name(
+            f"component{item_n % 2}")
+        calls.append((bus_name, extensions.EXT_OBJ_PATH,
+                      extensions.EXT_INTERFACE_NAME, f"do_item{item_n}"))
+    return calls
+
+
+def run_uncached(bus, calls, num_transitions):
+    for _ in range(num_transitions):
+        for bus_name, object_path, interface, method_name in calls:
+            bus.get_object(bus_name, object_path)\
+               .get_dbus_method(method_name, interface)()
+
+
+def run_cached(cache, calls, num_transitions):
+    for _ in range(num_transitions):
+        for bus_name, object_path, interface, method_name in calls:
+            cache.get_method(bus_name, object_path, interface, method_name)()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', type=int, default=1000,
+                        help='number of step transitions')
+    parser.add_argument('-e', type=int, default=3,
+                        help='setup/teardown items per step')
+    args = parser.parse_args()
+    calls = transition_calls(args.e)
+
+    bus = CountingBus()
+    run_uncached(bus, calls, args.n)
+    print("before: {:.4f} proxy round trips/transition".format(
+        bus.get_object_calls / args.n))
+
+    bus = CountingBus()
+    run_cached(proxies.ProxyCache(bus), calls, args.n)
+    print("after:  {:.4f} proxy round trips/transition".format(
+        bus.get_object_calls / args.n))
+
+
+if __name__ == '__main__':
+    main()
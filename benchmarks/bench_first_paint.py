@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+First-paint latency of modal steps, with and without preloading
+
+Shows a series of modal steps (each with its own template) in the tutorial
+UI's ModalWindow and measures, per step, the time from the setup_ui request
+to the modal being drawn. This is done once with cold templates (built
+when shown, as before) and once after preloading them like the UI does
+when it receives the tutorial's preload manifest.
+
+Needs a display (e.g. run it in dom0 or under Xvfb). Templates are taken
+from a tutorial directory or generated.
+
+Usage: python3 benchmarks/bench_first_paint.py [--dir PATH] [-n STEPS]
+"""
+import argparse
+import glob
+import logging
+import os
+import tempfile
+import time
+
+logging.disable(logging.INFO)
+
+from gi.repository import GLib
+
+import qubes_tutorial.gui.app as app
+
+TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<interface>
+  <requires lib="gtk+" version="3.24"/>
+  <object class="GtkBox" id="custom_modal">
+    <property name="visible">True</property>
+    <property name="orientation">vertical</property>
+    {}
+  </object>
+</interface>
+"""
+
+LABEL = """<child>
+      <object class="GtkLabel">
+        <property name="visible">True</property>
+        <property name="label">Paragraph {} of step {}</property>
+        <property name="wrap">True</property>
+      </object>
+    </child>"""
+
+
+def generate_templates(directory, num_steps, num_labels=30):
+    paths = []
+    for step_n in range(num_steps):
+        path = os.path.join(directory, "step_{}.ui".format(step_n))
+        with open(path, 'w') as f:
+            f.write(TEMPLATE.format("\n    ".join(
+                LABEL.format(n, step_n) for n in range(num_labels))))
+        paths.append(path)
+    return paths
+
+
+def show_steps(modal, template_paths):
+    context = GLib.MainContext.default()
+    for path in template_paths:
+        modal.update(path, "Title", "Next", lambda: None,
+                     requested_time=time.perf_counter())
+        while modal.paint_pending is not None:
+            context.iteration(True)
+    latencies = [modal.first_paint_latencies[path][-1]
+                 for path in template_paths]
+    modal.hide()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--dir', type=str, metavar="PATH",
+                        help='tutorial directory with .ui templates')
+    parser.add_argument('-n', type=int, default=10,
+                        help='number of steps to generate (without --dir)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.dir:
+            template_paths = sorted(glob.glob(os.path.join(args.dir, "*.ui")))
+        else:
+            template_paths = generate_templates(directory, args.n)
+
+        cold = show_steps(app.ModalWindow(), template_paths)
+
+        modal = app.ModalWindow()
+        for path in template_paths[:modal.templates.max_size]:
+            modal.templates.get(path)
+        preloaded = show_steps(modal, template_paths)
+
+    print("step                cold  preloaded")
+    for path, cold_latency, preloaded_latency in zip(template_paths, cold,
+                                                     preloaded):
+        print("{:15} {:6.1f} ms {:6.1f} ms".format(
+            os.path.basename(path), cold_latency * 1000,
+            preloaded_latency * 1000))
+    print("{:15} {:6.1f} ms {:6.1f} ms".format(
+        "mean", sum(cold) / len(cold) * 1000,
+        sum(preloaded) / len(preloaded) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Memory per step of the step graph backends
+
+Builds the same generated tutorial (each step going forward on
+'tutorial:next' and back on 'tutorial:back') with Tutorial and
+CompactTutorial, and reports the memory used per step as measured by
+tracemalloc. Steps have no UI/setup data so only the graph is measured.
+
+Usage: python3 benchmarks/bench_graph_memory.py [-n STEPS]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import qubes_tutorial.graph as graph
+import qubes_tutorial.tutorial as tutorial
+
+
+def build(tutorial_class, num_steps):
+    tut = tutorial_class()
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+
+    names = ["start"] + [f"step-{n}" for n in range(1, num_steps - 1)] \
+        + ["end"]
+    for name in names:
+        tut.add_step(tut.create_step(name))
+    for previous_name, name in zip(names, names[1:]):
+        previous_step = tut.get_step(previous_name)
+        step = tut.get_step(name)
+        tut.add_transition(previous_step, "tutorial:next", step)
+        tut.add_transition(step, "tutorial:back", previous_step)
+
+    build_time = time.perf_counter() - start_time
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tut, memory, build_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', type=int, default=10000,
+                        help='number of steps in the tutorial')
+    args = parser.parse_args()
+
+    for tutorial_class in (tutorial.Tutorial, graph.CompactTutorial):
+        tut, memory, build_time = build(tutorial_class, args.n)
+        print("{:16} {:7.1f} bytes/step  (built in {:.3f} s)".format(
+            tutorial_class.__name__, memory / args.n, build_time))
+
+
+if __name__ == '__main__':
+    main()
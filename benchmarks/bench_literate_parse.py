@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Literate tutorial parsing: previous loader vs streaming libyaml loader
+
+Parses a synthetic literate tutorial (10k steps by default) with the
+previous approach (whole-file extraction by string concatenation, then
+yaml.safe_load) and with bundle.read_steps_data (steps streamed one by one
+and parsed with yaml.CSafeLoader when available).
+
+Usage: python3 benchmarks/bench_literate_parse.py [-n STEPS]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import yaml
+
+import qubes_tutorial.bundle as bundle
+from bench_tutorial_load import generate_literate_tutorial
+
+
+def previous_read_steps_data(file_path):
+    yaml_text = ""
+    with open(file_path, 'r') as f:
+        md_text = f.readlines()
+
+    in_yaml_block = False
+    for md_line in md_text:
+        if "```yaml" in md_line:
+            in_yaml_block = True
+        elif in_yaml_block:
+            if md_line == "```\n":
+                in_yaml_block = False
+            else:
+                if md_line.startswith('name:'):
+                    yaml_text += "- " + md_line
+                else:
+                    yaml_text += "  " + md_line
+
+    return yaml.safe_load(yaml_text)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', type=int, default=10000,
+                        help='number of steps in the tutorial')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tutorial_path = os.path.join(tmp_dir, "README.md")
+        with open(tutorial_path, 'w') as f:
+            f.write(generate_literate_tutorial(args.n))
+
+        previous, previous_time = timed(previous_read_steps_data,
+                                        tutorial_path)
+        current, current_time = timed(bundle.read_steps_data, tutorial_path)
+
+    assert previous == current
+    print(f"{args.n} steps, loader: {bundle.YamlLoader.__name__}")
+    print(f"previous: {previous_time:8.3f} s")
+    print(f"current:  {current_time:8.3f} s "
+          f"({previous_time / current_time:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Qrexec policy log parsing throughput
+
+Runs QrexecWatcher.generate_interaction over a corpus of journal lines of
+qubes-qrexec-policy-daemon, compared with the previous implementation
+(unanchored regex search on every line, each line logged at INFO, list
+scope). Registering interactions is replaced by a counter.
+
+The corpus is either captured from a running system, e.g.
+  journalctl -u qubes-qrexec-policy-daemon -o cat > qrexec.log
+or generated (mostly lines that are not about qrexec calls).
+
+Usage: python3 benchmarks/bench_qrexec_parse.py [--corpus FILE] [-n LINES]
+"""
+import argparse
+import logging
+import random
+import re
+import time
+from unittest.mock import Mock, patch
+
+import qubes_tutorial.watchers as watchers
+
+SCOPE = ["personal", "work"]
+QUBES = SCOPE + ["vault", "untrusted", "sys-net", "sys-usb"]
+
+
+def generate_corpus(num_lines, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(num_lines):
+        kind = rng.random()
+        source, target = rng.sample(QUBES, 2)
+        if kind < 0.05:
+            lines.append(f"qrexec: qubes.Filecopy+: {source} -> @default: "
+                         f"allowed to {target}")
+        elif kind < 0.10:
+            lines.append(f"qrexec: qubes.OpenURL+: {source} -> {target}: "
+                         "denied: policy")
+        elif kind < 0.55:
+            lines.append(f"got request for qubes.GetDate from {source}")
+        else:
+            lines.append(f"execute qubes.WindowIconUpdater+ {source} "
+                         f"dom0 {rng.random()}")
+    return lines
+
+
+class PreviousQrexecWatcher:
+    """ QrexecWatcher.generate_interaction before the fast path """
+
+    def __init__(self, scope):
+        self.scope = scope
+        vm_name_re = "[a-zA-Z][a-zA-Z0-9_\\-]*"
+        policy_re = "[\\.a-zA-Z0-9_\\-]+\\+[\\.a-zA-Z0-9_\\-]*"
+        qrexec_success_re = "allowed to (?P<target>{})".format(vm_name_re)
+        qrexec_fail_re = "(?P<fail_reason>.*)"
+        self.qrexec_re = re.compile(
+            "qrexec: (?P<policy>{}): (?P<source>{}) -> [@]?{}: ({}|{})"
+            .format(policy_re, vm_name_re, vm_name_re, qrexec_success_re,
+                    qrexec_fail_re))
+
+    def generate_interaction(self, line):
+        logging.info(line)
+        try:
+            action = self.qrexec_re.search(line)
+            untrusted_policy = action.group("policy")
+            untrusted_source = action.group("source")
+            untrusted_target = action.group("target")
+            fail_reason = action.group("fail_reason")
+        except:
+            return
+        if untrusted_source in self.scope:
+            if not fail_reason:
+                watchers.interactions.register_interaction(
+                    watchers.interactions.QrexecPolicyInteraction(
+                        True, untrusted_policy, untrusted_source,
+                        untrusted_target))
+
+
+def bench(watcher, lines):
+    start_time = time.perf_counter()
+    for line in lines:
+        watcher.generate_interaction(line)
+    return len(lines) / (time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--corpus', type=str, metavar="FILE",
+                        help='captured log lines (one per line)')
+    parser.add_argument('-n', type=int, default=1000000,
+                        help='number of lines to generate (without --corpus)')
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, 'r') as f:
+            lines = f.read().splitlines()
+    else:
+        lines = generate_corpus(args.n)
+
+    # like in the tutorial, INFO logs are emitted (to a discarding handler)
+    logging.getLogger().handlers = [logging.NullHandler()]
+    logging.getLogger().setLevel(logging.INFO)
+
+    with patch.object(watchers.systemd.journal, 'Reader', Mock(),
+                      create=True):
+        watcher = watchers.QrexecWatcher(SCOPE)
+
+    for name, implementation in [("previous", PreviousQrexecWatcher(SCOPE)),
+                                 ("fast path", watcher)]:
+        with patch.object(watchers.interactions,
+                          'register_interaction') as register_interaction:
+            lines_per_second = bench(implementation, lines)
+        print(f"{name:10} {lines_per_second:12.0f} lines/s "
+              f"({register_interaction.call_count} interactions)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Headless replay throughput
+
+Generates a tutorial of consecutive choices between two steps (each with UI,
+an extension call and a dom0 command) and replays its interaction sequences
+with simulation.HeadlessTutorial, in this process and across a process pool.
+No D-Bus, UI or Qubes OS is needed.
+
+Usage: python3 benchmarks/bench_simulation.py [-n CHOICES] [-j PROCESSES]
+"""
+import argparse
+import logging
+import os
+import time
+
+import qubes_tutorial.simulation as simulation
+
+
+def generate_steps_data(num_choices):
+    steps_data = []
+    previous_names = ["start"]
+    for choice_n in range(num_choices + 1):
+        if choice_n < num_choices:
+            names = [f"left-{choice_n}", f"right-{choice_n}"]
+        else:
+            names = ["end"]
+        for previous_name in previous_names:
+            steps_data.append({
+                "name": previous_name,
+                "ui": [{"type": "modal", "text": previous_name}],
+                "setup": [{"component": "qui-domains",
+                           "function": "highlight",
+                           "parameters": {"qube": "work"}},
+                          {"component": "dom0", "function": "true"}],
+                "transitions": [{"interaction": f"choose:{name}",
+                                 "step": name} for name in names],
+            })
+        previous_names = names
+    return steps_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', type=int, default=12,
+                        help='number of choices (2^n sequences)')
+    parser.add_argument('-j', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    args = parser.parse_args()
+    # per-interaction logging would dominate the measurements
+    logging.disable(logging.INFO)
+
+    steps_data = generate_steps_data(args.n)
+    tut = simulation.load_headless_tutorial(steps_data)
+    sequences = list(tut.generate_successful_interaction_sequences())
+    print(f"{len(steps_data)} steps, {len(sequences)} sequences")
+
+    start_time = time.perf_counter()
+    results = [tut.replay(sequence) for sequence in sequences]
+    elapsed = time.perf_counter() - start_time
+    assert all(result.completed for result in results)
+    print(f"1 process: {len(sequences) / elapsed:.0f} replays/s")
+
+    start_time = time.perf_counter()
+    results = simulation.replay_sequences(steps_data, sequences, args.j)
+    elapsed = time.perf_counter() - start_time
+    assert all(result.completed for result in results)
+    print(f"{args.j} processes: {len(sequences) / elapsed:.0f} replays/s")
+
+    covering = list(tut.generate_successful_interaction_sequences(
+        covering=True))
+    print(f"covering set: {len(covering)} sequences")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tutorial load time: source parsing vs compiled bundle
+
+Generates a synthetic literate (markdown + YAML) tutorial and measures how
+long it takes to get its list of steps by parsing the source and by loading
+the compiled bundle from the cache.
+
+Usage: python3 benchmarks/bench_tutorial_load.py [-n STEPS] [-r REPEAT]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import qubes_tutorial.bundle as bundle
+
+
+def generate_literate_tutorial(num_steps):
+    text = "# Synthetic tutorial\n\n"
+    for step_n in range(num_steps):
+        name = "start" if step_n == 0 else f"step-{step_n}"
+        next_name = "end" if step_n == num_steps - 1 else f"step-{step_n + 1}"
+        text += f"""\
+## Step {step_n}
+
+Some explanation of what happens in this step.
+
+```yaml
+name: {name}
+ui:
+  - type: step_information
+    title: "Step {step_n}"
+    text: "Do the thing number {step_n}"
+    has_ok_btn: "True"
+setup:
+  - component: qui-domains
+    function: do_highlight_domain
+    parameters:
+      domain: work
+transitions:
+  - interaction: tutorial:next
+    step: {next_name}
+  - interaction: qubes-events:work:domain-start
+    step: {next_name}
+```
+
+"""
+    return text
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', type=int, default=1000,
+                        help='number of steps in the tutorial')
+    parser.add_argument('-r', type=int, default=5,
+                        help='repetitions (best time is reported)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["XDG_CACHE_HOME"] = tmp_dir
+        tutorial_path = os.path.join(tmp_dir, "README.md")
+        with open(tutorial_path, 'w') as f:
+            f.write(generate_literate_tutorial(args.n))
+
+        parse_time = best_time(
+            lambda: bundle.read_steps_data(tutorial_path), args.r)
+        bundle.load_cached(tutorial_path) # compile into the cache
+        cached_time = best_time(
+            lambda: bundle.load_cached(tutorial_path), args.r)
+
+    print(f"{args.n} steps")
+    print(f"parse source:    {parse_time * 1000:9.2f} ms")
+    print(f"compiled bundle: {cached_time * 1000:9.2f} ms "
+          f"({parse_time / cached_time:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+# admin calls made at once (each one is a separate request to qubesd)
+MAX_CONCURRENT_CALLS = 8
+
+# tag of the qubes taking part in a running tutorial
+TUTORIAL_TAG = "tutorial"
+
+class AdminClient:
+    """
+    Changes qubes through a single in-process qubesadmin client
+
+    Replaces running a qvm-* tool per qube: there is no interpreter start-up
+    nor new Admin API client per call, the list of qubes is fetched once
+    and the calls for several qubes are made concurrently.
+
+    The qubesadmin app (and its cache of qubes) isn't thread-safe: qubes are
+    looked up one at a time, and only the calls to qubesd made by the
+    operation on each qube run concurrently.
+    """
+
+    def __init__(self, app=None, max_concurrent_calls=MAX_CONCURRENT_CALLS):
+        """
+        :param app: qubesadmin.Qubes (created on first use by default)
+        """
+        self._app = app
+        self.max_concurrent_calls = max_concurrent_calls
+        self.lock = threading.Lock()
+
+    @property
+    def app(self):
+        with self.lock:
+            if self._app is None:
+                import qubesadmin
+                self._app = qubesadmin.Qubes()
+            return self._app
+
+    def run_on_qubes(self, qube_names, operation):
+        """
+        Runs operation(qube) on several qubes concurrently and waits for
+        all of them to complete
+
+        :param operation: function taking a qubesadmin qube
+        :return: map of qube name -> error, for each qube where it failed
+        """
+        qube_names = list(qube_names)
+        if not qube_names:
+            return {}
+        app = self.app
+
+        qubes = {}
+        failures = {}
+        with self.lock:
+            for qube_name in qube_names:
+                try:
+                    qubes[qube_name] = app.domains[qube_name]
+                except KeyError as error:
+                    failures[qube_name] = error
+        if not qubes:
+            return failures
+
+        num_workers = min(self.max_concurrent_calls, len(qubes))
+        with ThreadPoolExecutor(num_workers) as executor:
+            futures = [(qube_name, executor.submit(operation, qube))
+                       for qube_name, qube in qubes.items()]
+            for qube_name, future in futures:
+                error = future.exception()
+                if error is not None:
+                    failures[qube_name] = error
+        return failures
+
+    def add_tag(self, qube_names, tag=TUTORIAL_TAG):
+        return self._log_failures(
+            "add tag '{}' to".format(tag),
+            self.run_on_qubes(qube_names, lambda qube: qube.tags.add(tag)))
+
+    def remove_tag(self, qube_names, tag=TUTORIAL_TAG):
+        return self._log_failures(
+            "remove tag '{}' from".format(tag),
+            self.run_on_qubes(qube_names,
+                              lambda qube: qube.tags.discard(tag)))
+
+    def set_property(self, qube_names, name, value):
+        return self._log_failures(
+            "set {} to {} for".format(name, value),
+            self.run_on_qubes(qube_names,
+                              lambda qube: setattr(qube, name, value)))
+
+    @staticmethod
+    def _log_failures(action, failures):
+        for qube_name, error in failures.items():
+            logging.error("failed to {} qube {}: {!r}".format(
+                action, qube_name, error))
+        return failures
+
+
+admin_client = AdminClient()
@@ -0,0 +1,171 @@
+import qubes_tutorial.interactions as interactions
+
+WILDCARD = "*" # matches one or more segments (see InteractionPrefixMap)
+SEPARATOR = interactions.SEPARATOR
+
+QUBES_EVENTS = "qubes-events"
+QREXEC_PREFIX = interactions.QREXEC_PREFIX
+QREXEC_DENIED_PREFIX = interactions.QREXEC_DENIED_PREFIX
+
+# parameters of setup and teardown items that name a qube
+QUBE_PARAMETERS = ("qube", "qube_name", "vm", "vm_name")
+
+# key of UI items that name a template file of the tutorial
+UI_TEMPLATE = "template"
+
+class QubesEventsFilter:
+    """
+    Qubes Admin events (as 'qubes-events:SUBJECT:EVENT' interactions) that
+    a tutorial can transition on
+
+    Wildcards match like transitions do (see tutorial.InteractionPrefixMap):
+    'qubes-events:*' matches any event, 'qubes-events:SUBJECT:*' any event
+    of the subject and 'qubes-events:SUBJECT:EVENT:*' any event
+    'EVENT:DETAIL' of the subject (e.g. 'property-set:netvm' for
+    'property-set:*').
+    """
+
+    def __init__(self):
+        self.all_events = False # a 'qubes-events:*' or '*' wildcard
+        self.subjects = {} # map: event name -> subjects
+        self.any_event_subjects = set() # from 'qubes-events:SUBJECT:*'
+        self.event_prefixes = {} # map: 'EVENT:' -> subjects (see above)
+
+    def add(self, subject: str, event_name: str):
+        """ Adds the events of a 'qubes-events:SUBJECT:EVENT' transition """
+        if subject == WILDCARD and not event_name:
+            self.all_events = True
+        elif not subject or not event_name:
+            return # e.g. 'qubes-events:work', which no event matches
+        elif event_name == WILDCARD:
+            self.any_event_subjects.add(subject)
+        elif event_name.endswith(SEPARATOR + WILDCARD):
+            prefix = event_name[:-len(WILDCARD)]
+            self.event_prefixes.setdefault(prefix, set()).add(subject)
+        else:
+            self.subjects.setdefault(event_name, set()).add(subject)
+
+    def get_event_names(self):
+        """
+        Returns the names of the events to subscribe to (None for all), as
+        patterns of qubesadmin's EventsDispatcher (e.g. 'property-set:*')
+        """
+        if self.all_events or self.any_event_subjects:
+            return None
+        return set(self.subjects.keys()) | {
+            prefix + WILDCARD for prefix in self.event_prefixes}
+
+    def accepts(self, subject: str, event_name: str):
+        if self.all_events or subject in self.any_event_subjects:
+            return True
+        if subject in self.subjects.get(event_name, ()):
+            return True
+        for prefix, subjects in self.event_prefixes.items():
+            if event_name.startswith(prefix) and subject in subjects:
+                return True
+        return False
+
+    def __repr__(self):
+        return "QubesEventsFilter(event_names={!r})".format(
+            self.get_event_names())
+
+class TutorialIndex:
+    """
+    What a tutorial touches in the system, computed once it is loaded
+
+    Used to only tag and watch the qubes that play a part in the tutorial,
+    only subscribe to the events and qrexec policies it transitions on,
+    only enable the extensions it calls and to preload the templates its UI
+    shows.
+    """
+
+    def __init__(self):
+        self.qubes = set()
+        self.all_qubes = False # some transition matches any qube
+        self.qrexec_policies = set() # None if any policy can transition
+        self.events_filter = QubesEventsFilter()
+        self.extensions = set()
+        self.interactions = set() # of all transitions
+        self.num_tasks = 0
+        self.templates = [] # UI templates, in order of first use
+
+    def get_scope(self):
+        """
+        Returns the qubes the tutorial names, sorted
+        """
+        return sorted(self.qubes)
+
+    def get_watched_qubes(self):
+        """
+        Returns the qubes whose interactions are watched (None for all)
+        """
+        if self.all_qubes:
+            return None
+        return self.get_scope()
+
+    def add_interaction(self, interaction):
+        self.interactions.add(interaction)
+        if interaction.string == WILDCARD:
+            self.all_qubes = True
+            self.qrexec_policies = None
+            self.events_filter.all_events = True
+        elif interaction.name == QUBES_EVENTS:
+            self._add_qube(interaction.subject)
+            self.events_filter.add(interaction.subject, interaction.arguments)
+        elif interaction.name.startswith(QREXEC_PREFIX):
+            if interaction.name.startswith(QREXEC_DENIED_PREFIX):
+                policy = interaction.name[len(QREXEC_DENIED_PREFIX):]
+            else:
+                policy = interaction.name[len(QREXEC_PREFIX):]
+            if self.qrexec_policies is not None:
+                self.qrexec_policies.add(policy)
+            self._add_qube(interaction.subject)
+            self._add_qube(interaction.arguments)
+
+    def add_items(self, items):
+        """ Indexes the setup or teardown items of a step """
+        for item in items or ():
+            for name in QUBE_PARAMETERS:
+                qube = (item.get('parameters') or {}).get(name)
+                if qube:
+                    self._add_qube(str(qube))
+
+    def add_ui_items(self, ui_items):
+        """ Indexes the UI items of a step """
+        for ui_item in ui_items or ():
+            template = ui_item.get(UI_TEMPLATE)
+            if template and template not in self.templates:
+                self.templates.append(template)
+
+    def _add_qube(self, qube: str):
+        if qube == WILDCARD:
+            self.all_qubes = True
+        # an empty subject or target names no qube (e.g. a qrexec call
+        # without a target only constrains its source)
+        elif qube and not qube.startswith("@"): # e.g. @default, @dispvm
+            self.qubes.add(qube)
+
+    def __repr__(self):
+        return ("TutorialIndex(qubes={!r}, qrexec_policies={!r}, "
+                "events_filter={!r}, extensions={!r})").format(
+                    self.qubes, self.qrexec_policies, self.events_filter,
+                    self.extensions)
+
+def analyze(tutorial) -> TutorialIndex:
+    """
+    Walks every step's setup, teardown, UI and transitions once
+    """
+    index = TutorialIndex()
+    for step in tutorial.get_steps():
+        for interaction in step.get_possible_interactions():
+            if isinstance(interaction, str):
+                interaction = interactions.Interaction.from_string(
+                    interaction)
+            index.add_interaction(interaction)
+        index.add_items(step.setup_dicts)
+        index.add_items(step.teardown_dicts)
+        index.add_ui_items(step.ui_dict)
+        index.extensions.update(step.get_extensions())
+        if step.is_new_task():
+            index.num_tasks += 1
+    return index
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import logging
+import os
+import yaml
+
+BUNDLE_FORMAT = "qubes-tutorial-bundle"
+BUNDLE_VERSION = 2
+BUNDLE_EXTENSION = ".json"
+
+# libyaml's loader is considerably faster than the pure-python one
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def parse_yaml(yaml_text):
+    return yaml.load(yaml_text, Loader=YamlLoader)
+
+def read_steps_data(file_path):
+    """
+    Parses a tutorial's source (.yaml or literate .md) into a list of steps
+    """
+    if file_path.endswith("yaml") or file_path.endswith("yml"):
+        with open(file_path, 'r') as f:
+            return parse_steps(file_path, f)
+    elif file_path.endswith("md"):
+        with open(file_path, 'r') as f:
+            return [parse_step(file_path, line_n, step_text)
+                    for line_n, step_text in iter_literate_yaml_steps(f)]
+    else:
+        raise Exception("File not found: {}".format(file_path))
+
+def iter_literate_yaml_steps(md_lines):
+    """
+    Yields the YAML of each step of a literate markdown-yaml tutorial as
+    (line number, text), as soon as the step has been read
+
+    Each ```yaml block holds one step (or several, each starting at a line
+    with 'name:').
+    """
+    step_lines = []
+    step_line_n = 0
+    in_yaml_block = False
+    for line_n, md_line in enumerate(md_lines, start=1):
+        if not in_yaml_block:
+            if "```yaml" in md_line:
+                in_yaml_block = True
+        elif md_line.rstrip() == "```":
+            in_yaml_block = False
+            if step_lines:
+                yield step_line_n, "".join(step_lines)
+                step_lines = []
+        else:
+            if md_line.startswith('name:') and step_lines:
+                yield step_line_n, "".join(step_lines)
+                step_lines = []
+            if not step_lines:
+                step_line_n = line_n
+            step_lines.append(md_line)
+
+    if step_lines:
+        yield step_line_n, "".join(step_lines)
+
+def parse_steps(file_path, yaml_text):
+    """
+    Parses the YAML of a whole tutorial (a list of steps)
+    """
+    try:
+        steps_data = parse_yaml(yaml_text)
+    except yaml.YAMLError as error:
+        raise TutorialFormatException(file_path, 1, str(error))
+    if not isinstance(steps_data, list):
+        raise TutorialFormatException(file_path, 1,
+                                      "expected a list of steps")
+    for step_data in steps_data:
+        validate_step_data(file_path, 1, step_data)
+    return steps_data
+
+def parse_step(file_path, line_n, step_text):
+    try:
+        step_data = parse_yaml(step_text)
+    except yaml.YAMLError as error:
+        raise TutorialFormatException(file_path, line_n, str(error))
+    validate_step_data(file_path, line_n, step_data)
+    return step_data
+
+def validate_step_data(file_path, line_n, step_data):
+    if not isinstance(step_data, dict):
+        raise TutorialFormatException(file_path, line_n,
+                                      "a step must be a mapping")
+    if 'name' not in step_data:
+        raise TutorialFormatException(file_path, line_n, "step has no name")
+    if not isinstance(step_data.get('transitions'), list):
+        raise TutorialFormatException(
+            file_path, line_n,
+            "step '{}' has no list of transitions".format(step_data['name']))
+    for transition in step_data['transitions']:
+        if not isinstance(transition, dict) \
+                or not isinstance(transition.get('interaction'), str) \
+                or not isinstance(transition.get('step'), str):
+            raise TutorialFormatException(
+                file_path, line_n,
+                "step '{}' has a transition without an interaction and a "
+                "step name: {!r}".format(step_data['name'], transition))
+
+def get_templates(steps_data):
+    """
+    Returns the UI templates referenced by the steps (relative paths)
+    """
+    templates = set()
+    for step_data in steps_data:
+        for ui_item in step_data.get('ui') or []:
+            if 'template' in ui_item:
+                templates.add(ui_item['template'])
+    return sorted(templates)
+
+def hash_source(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def hash_templates(tutorial_dir, templates):
+    """
+    Hashes the paths and contents of the UI templates of a tutorial (a
+    template that doesn't exist is hashed as missing)
+    """
+    templates_hash = hashlib.sha256()
+    for template in templates:
+        templates_hash.update(template.encode() + b"\0")
+        try:
+            with open(os.path.join(tutorial_dir, template), 'rb') as f:
+                templates_hash.update(hashlib.sha256(f.read()).digest())
+        except OSError:
+            templates_hash.update(b"missing")
+    return templates_hash.hexdigest()
+
+def compile_tutorial(file_path, source_hash=None):
+    """
+    Compiles a tutorial source into a bundle (a dict ready to be saved)
+    """
+    steps_data = read_steps_data(file_path)
+    templates = get_templates(steps_data)
+
+    tutorial_dir = os.path.dirname(file_path)
+    for template in templates:
+        if not os.path.exists(os.path.join(tutorial_dir, template)):
+            logging.warning(f"template '{template}' not found")
+
+    return {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "source_hash": source_hash or hash_source(file_path),
+        "templates": templates,
+        "templates_hash": hash_templates(tutorial_dir, templates),
+        "steps": steps_data,
+    }
+
+def save_bundle(bundle, bundle_path):
+    os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+    # write to a temporary file first so that concurrent readers never
+    # see a partially written bundle
+    tmp_path = "{}.{}.tmp".format(bundle_path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(bundle, f, separators=(',', ':'))
+    os.replace(tmp_path, bundle_path)
+
+def load_bundle(bundle_path, source_hash=None):
+    """
+    Loads a compiled bundle
+
+    Returns None if the bundle can't be read, is from another bundle format
+    version or (when source_hash is given) was compiled from another source.
+    """
+    try:
+        with open(bundle_path, 'r') as f:
+            bundle = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(bundle, dict) \
+            or bundle.get("format") != BUNDLE_FORMAT \
+            or bundle.get("version") != BUNDLE_VERSION:
+        return None
+    if source_hash is not None and bundle.get("source_hash") != source_hash:
+        return None
+    return bundle
+
+def get_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") \
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "qubes-tutorial")
+
+def get_cache_path(source_hash):
+    return os.path.join(get_cache_dir(),
+                        "{}-v{}{}".format(source_hash, BUNDLE_VERSION,
+                                          BUNDLE_EXTENSION))
+
+def load_cached(file_path):
+    """
+    Loads the bundle of a tutorial source from the cache, compiling (and
+    caching) it if the source or its UI templates have changed or it was
+    never compiled
+
+    Bundles are cached by the hash of the source: the templates it
+    references are only known once it is compiled, so they are checked
+    against the hash of the templates stored in the bundle.
+    """
+    source_hash = hash_source(file_path)
+    cache_path = get_cache_path(source_hash)
+    bundle = load_bundle(cache_path, source_hash)
+    if bundle is not None and bundle.get("templates_hash") == hash_templates(
+            os.path.dirname(file_path), bundle["templates"]):
+        logging.debug(f"loaded compiled tutorial from {cache_path}")
+        return bundle
+
+    bundle = compile_tutorial(file_path, source_hash)
+    try:
+        save_bundle(bundle, cache_path)
+    except OSError as error:
+        logging.warning(f"could not cache compiled tutorial: {error}")
+    return bundle
+
+
+class TutorialFormatException(Exception):
+    def __init__(self, file_path: str, line_n: int, reason: str):
+        message = "{}:{}: {}".format(file_path, line_n, reason)
+        super().__init__(message)
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+import logging
+import shlex
+import subprocess
+import threading
+import time
+
+from gi.repository import GLib
+
+# characters meaning a command needs a shell (to be split, expanded...)
+SHELL_CHARACTERS = frozenset("|&;<>(){}$`\\*?[~#\n")
+
+# commands run by the shell itself (there is no program to run them)
+SHELL_BUILTINS = frozenset([
+    "!", ".", ":", "alias", "cd", "eval", "exec", "exit", "export", "read",
+    "readonly", "return", "set", "shift", "source", "trap", "ulimit",
+    "umask", "unalias", "unset", "wait",
+])
+
+def split_command(command: str):
+    """
+    Returns the arguments to run a command without a shell (None if it
+    needs one)
+    """
+    if SHELL_CHARACTERS.intersection(command):
+        return None
+    try:
+        args = shlex.split(command)
+    except ValueError: # e.g. unbalanced quotes
+        return None
+    if not args or "=" in args[0]: # empty or setting a variable
+        return None
+    if args[0] in SHELL_BUILTINS:
+        return None
+    return args
+
+class CommandResult:
+    """
+    How a dom0 command ended
+    """
+
+    def __init__(self, command: str, returncode: int, wall_time: float):
+        self.command = command
+        self.returncode = returncode # None if it couldn't be started
+        self.wall_time = wall_time # seconds from start to exit
+
+    def is_success(self):
+        return self.returncode == 0
+
+    def __repr__(self):
+        return "CommandResult({!r}, returncode={!r}, wall_time={:.3f})"\
+            .format(self.command, self.returncode, self.wall_time)
+
+class Command:
+    """
+    A dom0 command started by a CommandRunner
+    """
+
+    def __init__(self, command: str, process=None):
+        self.command = command
+        self.process = process
+        self.result = None
+        self.done = threading.Event()
+        self.timer = None # checks the timeout (see CommandRunner.run)
+
+    def wait(self, timeout: float=None):
+        """
+        Waits until the command exits
+
+        :return: its CommandResult (None if the timeout expired)
+        """
+        self.done.wait(timeout)
+        return self.result
+
+class CommandRunner:
+    """
+    Runs dom0 commands in the background and supervises them
+
+    Commands are started without a shell unless they need one. Every
+    command is waited for by a supervisor thread, so it is reaped as soon as
+    it exits (no zombies are left behind) and its wall time is recorded.
+    Completion callbacks are handed to 'dispatch' so that they run on the
+    GLib main loop, like D-Bus replies do.
+    """
+
+    def __init__(self, dispatch=GLib.idle_add):
+        self.dispatch = dispatch
+        self.lock = threading.Lock()
+        self.running = set() # of Command
+        self.wall_times = OrderedDict() # command -> [seconds]
+
+    def run(self, command: str, on_done=None, timeout: float=None,
+            on_timeout=None):
+        """
+        Starts a command
+
+        :param on_done: called with the CommandResult once it exits
+        :param timeout: seconds after which on_timeout is called if it is
+            still running (it is not killed and keeps being supervised)
+        :return: Command
+        """
+        start_time = time.perf_counter()
+        args = split_command(command)
+        try:
+            process = subprocess.Popen(args or command, shell=args is None,
+                                       stdin=subprocess.DEVNULL)
+        except OSError as error:
+            logging.error("failed to run dom0 command '{}': {}".format(
+                command, error))
+            running = Command(command)
+            self._finish(running, None, start_time, on_done)
+            return running
+
+        running = Command(command, process)
+        with self.lock:
+            self.running.add(running)
+        if timeout is not None and on_timeout is not None:
+            # a daemon, so that it doesn't delay exiting (and it is cancelled
+            # once the command exits)
+            running.timer = threading.Timer(
+                timeout, self._check_timeout,
+                args=(running, timeout, on_timeout))
+            running.timer.daemon = True
+            running.timer.start()
+        threading.Thread(target=self._supervise,
+                         args=(running, start_time, on_done),
+                         daemon=True).start()
+        return running
+
+    def get_running(self):
+        with self.lock:
+            return list(self.running)
+
+    def get_wall_times(self):
+        """
+        Returns how long (in seconds) each command ran, as a map of
+        command -> list of wall times (one per time it was run)
+        """
+        return self.wall_times
+
+    def _supervise(self, running: Command, start_time: float, on_done):
+        returncode = running.process.wait()
+        with self.lock:
+            self.running.discard(running)
+        self._finish(running, returncode, start_time, on_done)
+
+    def _finish(self, running: Command, returncode, start_time, on_done):
+        if running.timer is not None:
+            running.timer.cancel()
+        result = CommandResult(running.command, returncode,
+                               time.perf_counter() - start_time)
+        with self.lock:
+            self.wall_times.setdefault(running.command, []).append(
+                result.wall_time)
+        logging.info("dom0 command '{}' exited with {} after {:.1f} ms"
+                     .format(running.command, returncode,
+                             result.wall_time * 1000))
+        running.result = result
+        running.done.set()
+        if on_done is not None:
+            self._dispatch(on_done, result)
+
+    def _check_timeout(self, running: Command, timeout, on_timeout):
+        if running.done.is_set():
+            return
+        logging.warning("dom0 command '{}' still running after {} s"
+                        .format(running.command, timeout))
+        self._dispatch(on_timeout, running)
+
+    def _dispatch(self, callback, *args):
+        def call():
+            callback(*args)
+            return False # only once (as a GLib source)
+        self.dispatch(call)
+
+
+command_runner = CommandRunner()
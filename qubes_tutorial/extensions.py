@@ -8,6 +8,7 @@ gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk, Gdk
 
 import qubes_tutorial.interactions as interactions
+import qubes_tutorial.proxies as proxies
 
 
 EXT_INTERFACE_NAME = "org.qubes.tutorial.extensions"
@@ -50,10 +51,8 @@ def get_extension_method(component, method_name):
     bus_name       = _get_bus_name_from_component_name(component)
     interface_name = EXT_INTERFACE_NAME
     object_path    = EXT_OBJ_PATH
-    proxy = dbus.SessionBus()\
-                .get_object(bus_name, object_path)\
-                .get_dbus_method(method_name, interface_name)
-    return proxy
+    return proxies.get_method(bus_name, object_path, interface_name,
+                              method_name)
 
 def enable_extension(component_name):
     enable_extension_proxy = \
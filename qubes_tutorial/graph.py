@@ -0,0 +1,190 @@
+from array import array
+
+from qubes_tutorial.tutorial import AbstractStep, InteractionPrefixMap, \
+    Tutorial, TutorialDuplicateStepException, \
+    TutorialDuplicateTransitionException
+
+
+class InteractionTable:
+    """
+    Interns interactions, giving each distinct one a small integer id
+    """
+    __slots__ = ('ids', 'interactions')
+
+    def __init__(self):
+        self.ids = {} # map: interaction -> id
+        self.interactions = [] # map: id -> interaction
+
+    def intern(self, interaction) -> int:
+        interaction_id = self.ids.get(interaction)
+        if interaction_id is None:
+            interaction_id = len(self.interactions)
+            self.ids[interaction] = interaction_id
+            self.interactions.append(interaction)
+        return interaction_id
+
+    def get_id(self, interaction):
+        """ Returns the id of an interaction (None if never interned) """
+        return self.ids.get(interaction)
+
+    def get(self, interaction_id: int):
+        return self.interactions[interaction_id]
+
+    def __len__(self):
+        return len(self.interactions)
+
+
+class CompactStepGraph:
+    """
+    Steps and transitions of a tutorial stored in integer-indexed arrays
+
+    Steps are identified by their index in 'steps' and interactions by their
+    id in 'interactions'. Transitions are stored in flat arrays (interaction
+    id, target index and next transition of the same step), chained per step
+    from 'first_edge' to 'last_edge'. Looking up a transition walks the
+    chain of its step, comparing interaction ids: steps only have a handful
+    of transitions, and there is no per-transition object or map entry.
+    """
+
+    NO_EDGE = -1
+
+    def __init__(self):
+        self.interactions = InteractionTable()
+        self.steps = [] # map: index -> CompactStep
+        self.step_indexes = {} # map: name -> index
+        self.first_edge = array('i') # map: step index -> edge
+        self.last_edge = array('i') # map: step index -> edge
+        self.edge_interaction = array('I') # map: edge -> interaction id
+        self.edge_target = array('I') # map: edge -> target step index
+        self.edge_next = array('i') # map: edge -> next edge of the step
+        self.wildcards = {} # map: index -> InteractionPrefixMap
+
+    def add_step(self, step):
+        if step.name in self.step_indexes:
+            raise TutorialDuplicateStepException(step.name)
+        step.index = len(self.steps)
+        self.step_indexes[step.name] = step.index
+        self.steps.append(step)
+        self.first_edge.append(self.NO_EDGE)
+        self.last_edge.append(self.NO_EDGE)
+
+    def get_step(self, step_name: str):
+        step_index = self.step_indexes.get(step_name)
+        if step_index is None:
+            return None
+        return self.steps[step_index]
+
+    def add_transition(self, source_step, interaction, target_step):
+        interaction_id = self.interactions.intern(interaction)
+        if self._find_edge(source_step.index, interaction_id) != self.NO_EDGE:
+            raise TutorialDuplicateTransitionException(source_step,
+                                                       target_step)
+
+        edge = len(self.edge_target)
+        self.edge_interaction.append(interaction_id)
+        self.edge_target.append(target_step.index)
+        self.edge_next.append(self.NO_EDGE)
+        last_edge = self.last_edge[source_step.index]
+        if last_edge == self.NO_EDGE:
+            self.first_edge[source_step.index] = edge
+        else:
+            self.edge_next[last_edge] = edge
+        self.last_edge[source_step.index] = edge
+
+        if InteractionPrefixMap.is_wildcard(interaction):
+            wildcards = self.wildcards.get(source_step.index)
+            if wildcards is None:
+                wildcards = self.wildcards[source_step.index] = \
+                    InteractionPrefixMap()
+            wildcards.add(interaction, target_step)
+
+    def next(self, step_index: int, interaction):
+        next_step = None
+        interaction_id = self.interactions.get_id(interaction)
+        if interaction_id is not None:
+            edge = self._find_edge(step_index, interaction_id)
+            if edge != self.NO_EDGE:
+                next_step = self.steps[self.edge_target[edge]]
+        if next_step is None and step_index in self.wildcards:
+            next_step = self.wildcards[step_index].match(interaction)
+        return next_step
+
+    def get_out_edges(self, step_index: int):
+        """ Yields (interaction, target step) of a step's transitions """
+        edge = self.first_edge[step_index]
+        while edge != self.NO_EDGE:
+            yield (self.interactions.get(self.edge_interaction[edge]),
+                   self.steps[self.edge_target[edge]])
+            edge = self.edge_next[edge]
+
+    def _find_edge(self, step_index: int, interaction_id: int) -> int:
+        """ Returns a step's edge for an interaction (NO_EDGE if none) """
+        edge = self.first_edge[step_index]
+        while edge != self.NO_EDGE \
+                and self.edge_interaction[edge] != interaction_id:
+            edge = self.edge_next[edge]
+        return edge
+
+
+class CompactStep(AbstractStep):
+    """
+    Step without a per-instance dict, whose transitions live in the
+    CompactStepGraph of its tutorial
+    """
+    __slots__ = ('name', 'ui_dict', 'setup_dicts', 'teardown_dicts',
+                 'graph', 'index')
+
+    def __init__(self, graph: CompactStepGraph, name: str,
+                 ui_dict: dict=None, setup_dicts: dict=None,
+                 teardown_dicts: dict=None):
+        self.graph = graph
+        self.index = None # assigned when added to the graph
+        self.name = name
+        self.ui_dict = ui_dict
+        self.setup_dicts = setup_dicts
+        self.teardown_dicts = teardown_dicts
+
+    def add_transition(self, interaction, target_step):
+        self.graph.add_transition(self, interaction, target_step)
+
+    def next(self, interaction):
+        return self.graph.next(self.index, interaction)
+
+    def get_next_steps(self):
+        return [step for _, step in self.graph.get_out_edges(self.index)]
+
+    def get_possible_interactions(self):
+        return [interaction for interaction, _ in
+                self.graph.get_out_edges(self.index)]
+
+    @property
+    def transitions(self):
+        """ Map of interaction -> step (built on demand) """
+        return dict(self.graph.get_out_edges(self.index))
+
+
+class CompactTutorial(Tutorial):
+    """
+    Tutorial keeping its steps in a CompactStepGraph
+
+    Meant for large (e.g. generated) tutorials with thousands of steps,
+    where the memory of a dict per step adds up. It behaves like Tutorial.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.graph = CompactStepGraph()
+        super().__init__(*args, **kwargs)
+
+    def create_step(self, name: str, ui_dict: dict=None,
+                    setup_dicts: dict=None, teardown_dicts: dict=None):
+        return CompactStep(self.graph, name, ui_dict, setup_dicts,
+                           teardown_dicts)
+
+    def add_step(self, step: CompactStep) -> None:
+        self.graph.add_step(step)
+
+    def get_step(self, step_name: str):
+        return self.graph.get_step(step_name)
+
+    def get_steps(self):
+        return self.graph.steps
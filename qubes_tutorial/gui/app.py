@@ -1,12 +1,13 @@
 import argparse
+from collections import deque, OrderedDict
 import dbus
 from dbus.mainloop.glib import DBusGMainLoop
 import dbus.service
 import logging
 import os
 import enum
-from queue import Queue
 import pkg_resources
+import time
 
 import gi
 gi.require_version("Gtk", "3.0")
@@ -16,6 +17,8 @@ from gi.repository import Gtk, Gdk, GLib
 import cairo
 
 import qubes_tutorial.interactions as interactions
+import qubes_tutorial.gui.templates as templates
+import qubes_tutorial.gui.updates as updates
 
 ui_dir = os.path.dirname(os.path.realpath(__file__))
 
@@ -30,8 +33,11 @@ class TutorialUIDbusService(dbus.service.Object):
                                             bus=dbus.SessionBus())
         dbus.service.Object.__init__(self, ui_bus, '/')
 
-        # ui update event queue
-        self.event_q = Queue()
+        # setup_ui and teardown_ui requests, rendered once per frame
+        self.updates = updates.UIUpdateQueue(self.schedule_render)
+
+        # (built, path) of templates to load while idle (see preload)
+        self.preload_q = deque()
 
         self.setup_styling()
         self.setup_widgets()
@@ -53,68 +59,137 @@ class TutorialUIDbusService(dbus.service.Object):
         self.current_task = CurrentTaskInfo()
 
         self.enabled_widgets = []
+        self.render_scheduler = updates.RenderScheduler(
+            self.render, [self.modal, self.step_info,
+                          self.step_info_pointing, self.current_task])
 
     @dbus.service.method('org.qubes.tutorial.ui')
     def set_num_tasks(self, num_tasks):
         self.current_task.set_num_tasks(num_tasks)
 
+    @dbus.service.method('org.qubes.tutorial.ui')
+    def get_template_cache_stats(self):
+        return self.modal.templates.get_stats()
+
+    @dbus.service.method('org.qubes.tutorial.ui', out_signature='a{sad}')
+    def get_first_paint_latencies(self):
+        return self.modal.first_paint_latencies
+
+    @dbus.service.method('org.qubes.tutorial.ui', in_signature='as')
+    def preload(self, template_paths):
+        """
+        Loads the templates of all steps in idle callbacks, so that the
+        steps are later shown from memory
+
+        Only the templates of the first steps are built, as many as the
+        template cache keeps: the others are only read into the page cache,
+        so that preloading never keeps more widget trees than showing the
+        steps would.
+        """
+        max_built = self.modal.templates.max_size
+        for index, template_path in enumerate(template_paths):
+            self.preload_q.append(
+                (index < max_built,
+                 os.path.join(self.tutorial_dir, template_path)))
+        GLib.idle_add(self.preload_next)
+        return "preloading {} templates".format(len(template_paths))
+
+    def preload_next(self):
+        """ Loads one file per idle callback, to keep the UI responsive """
+        if not self.preload_q:
+            return False
+        built, path = self.preload_q.popleft()
+        if built:
+            try:
+                self.modal.templates.get(path)
+            except (OSError, GLib.Error) as error:
+                logging.warning("can't preload {}: {}".format(path, error))
+        else:
+            templates.prewarm_file(path)
+        if not self.preload_q:
+            logging.info("preloaded UI: {}".format(
+                self.modal.templates.get_stats()))
+        return bool(self.preload_q)
+
     @dbus.service.method('org.qubes.tutorial.ui')
     def setup_ui(self, ui_dict):
-        self.event_q.put(ui_dict)
-        GLib.idle_add(self.update_ui)
+        self.updates.setup(ui_dict, time.perf_counter())
         return "setup in progress"
 
     @dbus.service.method('org.qubes.tutorial.ui')
     def teardown_ui(self):
-        logging.info("processing UI teardown")
-        for widget in self.enabled_widgets:
-            if widget == self.current_task:
-                # current task is always on-screen
-                continue
-            widget.teardown()
-            widget.hide()
-            self.enabled_widgets.remove(widget)
-        return "completed UI teardown"
-
-    def update_ui(self):
-        while not self.event_q.empty():
-            event = self.event_q.get()
-            self.process_ui_change(event)
-        return False
-
-    def process_ui_change(self, ui_dict):
-        logging.info("processing some UI change")
-        logging.info(ui_dict)
-        new_task = False
-
-        for ui_item_dict in ui_dict:
-            ui_type = ui_item_dict['type']
+        self.updates.teardown()
+        return "teardown in progress"
+
+    @dbus.service.method('org.qubes.tutorial.ui')
+    def transition_ui(self, from_step, ui_dict):
+        """
+        Replaces the UI of a step by the next one's (ui_dict) at once:
+        widgets shown by both stay on screen and are only updated
+        """
+        self.updates.transition(from_step, ui_dict, time.perf_counter())
+        return "transition from {} in progress".format(from_step)
+
+    def schedule_render(self):
+        """ Renders the pending UI update on the next frame """
+        self.render_scheduler.schedule()
+
+    def render(self):
+        update = self.updates.take()
+        if update is not None:
+            self.process_ui_change(update)
+
+    def process_ui_change(self, update: updates.UIUpdate):
+        logging.info("processing UI change ({} requests, from step {})"
+                     .format(update.num_requests, update.from_step))
+        logging.info(update.items)
+
+        widgets = {
+            "modal": self.modal,
+            "step_information": self.step_info,
+            "step_information_pointing": self.step_info_pointing,
+        }
+        shown_widgets = [widgets[ui_type] for ui_type in update.items]
+
+        if update.teardown:
+            for widget in list(self.enabled_widgets):
+                if widget == self.current_task:
+                    # current task is always on-screen
+                    continue
+                self.enabled_widgets.remove(widget)
+                if widget in shown_widgets:
+                    # updated below, without hiding it in between
+                    continue
+                widget.teardown()
+                widget.hide()
+        if update.forget_shown:
+            self.enabled_widgets = []
+
+        for ui_type, ui_item_dict in update.items.items():
             if ui_type == "modal":
-                self.setup_ui_modal(ui_item_dict)
-                self.enabled_widgets += [self.modal]
+                self.setup_ui_modal(ui_item_dict,
+                                    update.setup_times.get(ui_type))
             elif ui_type == "step_information":
                 self.setup_ui_step_information(ui_item_dict)
-                self.enabled_widgets += [self.step_info]
             elif ui_type == "step_information_pointing":
                 self.setup_ui_step_information_pointing(ui_item_dict)
-                self.enabled_widgets += [self.step_info_pointing]
-            elif ui_type == "new_task":
-                new_task = True
-                self.setup_ui_current_task(ui_item_dict)
-                self.enabled_widgets += [self.current_task]
-            elif ui_type == "no_more_tasks":
-                self.current_task.teardown()
-                self.current_task.hide()
-            elif ui_type == "none":
-                self.enabled_widgets = []
-            else:
-                raise Exception("UI of type '{}' not recognized.".format(
-                    ui_type))
-
-        if not new_task:
+            if widgets[ui_type] not in self.enabled_widgets:
+                self.enabled_widgets.append(widgets[ui_type])
+
+        if update.new_tasks:
+            # only the last task is shown (the others are counted)
+            self.current_task.task_num += len(update.new_tasks) - 1
+            self.setup_ui_current_task(update.new_tasks[-1])
+            if self.current_task not in self.enabled_widgets:
+                self.enabled_widgets.append(self.current_task)
+        if update.no_more_tasks:
+            self.current_task.teardown()
+            self.current_task.hide()
+
+        if update.move_task_to_corner:
             self.current_task.move_to_corner()
 
-    def setup_ui_modal(self, ui_item_dict: dict):
+    def setup_ui_modal(self, ui_item_dict: dict, requested_time=None):
         logging.debug("setting up ui modal")
 
         def on_next_button_pressed():
@@ -134,7 +209,7 @@ class TutorialUIDbusService(dbus.service.Object):
         self.modal.update(template_path, title,
                           next_button_label, on_next_button_pressed,
                           back_button_label, on_back_button_pressed,
-                          backdrop_enabled)
+                          backdrop_enabled, requested_time)
 
     def setup_ui_step_information(self, ui_item_dict):
         def on_ok_button_pressed():
@@ -372,18 +447,25 @@ class StepInformationPointing(TutorialWindow):
     Indicates information about the current step, but instead of having to be
     acknowledged by the user via an "OK" button, it directly points to
     a coordinate on the screen.
+
+    Its widgets (popover included) are only created once: updates change
+    their text and position.
     """
     def __init__(self):
         super().__init__()
         self.set_border_width(10)
         self.make_widget_transparent(self)
         self._create_dummy_boxes()
+        self._create_popover()
+        self._create_clickthrough_region()
 
     def update(self, text, subtext, x, y, corner):
-        self._create_popover(text, subtext)
+        self.popover_text.set_text(text)
+        self.popover_subtext.set_text(subtext)
         self.show_all()
         # Functions that require widget to be already rendered
         self._position_on_screen(x, y, corner)
+        self.popover.popup()
         self._make_clickthrough()
 
     def teardown(self):
@@ -442,7 +524,7 @@ class StepInformationPointing(TutorialWindow):
 
         self.add(dummy_box)
 
-    def _create_popover(self, text, subtext):
+    def _create_popover(self):
         self.popover = Gtk.Popover.new(self.dummy_top_left)
         vbox = Gtk.VBox()
 
@@ -459,19 +541,18 @@ class StepInformationPointing(TutorialWindow):
         vbox.show_all()
 
         self.popover.add(vbox)
-        self.popover_text.set_text(text)
-        self.popover_subtext.set_text(subtext)
-        self.popover.popup()
+
+    def _create_clickthrough_region(self):
+        """ Creates the empty input region making the window clickthrough """
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 0 , 0)
+        self.clickthrough_region = Gdk.cairo_region_create_from_surface(surface)
 
     def _make_clickthrough(self):
         """ Make window clickthrough
 
         Only works after widget.show_all()
         """
-        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 0 , 0)
-        surface_ctx = cairo.Context(surface)
-        region = Gdk.cairo_region_create_from_surface(surface)
-        self.input_shape_combine_region(region)
+        self.input_shape_combine_region(self.clickthrough_region)
 
 
 @Gtk.Template(filename=os.path.join(ui_dir, "modal.ui"))
@@ -485,12 +566,29 @@ class ModalWindow(TutorialWindow):
     def __init__(self):
         super().__init__()
         self.custom_modal = None
+        self.templates = templates.TemplateCache(
+            self.build_custom_modal, on_evict=self.on_custom_modal_evicted)
+        # template path -> [seconds from setup_ui to the modal being drawn]
+        self.first_paint_latencies = OrderedDict()
+        self.paint_pending = None # (template path, setup_ui time)
         self.create_backdrop()
         self.connect_signals()
 
     def connect_signals(self):
         self.next_button.connect('clicked', self.on_next_button_pressed)
         self.back_button.connect('clicked', self.on_back_button_pressed)
+        self.connect_after('draw', self.on_drawn)
+
+    def on_drawn(self, widget, ctx):
+        if self.paint_pending is None:
+            return
+        step_ui_path, requested_time = self.paint_pending
+        self.paint_pending = None
+        latency = time.perf_counter() - requested_time
+        self.first_paint_latencies.setdefault(step_ui_path, []).append(
+            latency)
+        logging.info("modal {} painted in {:.1f} ms".format(
+            os.path.basename(step_ui_path), latency * 1000))
 
     def create_backdrop(self):
         """
@@ -515,20 +613,37 @@ class ModalWindow(TutorialWindow):
         ctx.set_source_rgb(0, 0, 0)
         ctx.fill()
 
-    def update(self, step_ui_path, title,
-                 next_button_label, next_button_callback,
-                 back_button_label=None, back_button_callback=None,
-                 backdrop_enabled=False):
-
+    @staticmethod
+    def build_custom_modal(step_ui_path):
         custom_information = Gtk.Builder()
         custom_information.add_from_file(step_ui_path)
+        return custom_information.get_object("custom_modal")
 
-        if self.custom_modal:
-            previous_ui = self.custom_modal
-            self.modal_placeholder.remove(previous_ui)
+    def on_custom_modal_evicted(self, custom_modal):
+        if custom_modal is self.custom_modal:
+            self.modal_placeholder.remove(custom_modal)
+            self.custom_modal = None
+        custom_modal.destroy()
 
-        self.custom_modal = custom_information.get_object("custom_modal")
-        self.modal_placeholder.pack_start(self.custom_modal, True, True, 0)
+    def update(self, step_ui_path, title,
+                 next_button_label, next_button_callback,
+                 back_button_label=None, back_button_callback=None,
+                 backdrop_enabled=False, requested_time=None):
+
+        if requested_time is not None:
+            self.paint_pending = (step_ui_path, requested_time)
+
+        # built once per template (see templates.TemplateCache)
+        custom_modal = self.templates.get(step_ui_path)
+        logging.debug("modal templates cache: {}".format(
+            self.templates.get_stats()))
+
+        if custom_modal is not self.custom_modal:
+            if self.custom_modal:
+                previous_ui = self.custom_modal
+                self.modal_placeholder.remove(previous_ui)
+            self.custom_modal = custom_modal
+            self.modal_placeholder.pack_start(self.custom_modal, True, True, 0)
 
         self.title_label.set_label(title)
         self.next_button.set_label(next_button_label)
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import logging
+import os
+
+# templates kept built (least recently used ones are dropped first)
+MAX_TEMPLATES = 16
+
+class TemplateCache:
+    """
+    LRU cache of widget trees built from Gtk.Builder templates (.ui files)
+
+    A template is read, parsed and built once, and its widget tree reused
+    every time it is shown again (e.g. when going back and forth between
+    steps), as long as the file's mtime doesn't change. Checking the mtime
+    is a stat(2): the file isn't read again.
+    """
+
+    def __init__(self, build, max_size: int=MAX_TEMPLATES, on_evict=None):
+        """
+        :param build: function returning the widget tree of a template path
+        :param on_evict: called with each widget tree dropped from the cache
+            (e.g. to destroy it)
+        """
+        self.build = build
+        self.max_size = max(1, max_size)
+        self.on_evict = on_evict
+        self.entries = OrderedDict() # path -> (mtime, widget tree)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str):
+        mtime = os.stat(path).st_mtime_ns
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == mtime:
+            self.hits += 1
+            self.entries.move_to_end(path)
+            return entry[1]
+
+        self.misses += 1
+        if entry is not None: # changed since it was built
+            self._evict(path)
+        widget_tree = self.build(path)
+        self.entries[path] = (mtime, widget_tree)
+        while len(self.entries) > self.max_size:
+            self._evict(next(iter(self.entries)))
+        return widget_tree
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self.entries)}
+
+    def clear(self):
+        for path in list(self.entries):
+            self._evict(path)
+
+    def _evict(self, path: str):
+        _, widget_tree = self.entries.pop(path)
+        if self.on_evict is not None:
+            self.on_evict(widget_tree)
+
+    def __len__(self):
+        return len(self.entries)
+
+def prewarm_file(path: str):
+    """
+    Asks the kernel to read a file into the page cache in the background
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    except OSError as error:
+        logging.warning("can't preload {}: {}".format(path, error))
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
@@ -0,0 +1,163 @@
+# UI item types shown in their own widget (one item of each at a time)
+WIDGET_TYPES = ("modal", "step_information", "step_information_pointing")
+
+# milliseconds to wait for the next frame before rendering anyway (e.g. when
+# the widget whose frame was awaited is hidden before it)
+FRAME_TIMEOUT = 100
+
+class UIUpdate:
+    """
+    Desired state of the UI, combining all the setup_ui and teardown_ui
+    requests received since it was last rendered
+
+    Only the latest item of each widget is kept, so that a burst of requests
+    (e.g. the teardown of a step followed by the setup of the next one)
+    shows, hides and moves each widget at most once.
+    """
+
+    def __init__(self):
+        self.teardown = False # hide the widgets shown before
+        self.forget_shown = False # a 'none' item (see add_setup)
+        self.items = {} # map: widget type -> latest ui item dict
+        self.setup_times = {} # map: widget type -> time of its setup_ui
+        self.new_tasks = [] # 'new_task' items, in order
+        self.no_more_tasks = False
+        self.move_task_to_corner = False
+        self.num_requests = 0
+        self.from_step = None # name of the step left (if known)
+
+    def add_setup(self, ui_dict, requested_time: float=None):
+        new_task = False
+        for ui_item_dict in ui_dict:
+            ui_type = ui_item_dict['type']
+            if ui_type in WIDGET_TYPES:
+                self.items[ui_type] = ui_item_dict
+                self.setup_times[ui_type] = requested_time
+            elif ui_type == "new_task":
+                new_task = True
+                self.new_tasks.append(ui_item_dict)
+                self.no_more_tasks = False
+            elif ui_type == "no_more_tasks":
+                self.no_more_tasks = True
+            elif ui_type == "none":
+                # widgets shown so far are no longer torn down
+                self.forget_shown = True
+            else:
+                raise Exception("UI of type '{}' not recognized.".format(
+                    ui_type))
+        self.move_task_to_corner = not new_task
+
+    def add_teardown(self):
+        self.teardown = True
+        self.items.clear()
+        self.setup_times.clear()
+
+class UIUpdateQueue:
+    """
+    Coalesces UI requests until the next render (see UIUpdate)
+    """
+
+    def __init__(self, schedule_render):
+        """
+        :param schedule_render: called when a render is needed (once until
+            the update is taken)
+        """
+        self.schedule_render = schedule_render
+        self.pending = None
+
+    def setup(self, ui_dict, requested_time: float=None):
+        self._get_pending().add_setup(ui_dict, requested_time)
+
+    def teardown(self):
+        self._get_pending().add_teardown()
+
+    def transition(self, from_step: str, ui_dict,
+                   requested_time: float=None):
+        """
+        Tears down the UI of a step and sets up the next one's, rendered
+        together as a single update
+        """
+        pending = self._get_pending()
+        pending.add_teardown()
+        pending.add_setup(ui_dict, requested_time)
+        pending.from_step = from_step
+
+    def take(self):
+        """
+        Returns the UIUpdate to render (None if there is nothing to do)
+        """
+        update, self.pending = self.pending, None
+        return update
+
+    def _get_pending(self):
+        if self.pending is None:
+            self.pending = UIUpdate()
+            self.schedule_render()
+        self.pending.num_requests += 1
+        return self.pending
+
+class RenderScheduler:
+    """
+    Renders the pending UI update on the next frame
+
+    The frame clock only ticks for widgets on screen: the render waits for
+    the next frame of the first widget mapped, or if none is, for the main
+    loop to be idle. A widget can still be unmapped before its next frame
+    (e.g. hidden by a step change), so if no frame arrives within
+    'frame_timeout' milliseconds the update is rendered anyway, instead of
+    the render never happening and later requests being dropped.
+    """
+
+    def __init__(self, render, widgets, frame_timeout: int=FRAME_TIMEOUT):
+        """
+        :param render: function rendering the pending update
+        :param widgets: widgets whose frame clock may time the render
+        """
+        self.render = render
+        self.widgets = widgets
+        self.frame_timeout = frame_timeout
+        self.scheduled = False
+        self.tick = None # (widget, tick callback id) of the awaited frame
+        self.timeout_source = None # GLib source id of the frame timeout
+
+    def schedule(self):
+        """ Renders once, after this and any other request until then """
+        if self.scheduled:
+            return
+        self.scheduled = True
+        from gi.repository import GLib
+        for widget in self.widgets:
+            if widget.get_mapped():
+                self.tick = (widget, widget.add_tick_callback(self.on_tick))
+                self.timeout_source = GLib.timeout_add(self.frame_timeout,
+                                                       self.on_timeout)
+                return
+        GLib.idle_add(self.on_idle)
+
+    def on_tick(self, widget, frame_clock):
+        self.tick = None
+        self._render()
+        return False # only once (as a GLib source)
+
+    def on_timeout(self):
+        self.timeout_source = None
+        self._render()
+        return False # only once (as a GLib source)
+
+    def on_idle(self):
+        self._render()
+        return False # only once (as a GLib source)
+
+    def _render(self):
+        if not self.scheduled: # already rendered (e.g. on the frame)
+            return
+        self.scheduled = False
+        if self.tick is not None:
+            widget, tick_id = self.tick
+            widget.remove_tick_callback(tick_id)
+            self.tick = None
+        if self.timeout_source is not None:
+            from gi.repository import GLib
+            GLib.source_remove(self.timeout_source)
+            self.timeout_source = None
+        self.render()
@@ -1,49 +1,305 @@
+import atexit
+from collections import deque
 import logging
-import dbus
-import dbus.service
-from dbus.mainloop.glib import DBusGMainLoop
-
-class TutorialInteractionsListener(dbus.service.Object):
-
-    def __init__(self, interactions_q):
-        self.interactions_q = interactions_q
-
-        # start dbus loop
-        DBusGMainLoop(set_as_default=True)
-
-        # setup dbus for listening for events
-        bus_name = dbus.service.BusName("org.qubes.tutorial.interactions",
-                                        bus=dbus.SessionBus())
-        dbus.service.Object.__init__(self, bus_name, '/')
-
-    @dbus.service.method('org.qubes.tutorial.interactions')
-    def register_interaction(self,
-                             name: str,
-                             subject: str,
-                             arguments: str):
-        # must empy str instead of none since D-Bus doesn't support it
-        if subject == "":
-            self.interactions_q.put("{}".format(name))
-        elif arguments == "":
-            self.interactions_q.put("{}:{}".format(name, subject))
+import threading
+import time
+import weakref
+
+# seconds an interaction may wait to be sent together with the next ones
+FLUSH_DELAY = 0.01
+
+# interactions sent at once (an earlier flush happens when reached)
+MAX_BATCH_SIZE = 100
+
+# seconds to wait for buffered interactions to be sent when exiting
+EXIT_FLUSH_TIMEOUT = 2
+
+# separates the name, subject and arguments of an interaction
+SEPARATOR = ':'
+
+# names of qrexec calls allowed and denied by the policy (followed by the
+# policy name, see QrexecPolicyInteraction)
+QREXEC_PREFIX = "qubes-qrexec-"
+QREXEC_DENIED_PREFIX = "qubes-qrexec-denied-"
+
+# listener of the tutorial running in this process (if any, see
+# listener.TutorialInteractionsListener), to which interactions are handed
+# directly instead of over D-Bus
+local_listener = None
+
+class Interaction:
+    """
+    Something the user did (e.g. started a qube or pressed "next")
+
+    Interactions are identified by their string form
+    'name[:subject[:arguments]]', which is how transitions are written in
+    tutorials. They are interned (equal interactions are usually the same
+    object), hash like their string form and compare equal to it, so they
+    can be looked up among transitions given as strings and vice versa.
+    """
+    __slots__ = ('name', 'subject', 'arguments', 'string', 'hash',
+                 '__weakref__')
+
+    # map: (class, string form) -> interaction
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, name: str, subject: str="", arguments: str=""):
+        return cls._intern(format_interaction(name, subject, arguments))
+
+    @classmethod
+    def from_string(cls, string: str):
+        return cls._intern(string)
+
+    @classmethod
+    def _intern(cls, string: str):
+        key = (cls, string)
+        interaction = cls._interned.get(key)
+        if interaction is None:
+            interaction = object.__new__(cls)
+            interaction.string = string
+            interaction.hash = hash(string)
+            # the structure is always parsed from the string form, so it
+            # doesn't depend on how the interaction was registered
+            parts = string.split(SEPARATOR, 2)
+            interaction.name = parts[0]
+            interaction.subject = parts[1] if len(parts) > 1 else ""
+            interaction.arguments = parts[2] if len(parts) > 2 else ""
+            interaction = cls._interned.setdefault(key, interaction)
+        return interaction
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, Interaction):
+            return self.string == other.string
+        if isinstance(other, str):
+            return self.string == other
+        return NotImplemented
+
+    def __str__(self):
+        return self.string
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, self.string)
+
+    def __reduce__(self):
+        return (Interaction.from_string, (self.string,))
+
+    def dump(self):
+        dump = {"type": self.name}
+        if self.subject:
+            dump["subject"] = self.subject
+        if self.arguments:
+            dump["arguments"] = self.arguments
+        return dump
+
+class QrexecPolicyInteraction(Interaction):
+    """
+    A qrexec call from one qube to another that the policy allowed (or
+    denied), e.g. 'qubes-qrexec-qubes.Filecopy:work:personal'
+
+    Like any interaction, it is interned: whether it succeeded and its
+    policy are part of its name, not set on the shared instance.
+    """
+    __slots__ = ()
+
+    def __new__(cls, success: bool, policy: str, source: str, target: str):
+        if success:
+            name = QREXEC_PREFIX + policy
         else:
-            self.interactions_q.put("{}:{}:{}".format(name, subject, arguments))
+            name = QREXEC_DENIED_PREFIX + policy
+        return cls._intern(format_interaction(name, source, target))
 
-def register(name: str, subject: str="", arguments: str=""):
+    @property
+    def success(self):
+        return not self.name.startswith(QREXEC_DENIED_PREFIX)
+
+    @property
+    def policy(self):
+        if self.success:
+            return self.name[len(QREXEC_PREFIX):]
+        return self.name[len(QREXEC_DENIED_PREFIX):]
+
+    @property
+    def source(self):
+        return self.subject
+
+    @property
+    def target(self):
+        return self.arguments
+
+    def __reduce__(self):
+        return (QrexecPolicyInteraction.from_string, (self.string,))
+
+    def dump(self):
+        return {
+            "type": "qrexec-policy-allow" if self.success
+                    else "qrexec-policy-deny",
+            "policy": self.policy,
+            "source": self.source,
+            "target": self.target,
+            "success": self.success,
+        }
+
+def format_interaction(name: str, subject: str="", arguments: str=""):
+    # must empy str instead of none since D-Bus doesn't support it
+    if subject == "":
+        return "{}".format(name)
+    elif arguments == "":
+        return "{}{}{}".format(name, SEPARATOR, subject)
+    else:
+        return "{}{}{}{}{}".format(name, SEPARATOR, subject, SEPARATOR,
+                                   arguments)
+
+class InteractionsSender:
     """
-    Registers an interaction on the tutorial
+    Buffers interactions to send them to the tutorial in batches
+
+    Interactions are sent (in order) FLUSH_DELAY seconds after the first of
+    a batch was added, or as soon as MAX_BATCH_SIZE are waiting, in a single
+    register_interactions D-Bus message.
+
+    Batches are sent by a single sender thread (started with the first
+    interaction), so the threads adding interactions never wait for D-Bus.
+    By default it sends them on its own bus connection (see
+    send_interactions), never on the one of the process's main loop.
+    """
+
+    def __init__(self, send=None, flush_delay: float=FLUSH_DELAY,
+                 max_batch_size: int=MAX_BATCH_SIZE):
+        """
+        :param send: callable sending a list of interactions, called from
+            the sender thread (sends them over D-Bus by default)
+        """
+        self.send = send or send_interactions
+        self.flush_delay = flush_delay
+        self.max_batch_size = max_batch_size
+        self.batch = []
+        self.batch_deadline = None # when the batch must be sent
+        self.ready_batches = deque() # full or flushed batches, in order
+        self.sending = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def add(self, name: str, subject: str="", arguments: str=""):
+        with self.condition:
+            if not self.batch:
+                self.batch_deadline = time.monotonic() + self.flush_delay
+            self.batch.append((name, subject, arguments))
+            if len(self.batch) >= self.max_batch_size:
+                self._close_batch()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run,
+                                               name="interactions-sender",
+                                               daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def flush(self, timeout: float=None):
+        """
+        Sends all buffered interactions now, waiting until they are sent
+
+        :return: False if they weren't all sent within the timeout
+        """
+        with self.condition:
+            if self.batch:
+                self._close_batch()
+                self.condition.notify()
+            return self.condition.wait_for(
+                lambda: not self.ready_batches and not self.sending, timeout)
+
+    def _close_batch(self):
+        self.ready_batches.append(self.batch)
+        self.batch = []
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.ready_batches:
+                    if self.batch:
+                        timeout = self.batch_deadline - time.monotonic()
+                        if timeout <= 0:
+                            self._close_batch()
+                            break
+                    else:
+                        timeout = None
+                    self.condition.wait(timeout)
+                batch = self.ready_batches.popleft()
+                self.sending = True
+
+            try:
+                self.send(batch)
+            except Exception as error:
+                logging.error(f"failed to send {len(batch)} interactions: "
+                              + f"{error}")
+            finally:
+                with self.condition:
+                    self.sending = False
+                    self.condition.notify_all()
+
+# connection of the sender thread to the session bus (see send_interactions)
+_sender_bus = None
+
+def send_interactions(batch):
+    """
+    Sends interactions to the tutorial over D-Bus
+
+    Called from the sender thread (see InteractionsSender) which has its own
+    connection to the bus: the process's main loop never shares it.
     """
-    bus = dbus.SessionBus()
-    logging.info("sending interaction")
-    proxy = bus.get_object('org.qubes.tutorial.interactions', '/',
-                           # introspect disabled since when combined with
-                           # method call with "ignore_reply" parameter
-                           # there is a bug where it simply does not send it
-                           introspect=False)
-    register_interaction_proxy =\
-        proxy.get_dbus_method('register_interaction',
-                              'org.qubes.tutorial.interactions')
+    global _sender_bus
+    # imported here so that interactions can be used without D-Bus (e.g. to
+    # simulate tutorials, see simulation.py)
+    import dbus
+    if _sender_bus is None:
+        _sender_bus = dbus.SessionBus(private=True)
+
+    logging.info(f"sending {len(batch)} interactions")
+    # introspect disabled since when combined with method call with
+    # "ignore_reply" parameter there is a bug where it simply does not send it
+    tutorial = _sender_bus.get_object('org.qubes.tutorial.interactions', '/',
+                                      introspect=False)
 
     # "ignore_reply" to avoid deadlocks between simulatenously listenning and
     # emmiting dbus components
-    register_interaction_proxy(name, subject, arguments, ignore_reply=True)
+    tutorial.register_interactions(
+        batch, signature='a(sss)', ignore_reply=True,
+        dbus_interface='org.qubes.tutorial.interactions')
+
+sender = InteractionsSender()
+
+# don't lose interactions still buffered when the process exits
+atexit.register(sender.flush, EXIT_FLUSH_TIMEOUT)
+
+def register(name: str, subject: str="", arguments: str=""):
+    """
+    Registers an interaction on the tutorial
+
+    Delivered directly if the tutorial runs in this process, otherwise
+    buffered and sent over D-Bus in batches (see InteractionsSender).
+    """
+    listener = local_listener
+    if listener is not None:
+        listener.receive_interaction(Interaction(name, subject, arguments))
+    else:
+        sender.add(name, subject, arguments)
+
+def register_interaction(interaction: Interaction):
+    """
+    Registers an already built interaction on the tutorial (see register)
+    """
+    listener = local_listener
+    if listener is not None:
+        listener.receive_interaction(interaction)
+    else:
+        # the string form is enough to rebuild it on the other side
+        sender.add(interaction.string)
+
+def flush():
+    """
+    Sends the interactions still waiting to be sent over D-Bus
+    """
+    sender.flush()
@@ -0,0 +1,57 @@
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop
+
+import qubes_tutorial.interactions as interactions
+
+class TutorialInteractionsListener(dbus.service.Object):
+
+    def __init__(self, interactions_q, on_interaction=None):
+        """
+        :param interactions_q: queue where received interactions are placed
+        :param on_interaction: optional callable invoked after interactions
+            are queued (e.g. to wake up the tutorial controller)
+        """
+        self.interactions_q = interactions_q
+        self.on_interaction = on_interaction
+
+        # start dbus loop
+        DBusGMainLoop(set_as_default=True)
+
+        # setup dbus for listening for events
+        bus_name = dbus.service.BusName("org.qubes.tutorial.interactions",
+                                        bus=dbus.SessionBus())
+        dbus.service.Object.__init__(self, bus_name, '/')
+
+        # watchers in this process (e.g. qubes admin events) skip the bus
+        interactions.local_listener = self
+
+    @dbus.service.method('org.qubes.tutorial.interactions')
+    def register_interaction(self,
+                             name: str,
+                             subject: str,
+                             arguments: str):
+        self.receive_interactions([(name, subject, arguments)])
+
+    @dbus.service.method('org.qubes.tutorial.interactions',
+                         in_signature='a(sss)')
+    def register_interactions(self, batch):
+        """
+        Registers several interactions, in order, as (name, subject,
+        arguments)
+        """
+        self.receive_interactions(batch)
+
+    def receive_interactions(self, batch):
+        for name, subject, arguments in batch:
+            self.interactions_q.put(
+                interactions.Interaction(name, subject, arguments))
+
+        if self.on_interaction:
+            self.on_interaction()
+
+    def receive_interaction(self, interaction: interactions.Interaction):
+        self.interactions_q.put(interaction)
+
+        if self.on_interaction:
+            self.on_interaction()
@@ -0,0 +1,135 @@
+import logging
+import threading
+
+# dbus and GLib are imported when first needed, so that the tutorial can be
+# loaded without them (e.g. to simulate it, see simulation.py)
+
+
+class ProxyCache:
+    """
+    Cache of D-Bus proxy methods sharing a single session bus connection
+
+    Proxies are kept per (bus name, object path, interface), so the
+    introspection round trip of creating a proxy object is paid only once
+    per remote object. When the owner of a bus name changes (e.g. the UI
+    process or an extension is restarted or goes away) all its entries are
+    dropped and the next call rebuilds them.
+    """
+
+    def __init__(self, bus=None):
+        self._bus = bus
+        self.entries = {} # (bus_name, object_path, interface) -> proxy entry
+        self.name_owners = {} # bus_name -> last known owner
+        self.lock = threading.RLock()
+        self.proxies_created = 0
+
+    @property
+    def bus(self):
+        if self._bus is None:
+            import dbus
+            self._bus = dbus.SessionBus()
+        return self._bus
+
+    def get_method(self, bus_name, object_path, interface, method_name,
+                   introspect=True):
+        """
+        Obtains a (cached) proxy method for calling a remote D-Bus method
+        """
+        key = (bus_name, object_path, interface)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self._watch_name_owner(bus_name)
+                proxy = self.bus.get_object(bus_name, object_path,
+                                            introspect=introspect)
+                self.proxies_created += 1
+                entry = self.entries[key] = _ProxyEntry(proxy)
+
+            method = entry.methods.get(method_name)
+            if method is None:
+                method = entry.proxy.get_dbus_method(method_name, interface)
+                entry.methods[method_name] = method
+            return method
+
+    def invalidate(self, bus_name):
+        """
+        Drops all cached proxies for a bus name
+        """
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == bus_name]:
+                del self.entries[key]
+
+    def _watch_name_owner(self, bus_name):
+        import dbus
+        if bus_name in self.name_owners:
+            return
+        self.name_owners[bus_name] = None
+        try:
+            self.bus.watch_name_owner(
+                bus_name,
+                lambda owner: self._on_name_owner_changed(bus_name, owner))
+        except dbus.DBusException:
+            logging.warning(f"can't watch owner of {bus_name}: "
+                            + "its proxies won't be refreshed")
+
+    def _on_name_owner_changed(self, bus_name, new_owner):
+        with self.lock:
+            previous_owner = self.name_owners.get(bus_name)
+            self.name_owners[bus_name] = new_owner
+            if previous_owner is not None and previous_owner != new_owner:
+                logging.info(f"owner of {bus_name} changed, "
+                             + "dropping cached proxies")
+                self.invalidate(bus_name)
+
+
+class _ProxyEntry:
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.methods = {} # method name -> proxy method
+
+
+proxy_cache = ProxyCache()
+
+def get_method(bus_name, object_path, interface, method_name,
+               introspect=True):
+    """
+    Obtains a proxy method from the shared proxy cache
+    """
+    return proxy_cache.get_method(bus_name, object_path, interface,
+                                  method_name, introspect)
+
+def call_concurrently(calls: dict):
+    """
+    Calls several proxy methods at once and waits for all of them to reply
+
+    Replies are collected by iterating the default GLib main context, so
+    this also works before the main loop is running.
+
+    :param calls: map of label -> (proxy method, args, timeout in seconds)
+    :return: map of label -> error, for each call that failed or timed out
+    """
+    failures = {}
+    pending = set(calls.keys())
+
+    for label, (method, args, timeout) in calls.items():
+        def on_reply(*reply, label=label):
+            pending.discard(label)
+
+        def on_error(error, label=label):
+            failures[label] = error
+            pending.discard(label)
+
+        try:
+            method(*args, reply_handler=on_reply, error_handler=on_error,
+                   timeout=timeout)
+        except Exception as error:
+            on_error(error)
+
+    if pending:
+        from gi.repository import GLib
+        main_context = GLib.MainContext.default()
+        while pending:
+            main_context.iteration(True)
+
+    return failures
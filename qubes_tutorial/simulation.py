@@ -0,0 +1,232 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import qubes_tutorial.bundle as bundle
+import qubes_tutorial.tutorial as tutorial
+
+
+class RecordingUI:
+    """
+    Stand-in for the tutorial UI process (gui.app)
+    """
+
+    def __init__(self):
+        self.ui_dict = None # currently shown (None if nothing is)
+        self.num_tasks = None
+
+    def set_num_tasks(self, num_tasks):
+        self.num_tasks = num_tasks
+
+    def setup_ui(self, ui_dict):
+        self.ui_dict = ui_dict
+
+    def teardown_ui(self):
+        self.ui_dict = None
+
+    def transition_ui(self, from_step, ui_dict):
+        self.ui_dict = ui_dict
+
+
+class RecordingExtension:
+    """
+    Stand-in for an extension: its tutorial mode can be toggled and any
+    other function succeeds doing nothing
+    """
+
+    def __init__(self):
+        self.enabled = False
+
+    def enable_tutorial(self):
+        self.enabled = True
+
+    def disable_tutorial(self):
+        self.enabled = False
+
+
+class RecordingComponents:
+    """
+    In-memory components for tutorial.Tutorial (see DBusComponents)
+
+    Every call is recorded in 'calls' as (component, function, args) and
+    replied to immediately. Calls to the extensions in 'failing_extensions'
+    fail instead. dom0 commands are recorded but never run.
+    """
+
+    def __init__(self, failing_extensions=()):
+        self.ui = RecordingUI()
+        self.extensions = {} # map: extension name -> RecordingExtension
+        self.failing_extensions = set(failing_extensions)
+        self.calls = []
+
+    def reset(self):
+        self.__init__(self.failing_extensions)
+
+    def get_method(self, component_name, function_name):
+        if component_name == tutorial.UI_COMPONENT:
+            component = self.ui
+        elif component_name == 'dom0':
+            component = None
+        else:
+            component = self.extensions.setdefault(component_name,
+                                                   RecordingExtension())
+
+        def method(*args, reply_handler=None, error_handler=None,
+                   timeout=None):
+            self.calls.append((component_name, function_name, args))
+            if component_name in self.failing_extensions:
+                error = tutorial.TutorialException(
+                    "{} is failing".format(component_name))
+                if error_handler is None:
+                    raise error
+                error_handler(error)
+                return
+            function = getattr(component, function_name, None)
+            reply = function(*args) if function else None
+            if reply_handler is None:
+                return reply
+            if reply is None:
+                reply_handler()
+            else:
+                reply_handler(reply)
+        return method
+
+    def get_calls(self, component_name):
+        """ Returns the (function, args) calls made to a component """
+        return [(function_name, args)
+                for called_component, function_name, args in self.calls
+                if called_component == component_name]
+
+
+class SimulationResult:
+    """
+    Outcome of replaying an interaction sequence
+    """
+
+    def __init__(self, sequence, steps, completed, num_calls, error=None):
+        self.sequence = sequence
+        self.steps = steps # names of the steps entered, in order
+        self.completed = completed # whether the end was reached
+        self.num_calls = num_calls # calls made to UI, dom0 and extensions
+        self.error = error # description of the exception raised, if any
+
+    def __repr__(self):
+        return "SimulationResult(steps={!r}, completed={!r}, error={!r})"\
+            .format(self.steps, self.completed, self.error)
+
+
+class HeadlessTutorial(tutorial.TutorialDebuggable):
+    """
+    Tutorial played without a main loop, the UI or D-Bus
+
+    Interactions are processed as soon as they are replayed, and the UI,
+    dom0 and extensions are in-memory stand-ins recording every call
+    (RecordingComponents by default), so that interaction sequences can be
+    replayed without GTK or a running Qubes OS (e.g. in CI).
+    """
+
+    def __init__(self, components=None, **kwargs):
+        super().__init__(components=components or RecordingComponents(),
+                         **kwargs)
+        self.finished = False
+        self.entered_steps = []
+
+    def start(self):
+        """
+        Enters the first step (without watching the system for interactions)
+        """
+        self.activate()
+        self.go_to_step(self.get_first_step())
+
+    def stop_loop(self):
+        # called once the last step was reached
+        self.entered_steps.append(self.current_step.name)
+        self.finished = True
+
+    def wakeup(self):
+        # there is no main loop: replay() processes interactions itself
+        pass
+
+    def go_to_step(self, next_step):
+        self.entered_steps.append(next_step.name)
+        super().go_to_step(next_step)
+
+    def reset(self):
+        self.current_step = None
+        self.transition = None
+        self.finished = False
+        self.entered_steps = []
+        self.extensions = set()
+        while not self.interactions_q.empty():
+            self.interactions_q.get()
+        self.components.reset()
+
+    def replay(self, sequence) -> SimulationResult:
+        """
+        Plays the tutorial from the start with the given interactions
+        """
+        self.reset()
+        error = None
+        try:
+            self.start()
+            for interaction in sequence:
+                if self.finished:
+                    break
+                self.interactions_q.put(interaction)
+                self.process_interactions()
+        except Exception as e:
+            error = "{}: {}".format(type(e).__name__, e)
+        return SimulationResult(list(sequence), self.entered_steps,
+                                self.finished, len(self.components.calls),
+                                error)
+
+
+def load_headless_tutorial(steps_data, tutorial_class=HeadlessTutorial):
+    tut = tutorial_class()
+    tut.load_steps_data(steps_data)
+    return tut
+
+# tutorial of each replay worker process
+_worker_tutorial = None
+
+def _init_worker(steps_data):
+    global _worker_tutorial
+    _worker_tutorial = load_headless_tutorial(steps_data)
+
+def _replay_in_worker(sequence):
+    return _worker_tutorial.replay(sequence)
+
+def replay_sequences(steps_data, sequences, processes=None,
+                     chunksize=64):
+    """
+    Replays interaction sequences in parallel (one tutorial per process)
+
+    :param steps_data: the tutorial's steps, as loaded from its source
+        (see bundle.read_steps_data) or from a bundle's "steps"
+    :param sequences: iterable of interaction sequences
+    :param processes: number of worker processes (CPU count by default)
+    :return: list of SimulationResult, in the order of sequences
+    """
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes, initializer=_init_worker,
+                             initargs=(steps_data,)) as executor:
+        return list(executor.map(_replay_in_worker, sequences,
+                                 chunksize=chunksize))
+
+def replay_tutorial(tutorial_path, covering=False, processes=None):
+    """
+    Replays every successful interaction sequence of a tutorial file (or a
+    set of sequences covering every transition, with covering)
+
+    :return: list of SimulationResult
+    """
+    if tutorial_path.endswith(bundle.BUNDLE_EXTENSION):
+        compiled = bundle.load_bundle(tutorial_path)
+        if compiled is None:
+            raise tutorial.TutorialException(
+                "Not a valid compiled tutorial: {}".format(tutorial_path))
+    else:
+        compiled = bundle.load_cached(tutorial_path)
+    steps_data = compiled["steps"]
+    tut = load_headless_tutorial(steps_data)
+    sequences = tut.generate_successful_interaction_sequences(covering)
+    return replay_sequences(steps_data, sequences, processes)
@@ -0,0 +1,134 @@
+import threading
+import time
+import unittest
+
+import qubes_tutorial.admin as admin
+
+class FakeQube:
+    """ qubesadmin qube whose admin calls take 'latency' seconds """
+
+    def __init__(self, app, name):
+        self.app = app
+        self.name = name
+        self.tags = FakeTags(self)
+        super().__setattr__("debug", False)
+
+    def __setattr__(self, name, value):
+        if name == "debug":
+            self.app.call()
+        super().__setattr__(name, value)
+
+
+class FakeTags(set):
+
+    def __init__(self, qube):
+        super().__init__()
+        self.qube = qube
+
+    def add(self, tag):
+        self.qube.app.call()
+        super().add(tag)
+
+    def discard(self, tag):
+        self.qube.app.call()
+        super().discard(tag)
+
+
+class FakeDomains(dict):
+    """ qubesadmin app's cache of qubes, which isn't thread-safe """
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.lookups = 0
+        self.concurrent_lookups = False
+
+    def __getitem__(self, name):
+        self.lookups += 1
+        lookups = self.lookups
+        time.sleep(self.app.latency / 10)
+        if self.lookups != lookups:
+            self.concurrent_lookups = True
+        return super().__getitem__(name)
+
+
+class FakeApp:
+    """ Local stand-in for qubesadmin.Qubes """
+
+    def __init__(self, qube_names, latency=0.05):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.num_calls = 0
+        self.max_concurrent_calls = 0
+        self.concurrent_calls = 0
+        self.domains = FakeDomains(self)
+        for name in qube_names:
+            self.domains[name] = FakeQube(self, name)
+
+    def call(self):
+        with self.lock:
+            self.num_calls += 1
+            self.concurrent_calls += 1
+            self.max_concurrent_calls = max(self.max_concurrent_calls,
+                                            self.concurrent_calls)
+        time.sleep(self.latency)
+        with self.lock:
+            self.concurrent_calls -= 1
+
+
+class TestAdminClient(unittest.TestCase):
+
+    def setUp(self):
+        self.qube_names = ["qube-{}".format(n) for n in range(8)]
+        self.app = FakeApp(self.qube_names)
+        self.client = admin.AdminClient(self.app)
+
+    def test_001_tags(self):
+        # WHEN tagging all qubes
+        start_time = time.perf_counter()
+        failures = self.client.add_tag(self.qube_names)
+        elapsed = time.perf_counter() - start_time
+
+        # THEN all were tagged concurrently before returning
+        self.assertEqual(failures, {})
+        for qube in self.app.domains.values():
+            self.assertEqual(qube.tags, {admin.TUTORIAL_TAG})
+        self.assertEqual(self.app.max_concurrent_calls, 8)
+        self.assertLess(elapsed, 8 * self.app.latency)
+
+        self.client.remove_tag(self.qube_names)
+        for qube in self.app.domains.values():
+            self.assertEqual(qube.tags, set())
+
+    def test_002_set_property(self):
+        self.client.set_property(self.qube_names[:2], "debug", True)
+
+        self.assertTrue(self.app.domains["qube-0"].debug)
+        self.assertTrue(self.app.domains["qube-1"].debug)
+        self.assertFalse(self.app.domains["qube-2"].debug)
+        self.assertEqual(self.app.num_calls, 2)
+
+    def test_003_failures(self):
+        # GIVEN a qube that doesn't exist
+        with self.assertLogs(level="ERROR"):
+            failures = self.client.add_tag(["qube-0", "missing"])
+
+        # THEN it is reported and the others are still tagged
+        self.assertEqual(list(failures), ["missing"])
+        self.assertIsInstance(failures["missing"], KeyError)
+        self.assertEqual(self.app.domains["qube-0"].tags,
+                         {admin.TUTORIAL_TAG})
+
+    def test_004_nothing_to_do(self):
+        client = admin.AdminClient()
+        self.assertEqual(client.add_tag([]), {})
+        self.assertIsNone(client._app)
+
+    def test_005_qubes_looked_up_one_at_a_time(self):
+        # WHEN changing several qubes at once
+        self.client.add_tag(self.qube_names)
+
+        # THEN the app's cache of qubes was never used by two threads at once
+        self.assertEqual(self.app.domains.lookups, 8)
+        self.assertFalse(self.app.domains.concurrent_lookups)
+        self.assertEqual(self.app.max_concurrent_calls, 8)
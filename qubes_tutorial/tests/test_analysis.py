@@ -0,0 +1,136 @@
+import unittest
+
+import qubes_tutorial.analysis as analysis
+import qubes_tutorial.simulation as simulation
+import qubes_tutorial.tutorial as tutorial
+
+class TestAnalysis(unittest.TestCase):
+
+    def load(self, steps_data):
+        tut = tutorial.Tutorial()
+        tut.load_steps_data(steps_data)
+        return tut
+
+    def test_001_index(self):
+        # GIVEN a tutorial using qubes in transitions and setup items
+        tut = self.load([
+            {"name": "start",
+             "ui": [{"type": "new_task", "task_description": "start"}],
+             "setup": [{"component": "qui-domains",
+                        "function": "highlight_qube",
+                        "parameters": {"qube": "vault"}}],
+             "transitions": [
+                 {"interaction": "qubes-events:work:domain-start",
+                  "step": "copy"}]},
+            {"name": "copy",
+             "teardown": [{"component": "dom0",
+                           "function": "qvm-shutdown-personal"}],
+             "transitions": [
+                 {"interaction": "qubes-qrexec-qubes.Filecopy+:work:personal",
+                  "step": "end"},
+                 {"interaction": "ui-callback:skip", "step": "end"}]},
+        ])
+
+        index = tut.tutorial_index
+
+        # THEN everything it touches is indexed
+        self.assertEqual(tut.get_scope(), ["personal", "vault", "work"])
+        self.assertEqual(index.get_watched_qubes(),
+                         ["personal", "vault", "work"])
+        self.assertEqual(index.qrexec_policies, {"qubes.Filecopy+"})
+        self.assertEqual(index.events_filter.get_event_names(),
+                         {"domain-start"})
+        self.assertEqual(index.extensions, {"qui-domains"})
+        self.assertEqual(index.num_tasks, 1)
+        self.assertIn("ui-callback:skip", index.interactions)
+
+    def test_002_no_qubes(self):
+        tut = self.load([{"name": "start", "transitions": [
+            {"interaction": "ui-callback:next", "step": "end"}]}])
+
+        self.assertEqual(tut.get_scope(), [])
+        self.assertEqual(tut.tutorial_index.get_watched_qubes(), [])
+        self.assertEqual(tut.tutorial_index.qrexec_policies, set())
+
+    def test_003_wildcards(self):
+        # GIVEN transitions on any event of any qube
+        tut = self.load([{"name": "start", "transitions": [
+            {"interaction": "qubes-events:*", "step": "end"},
+            {"interaction": "qubes-qrexec-qubes.OpenURL+:@dispvm:*",
+             "step": "end"}]}])
+        index = tut.tutorial_index
+
+        # THEN all qubes and events are watched
+        self.assertIsNone(index.get_watched_qubes())
+        self.assertIsNone(index.events_filter.get_event_names())
+        self.assertTrue(index.events_filter.accepts("vault", "domain-start"))
+        self.assertEqual(index.qrexec_policies, {"qubes.OpenURL+"})
+
+        index = analysis.TutorialIndex()
+        index.add_interaction(tutorial.interactions.Interaction("*"))
+        self.assertIsNone(index.qrexec_policies)
+
+    def test_004_no_target_nor_subject(self):
+        # GIVEN a qrexec call without a target and an event without a qube
+        tut = self.load([{"name": "start", "transitions": [
+            {"interaction": "qubes-qrexec-qubes.Filecopy+:work",
+             "step": "end"},
+            {"interaction": "qubes-events", "step": "end"}]}])
+        index = tut.tutorial_index
+
+        # THEN only the source of the call is watched
+        self.assertEqual(index.get_watched_qubes(), ["work"])
+        self.assertEqual(index.qrexec_policies, {"qubes.Filecopy+"})
+
+    def test_005_ui_files_preloaded(self):
+        # GIVEN a tutorial showing templates (one of them twice)
+        steps_data = [
+            {"name": "start",
+             "ui": [{"type": "modal", "template": "welcome.ui"}],
+             "transitions": [{"interaction": "tutorial:next",
+                              "step": "task"}]},
+            {"name": "task",
+             "ui": [{"type": "modal", "template": "task.ui"}],
+             "transitions": [{"interaction": "tutorial:back",
+                              "step": "start"},
+                             {"interaction": "tutorial:next",
+                              "step": "end"}]},
+        ]
+        tut = simulation.load_headless_tutorial(steps_data)
+
+        # WHEN the tutorial starts
+        tut.start()
+
+        # THEN the UI is sent all its templates once, before the first step
+        ui_calls = tut.components.get_calls(tutorial.UI_COMPONENT)
+        self.assertEqual(ui_calls[1],
+                         ("preload", (["welcome.ui", "task.ui"],)))
+        self.assertEqual(ui_calls[2][0], "setup_ui")
+
+    def test_006_events_filter(self):
+        # GIVEN transitions on events of a qube, any event of another and
+        # any property set on a third
+        tut = self.load([{"name": "start", "transitions": [
+            {"interaction": "qubes-events:work:domain-start", "step": "end"},
+            {"interaction": "qubes-events:personal:*", "step": "end"},
+            {"interaction": "qubes-events:vault:property-set:*",
+             "step": "end"},
+            {"interaction": "qubes-events:sys-net", "step": "end"}]}])
+        events_filter = tut.tutorial_index.events_filter
+
+        # THEN events are accepted when a transition matches them
+        self.assertIsNone(events_filter.get_event_names())
+        self.assertTrue(events_filter.accepts("work", "domain-start"))
+        self.assertTrue(events_filter.accepts("personal", "domain-shutdown"))
+        self.assertTrue(events_filter.accepts("vault", "property-set:netvm"))
+        self.assertFalse(events_filter.accepts("work", "domain-shutdown"))
+        self.assertFalse(events_filter.accepts("vault",
+                                               "property-reset:netvm"))
+        self.assertFalse(events_filter.accepts("sys-net", "domain-start"))
+
+        # THEN without wildcard subjects, only their events are subscribed to
+        events_filter = analysis.QubesEventsFilter()
+        events_filter.add("work", "domain-start")
+        events_filter.add("vault", "property-set:*")
+        self.assertEqual(events_filter.get_event_names(),
+                         {"domain-start", "property-set:*"})
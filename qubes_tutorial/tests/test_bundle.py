@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import qubes_tutorial.bundle as bundle
+
+TUTORIAL_MD = """\
+# Sample tutorial
+
+```yaml
+name: start
+ui:
+  - type: modal
+    template: start.ui
+transitions:
+  - interaction: tutorial:next
+    step: end
+```
+"""
+
+class TestBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tutorial_path = os.path.join(self.tmp_dir.name, "README.md")
+        with open(self.tutorial_path, 'w') as f:
+            f.write(TUTORIAL_MD)
+        env = patch.dict(os.environ, {"XDG_CACHE_HOME": self.tmp_dir.name})
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_001_compile(self):
+        compiled = bundle.compile_tutorial(self.tutorial_path)
+        self.assertEqual(compiled["version"], bundle.BUNDLE_VERSION)
+        self.assertEqual(compiled["templates"], ["start.ui"])
+        self.assertEqual(compiled["steps"][0]["name"], "start")
+
+    def test_002_load_cached_skips_parsing(self):
+        first = bundle.load_cached(self.tutorial_path)
+
+        with patch.object(bundle, 'read_steps_data') as read_steps_data:
+            second = bundle.load_cached(self.tutorial_path)
+            read_steps_data.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_003_recompiled_when_source_changes(self):
+        bundle.load_cached(self.tutorial_path)
+        with open(self.tutorial_path, 'a') as f:
+            f.write("\nMore text\n")
+
+        with patch.object(bundle, 'read_steps_data',
+                          wraps=bundle.read_steps_data) as read_steps_data:
+            bundle.load_cached(self.tutorial_path)
+            read_steps_data.assert_called_once()
+
+    def test_004_other_version_ignored(self):
+        compiled = bundle.compile_tutorial(self.tutorial_path)
+        compiled["version"] = bundle.BUNDLE_VERSION + 1
+        bundle_path = os.path.join(self.tmp_dir.name, "old.json")
+        bundle.save_bundle(compiled, bundle_path)
+
+        self.assertIsNone(bundle.load_bundle(bundle_path))
+
+    def test_005_recompiled_when_template_changes(self):
+        template_path = os.path.join(self.tmp_dir.name, "start.ui")
+        with open(template_path, 'w') as f:
+            f.write("<interface/>")
+        bundle.load_cached(self.tutorial_path)
+        with open(template_path, 'w') as f:
+            f.write("<interface><object/></interface>")
+
+        with patch.object(bundle, 'read_steps_data',
+                          wraps=bundle.read_steps_data) as read_steps_data:
+            bundle.load_cached(self.tutorial_path)
+            read_steps_data.assert_called_once()
+
+            # the recompiled bundle is cached again
+            bundle.load_cached(self.tutorial_path)
+            read_steps_data.assert_called_once()
+
+    def test_010_literate_steps_streamed(self):
+        md_lines = [
+            "Intro\n",
+            "```yaml\n",
+            "name: start\n",
+            "transitions: []\n",
+            "```\n",
+            "Text between steps\n",
+            "```yaml\n",
+            "name: second\n",
+            "transitions: []\n",
+            "name: third\n",
+            "transitions: []\n",
+            "```\n",
+        ]
+        steps = bundle.iter_literate_yaml_steps(iter(md_lines))
+
+        # first step is available before the rest of the file is read
+        self.assertEqual(next(steps),
+                         (3, "name: start\ntransitions: []\n"))
+        self.assertEqual([line_n for line_n, _ in steps], [8, 10])
+
+    def test_011_invalid_step_reported_with_line(self):
+        with open(self.tutorial_path, 'a') as f:
+            f.write("```yaml\nname: broken\n```\n")
+
+        with self.assertRaisesRegex(bundle.TutorialFormatException,
+                                    "README.md:13: .*broken"):
+            bundle.read_steps_data(self.tutorial_path)
+
+    def test_012_invalid_interaction_reported(self):
+        yaml_path = os.path.join(self.tmp_dir.name, "tutorial.yaml")
+        with open(yaml_path, 'w') as f:
+            f.write("- name: start\n"
+                    "  transitions:\n"
+                    "    - interaction: {type: qubes-events}\n"
+                    "      step: end\n")
+
+        with self.assertRaisesRegex(bundle.TutorialFormatException,
+                                    "tutorial.yaml:1: .*start"):
+            bundle.read_steps_data(yaml_path)
@@ -0,0 +1,160 @@
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import qubes_tutorial.commands as commands
+import qubes_tutorial.simulation as simulation
+import qubes_tutorial.tutorial as tutorial
+
+class TestCommandRunner(unittest.TestCase):
+
+    def setUp(self):
+        # callbacks run right away in the supervisor thread
+        self.runner = commands.CommandRunner(dispatch=lambda call: call())
+
+    def test_001_split_command(self):
+        self.assertEqual(commands.split_command("qvm-start 'my qube'"),
+                         ["qvm-start", "my qube"])
+        self.assertIsNone(commands.split_command("qvm-ls | grep work"))
+        self.assertIsNone(commands.split_command("LANG=C qvm-ls"))
+        self.assertIsNone(commands.split_command("echo $HOME"))
+        # shell builtins and brace groups
+        self.assertIsNone(commands.split_command("cd /tmp"))
+        self.assertIsNone(commands.split_command("source ~/.bashrc"))
+        self.assertIsNone(commands.split_command("export LANG"))
+        self.assertIsNone(commands.split_command("{ qvm-ls }"))
+
+    def test_002_run(self):
+        done = threading.Event()
+        results = []
+        def on_done(result):
+            results.append(result)
+            done.set()
+
+        # WHEN running commands with and without a shell
+        self.runner.run("true", on_done)
+        self.assertTrue(done.wait(5))
+        done.clear()
+        running = self.runner.run("exit 3 | true; exit 4", on_done)
+        self.assertTrue(done.wait(5))
+
+        # THEN they are reaped and their completion is reported
+        self.assertEqual([result.returncode for result in results], [0, 4])
+        self.assertTrue(results[0].is_success())
+        self.assertEqual(running.process.returncode, 4)
+        self.assertEqual(self.runner.get_running(), [])
+        self.assertEqual(list(self.runner.get_wall_times()),
+                         ["true", "exit 3 | true; exit 4"])
+
+    def test_003_timeout(self):
+        timed_out = threading.Event()
+
+        # WHEN a command takes longer than its timeout
+        running = self.runner.run("sleep 0.5", timeout=0.05,
+                                  on_timeout=lambda _: timed_out.set())
+
+        # THEN it is reported but still supervised until it exits
+        self.assertTrue(timed_out.wait(5))
+        self.assertIsNone(running.result)
+        result = running.wait(5)
+        self.assertTrue(result.is_success())
+        self.assertGreaterEqual(result.wall_time, 0.5)
+
+    def test_004_not_found(self):
+        with self.assertLogs(level="ERROR"):
+            running = self.runner.run("/nonexistent/command")
+        self.assertIsNone(running.wait(0).returncode)
+
+    def test_005_timeout_cancelled(self):
+        # WHEN a command exits before its timeout
+        running = self.runner.run("true", timeout=60,
+                                  on_timeout=lambda _: self.fail())
+        running.wait(5)
+
+        # THEN its timer doesn't keep the interpreter from exiting
+        self.assertTrue(running.timer.daemon)
+        running.timer.join(5)
+        self.assertFalse(running.timer.is_alive())
+
+    def test_006_shell_builtin(self):
+        running = self.runner.run("cd / && exit 2")
+        self.assertEqual(running.wait(5).returncode, 2)
+        running = self.runner.run("cd /")
+        self.assertTrue(running.wait(5).is_success())
+
+
+class TestSetupPrerequisites(unittest.TestCase):
+
+    def go_to_step(self, setup):
+        tut = simulation.load_headless_tutorial([
+            {"name": "start", "ui": [{"type": "modal"}], "setup": setup,
+             "transitions": [{"interaction": "next", "step": "end"}]}])
+        tut.start()
+        return [(component, function) for component, function, _ in
+                tut.components.calls if function != "set_num_tasks"]
+
+    def test_001_ui_after_prerequisites(self):
+        # GIVEN a step waiting for a dom0 command before its UI appears
+        calls = self.go_to_step([
+            {"component": "dom0", "function": "qvm-start work",
+             "wait": True},
+            {"component": "dom0", "function": "qvm-start personal"}])
+
+        # THEN the UI is set up once the command is done
+        self.assertEqual(calls, [("dom0", "qvm-start work"),
+                                 ("ui", "setup_ui"),
+                                 ("dom0", "qvm-start personal")])
+
+    def test_002_wait_for_command(self):
+        # GIVEN a prerequisite command failing
+        method = tutorial.get_dom0_command_method("exit 1")
+        errors = []
+        done = threading.Event()
+        def on_error(error):
+            errors.append(error)
+            done.set()
+
+        with patch.object(
+                commands.command_runner, 'dispatch', lambda call: call()):
+            method(True, reply_handler=done.set, error_handler=on_error,
+                   timeout=5)
+            self.assertTrue(done.wait(5))
+
+        # THEN the step transition gets an error
+        self.assertIsInstance(errors[0], tutorial.TutorialCommandException)
+
+    def test_003_wait_timeouts(self):
+        # GIVEN a step waiting for a dom0 command
+        step = tutorial.Step("start", setup_dicts=[
+            {"component": "dom0", "function": "qvm-start work",
+             "wait": True}])
+        timeouts = {}
+        def get_method(component_name, function_name):
+            def method(*args, reply_handler, error_handler, timeout):
+                timeouts[function_name] = timeout
+            return method
+        components = Mock()
+        components.get_method = get_method
+        transition = tutorial.StepTransition(None, step, lambda _: None,
+                                             timeout=1, components=components,
+                                             command_timeout=30)
+
+        # WHEN entering the step
+        with patch('gi.repository.GLib.timeout_add') as timeout_add:
+            transition.start()
+
+        # THEN the command isn't bound by the timeout of the other calls
+        self.assertEqual(timeouts, {"qvm-start work": 30})
+        self.assertEqual(timeout_add.call_args[0][0], 31000)
+
+    def test_004_blocking_wait_times_out(self):
+        # GIVEN a dom0 command that doesn't exit
+        method = tutorial.get_dom0_command_method("sleep 5")
+
+        # WHEN waiting for it without handlers
+        with patch.object(tutorial, 'DEFAULT_COMMAND_TIMEOUT', 0.05), \
+                self.assertLogs(level="ERROR"):
+            result = method(True)
+
+        # THEN the caller isn't blocked until it exits
+        self.assertIsNone(result)
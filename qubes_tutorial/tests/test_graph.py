@@ -0,0 +1,53 @@
+import unittest
+
+import qubes_tutorial.graph as graph
+import qubes_tutorial.tutorial as tutorial
+
+class TestCompactTutorial(unittest.TestCase):
+
+    def setUp(self):
+        self.tutorial = graph.CompactTutorial()
+        for name in ["start", "middle", "end"]:
+            self.tutorial.add_step(self.tutorial.create_step(name))
+        self.start = self.tutorial.get_step("start")
+        self.middle = self.tutorial.get_step("middle")
+        self.end = self.tutorial.get_step("end")
+
+    def test_001_steps_are_slotted(self):
+        self.assertFalse(hasattr(self.start, '__dict__'))
+        self.assertEqual(self.tutorial.get_first_step(), self.start)
+        self.assertEqual(self.tutorial.get_last_step(), self.end)
+        self.assertEqual(list(self.tutorial.get_steps()),
+                         [self.start, self.middle, self.end])
+
+    def test_002_add_step_twice(self):
+        self.assertRaises(tutorial.TutorialDuplicateStepException,
+                          self.tutorial.add_step,
+                          self.tutorial.create_step("middle"))
+
+    def test_010_transitions(self):
+        self.tutorial.add_transition(self.start, "tutorial:next", self.middle)
+        self.tutorial.add_transition(self.middle, "tutorial:back", self.start)
+        self.tutorial.add_transition(self.middle, "tutorial:next", self.end)
+
+        self.assertEqual(self.start.next("tutorial:next"), self.middle)
+        self.assertEqual(self.middle.next("tutorial:next"), self.end)
+        self.assertIsNone(self.start.next("tutorial:back"))
+        self.assertIsNone(self.start.next("never-seen"))
+        self.assertEqual(self.middle.get_next_steps(), [self.start, self.end])
+        self.assertEqual(self.middle.get_possible_interactions(),
+                         ["tutorial:back", "tutorial:next"])
+        # interactions are interned once for the whole tutorial
+        self.assertEqual(len(self.tutorial.graph.interactions), 2)
+
+    def test_011_add_duplicate_transition(self):
+        self.start.add_transition("tutorial:next", self.middle)
+        self.assertRaises(tutorial.TutorialDuplicateTransitionException,
+                          self.start.add_transition, "tutorial:next",
+                          self.end)
+
+    def test_012_wildcard_transition(self):
+        self.start.add_transition("qubes-events:work:*", self.middle)
+        self.assertEqual(self.start.next("qubes-events:work:domain-start"),
+                         self.middle)
+        self.assertIsNone(self.start.next("qubes-events:personal:start"))
@@ -0,0 +1,73 @@
+import unittest
+
+try:
+    from gi.repository import Gdk, GLib, Gtk
+    import qubes_tutorial.gui.app as app
+    HAS_DISPLAY = Gdk.Display.get_default() is not None
+except (ImportError, ValueError, AttributeError):
+    HAS_DISPLAY = False
+
+def get_widgets():
+    """
+    Returns the widgets of all toplevel windows, including internal ones
+    such as the popovers of a window (whether or not Python references them)
+    """
+    widgets = []
+    def add(widget):
+        widgets.append(widget)
+        if isinstance(widget, Gtk.Container):
+            widget.forall(add)
+    for window in Gtk.Window.list_toplevels():
+        add(window)
+    return widgets
+
+def count_widgets():
+    """ Counts the widgets of all toplevel windows, by type """
+    counts = {}
+    for widget in get_widgets():
+        type_name = type(widget).__name__
+        counts[type_name] = counts.get(type_name, 0) + 1
+    return counts
+
+@unittest.skipUnless(HAS_DISPLAY, "needs GTK and a display")
+class TestStepInformationPointing(unittest.TestCase):
+
+    def setUp(self):
+        self.widget = app.StepInformationPointing()
+
+    def tearDown(self):
+        self.widget.destroy()
+
+    def iterate(self):
+        context = GLib.MainContext.default()
+        while context.pending():
+            context.iteration(False)
+
+    def update(self, n):
+        self.widget.update("Step {}".format(n), "Click here",
+                           100 + n, -100 - n,
+                           ["top left", "top right"][n % 2])
+        self.iterate()
+        popovers = [widget for widget in get_widgets()
+                    if isinstance(widget, Gtk.Popover)]
+        self.widget.teardown()
+        return popovers
+
+    def test_001_no_leak_over_updates(self):
+        # GIVEN a pointing step shown once
+        popovers = self.update(0)
+        region = self.widget.clickthrough_region
+        counts_before = count_widgets()
+
+        # WHEN it is updated as often as in a long tutorial
+        for n in range(1, 200):
+            popovers += self.update(n)
+
+        # THEN the same popover is shown on every step
+        self.assertEqual(len(popovers), 200)
+        self.assertEqual(set(popovers), {self.widget.popover})
+        self.assertIs(self.widget.clickthrough_region, region)
+
+        # THEN no widgets are left behind in the windows
+        self.assertEqual(count_widgets(), counts_before)
+        self.assertEqual(self.widget.popover_text.get_text(), "Step 199")
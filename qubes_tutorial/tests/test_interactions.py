@@ -0,0 +1,179 @@
+import pickle
+import threading
+import unittest
+from queue import Queue
+from unittest.mock import Mock, patch
+
+import qubes_tutorial.interactions as interactions
+import qubes_tutorial.listener as listener
+
+class TestInteraction(unittest.TestCase):
+
+    def test_001_interned(self):
+        interaction = interactions.Interaction("qubes-events", "work",
+                                               "domain-start")
+
+        self.assertIs(interaction, interactions.Interaction.from_string(
+            "qubes-events:work:domain-start"))
+        self.assertFalse(hasattr(interaction, '__dict__'))
+
+    def test_002_structure(self):
+        # GIVEN an interaction registered as a single string
+        interaction = interactions.Interaction(
+            "qubes-events:work:domain-start")
+
+        # THEN its parts can be matched on without parsing
+        self.assertEqual(interaction.name, "qubes-events")
+        self.assertEqual(interaction.subject, "work")
+        self.assertEqual(interaction.arguments, "domain-start")
+        self.assertEqual(interactions.Interaction("tutorial:next").subject,
+                         "next")
+
+    def test_003_compatible_with_strings(self):
+        interaction = interactions.Interaction("tutorial", "next")
+
+        self.assertEqual(interaction, "tutorial:next")
+        self.assertEqual(str(interaction), "tutorial:next")
+        self.assertEqual(hash(interaction), hash("tutorial:next"))
+        self.assertEqual({"tutorial:next": 1}.get(interaction), 1)
+        self.assertEqual({interaction: 1}.get("tutorial:next"), 1)
+        self.assertNotEqual(interaction, "tutorial:back")
+
+    def test_004_pickle(self):
+        interaction = interactions.QrexecPolicyInteraction(
+            True, "qubes.Filecopy", "work", "personal")
+
+        self.assertIs(pickle.loads(pickle.dumps(interaction)), interaction)
+
+    def test_005_qrexec_policy(self):
+        interaction = interactions.QrexecPolicyInteraction(
+            True, "qubes.Filecopy", "work", "personal")
+
+        self.assertEqual(interaction,
+                         "qubes-qrexec-qubes.Filecopy:work:personal")
+        self.assertEqual(interaction.source, "work")
+        self.assertEqual(interaction.target, "personal")
+        self.assertEqual(interaction.dump()["type"], "qrexec-policy-allow")
+
+    def test_006_qrexec_policy_from_string(self):
+        # GIVEN the same qrexec call allowed and denied
+        allowed = interactions.QrexecPolicyInteraction(
+            True, "qubes.Filecopy", "work", "personal")
+        denied = interactions.QrexecPolicyInteraction(
+            False, "qubes.Filecopy", "work", "personal")
+
+        # THEN each keeps its own outcome
+        self.assertTrue(allowed.success)
+        self.assertFalse(denied.success)
+        self.assertEqual(denied.policy, "qubes.Filecopy")
+
+        # THEN one read back from its string form is the same
+        parsed = interactions.QrexecPolicyInteraction.from_string(
+            "qubes-qrexec-denied-qubes.Filecopy:work:personal")
+        self.assertIs(parsed, denied)
+        self.assertEqual(parsed.dump()["type"], "qrexec-policy-deny")
+
+
+class TestInteractionsListener(unittest.TestCase):
+
+    def setUp(self):
+        self.interactions_q = Queue()
+        self.on_interaction = Mock()
+        with patch.object(listener, 'DBusGMainLoop'), \
+                patch.object(listener.dbus, 'SessionBus'), \
+                patch.object(listener.dbus.service, 'BusName'), \
+                patch.object(listener.dbus.service.Object, '__init__',
+                             return_value=None):
+            self.listener = listener.TutorialInteractionsListener(
+                self.interactions_q, self.on_interaction)
+
+    def tearDown(self):
+        interactions.local_listener = None
+
+    def get_queued(self):
+        queued = []
+        while not self.interactions_q.empty():
+            queued.append(self.interactions_q.get())
+        return queued
+
+    def test_001_register_interactions(self):
+        # WHEN a batch of interactions arrives
+        self.listener.register_interactions([
+            ("tutorial:next", "", ""),
+            ("qubes-events", "work", ""),
+            ("qubes-qrexec-qubes.Filecopy", "work", "personal")])
+
+        # THEN all are queued in order, waking up the tutorial once
+        queued = self.get_queued()
+        self.assertTrue(all(isinstance(interaction, interactions.Interaction)
+                            for interaction in queued))
+        self.assertEqual(queued,
+                         ["tutorial:next", "qubes-events:work",
+                          "qubes-qrexec-qubes.Filecopy:work:personal"])
+        self.assertEqual(self.on_interaction.call_count, 1)
+
+    def test_002_register_in_process(self):
+        # GIVEN the tutorial listens in this process
+        with patch.object(interactions.sender, 'add') as add:
+            # WHEN a watcher registers an interaction
+            interactions.register("qubes-events:work:domain-start")
+
+            # THEN it's queued without going through D-Bus
+            self.assertEqual(self.get_queued(),
+                             ["qubes-events:work:domain-start"])
+            add.assert_not_called()
+
+
+class TestInteractionsSender(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.sent_event = threading.Event()
+
+        def send(batch):
+            self.sent.append(batch)
+            self.sent_event.set()
+
+        self.sender = interactions.InteractionsSender(send, flush_delay=0.05,
+                                                      max_batch_size=3)
+
+    def test_001_flush_on_size(self):
+        self.sender.flush_delay = 60
+        for n in range(4):
+            self.sender.add("event", str(n))
+
+        # the first three are sent at once, the last one waits
+        self.assertTrue(self.sent_event.wait(5))
+        self.assertEqual(self.sent, [[("event", "0", ""), ("event", "1", ""),
+                                      ("event", "2", "")]])
+        self.assertTrue(self.sender.flush(5))
+        self.assertEqual(self.sent[1], [("event", "3", "")])
+
+    def test_002_flush_on_timer(self):
+        self.sender.add("event", "0")
+        self.sender.add("event", "1")
+        self.assertEqual(self.sent, [])
+
+        self.assertTrue(self.sent_event.wait(5))
+        self.assertEqual(self.sent, [[("event", "0", ""), ("event", "1", "")]])
+
+    def test_003_flush_empty(self):
+        self.assertTrue(self.sender.flush(5))
+        self.assertEqual(self.sent, [])
+
+    def test_004_sent_from_one_thread(self):
+        send_threads = set()
+        self.sender.send = lambda batch: send_threads.add(
+            threading.current_thread())
+
+        # WHEN interactions are added from several threads
+        adders = [threading.Thread(target=self.sender.add, args=("event",))
+                  for _ in range(10)]
+        for adder in adders:
+            adder.start()
+        for adder in adders:
+            adder.join()
+        self.assertTrue(self.sender.flush(5))
+
+        # THEN they are all sent by the sender thread
+        self.assertEqual(send_threads, {self.sender.thread})
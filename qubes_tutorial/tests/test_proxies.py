@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import Mock
+
+import qubes_tutorial.proxies as proxies
+
+class TestProxyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = Mock()
+        self.cache = proxies.ProxyCache(self.bus)
+
+    def get_ui_method(self, method_name):
+        return self.cache.get_method('org.qubes.tutorial.ui', '/',
+                                     'org.qubes.tutorial.ui', method_name)
+
+    def test_001_proxy_reused(self):
+        self.get_ui_method('setup_ui')
+        self.get_ui_method('setup_ui')
+        self.get_ui_method('teardown_ui')
+
+        self.assertEqual(self.bus.get_object.call_count, 1)
+        self.assertEqual(self.cache.proxies_created, 1)
+
+    def test_002_dropped_when_owner_changes(self):
+        self.get_ui_method('setup_ui')
+        on_owner_changed = self.bus.watch_name_owner.call_args[0][1]
+
+        # initial owner notification does not invalidate
+        on_owner_changed(':1.10')
+        self.get_ui_method('setup_ui')
+        self.assertEqual(self.bus.get_object.call_count, 1)
+
+        # UI process went away
+        on_owner_changed('')
+        self.get_ui_method('setup_ui')
+        self.assertEqual(self.bus.get_object.call_count, 2)
+
+        # name owner watched only once
+        self.assertEqual(self.bus.watch_name_owner.call_count, 1)
@@ -0,0 +1,107 @@
+import subprocess
+import sys
+import unittest
+
+import qubes_tutorial.simulation as simulation
+import qubes_tutorial.tutorial as tutorial
+
+STEPS_DATA = [
+    {"name": "start",
+     "ui": [{"type": "modal", "text": "Welcome"}],
+     "setup": [{"component": "qui-domains", "function": "highlight",
+                "parameters": {"qube": "work"}}],
+     "transitions": [{"interaction": "tutorial:next", "step": "task-1"},
+                     {"interaction": "tutorial:skip", "step": "end"}]},
+    {"name": "task-1",
+     "ui": [{"type": "current_task", "text": "Start work"}],
+     "setup": [{"component": "dom0", "function": "true"}],
+     "transitions": [{"interaction": "qubes-events:work:domain-start",
+                      "step": "end"},
+                     {"interaction": "tutorial:back", "step": "start"}]},
+]
+
+class TestHeadlessTutorial(unittest.TestCase):
+
+    def setUp(self):
+        self.tutorial = simulation.load_headless_tutorial(STEPS_DATA)
+        self.components = self.tutorial.components
+
+    def test_001_replay_successful_sequence(self):
+        # WHEN replaying a sequence that leads to the end
+        result = self.tutorial.replay(
+            ["tutorial:next", "qubes-events:personal:domain-start",
+             "qubes-events:work:domain-start"])
+
+        # THEN the tutorial went through its steps and finished
+        self.assertIsNone(result.error)
+        self.assertTrue(result.completed)
+        self.assertEqual(result.steps, ["start", "task-1", "end"])
+
+        # THEN the UI and extensions were used as they would be over D-Bus
+        self.assertEqual(self.components.get_calls(tutorial.UI_COMPONENT),
+            [("set_num_tasks", (0,)),
+             ("setup_ui", (STEPS_DATA[0]["ui"],)),
+             ("transition_ui", ("start", STEPS_DATA[1]["ui"])),
+             ("teardown_ui", ())])
+        self.assertEqual(self.components.get_calls("dom0"), [("true", ())])
+        self.assertEqual(self.components.get_calls("qui-domains"),
+                         [("enable_tutorial", ()),
+                          ("highlight", ("work",)),
+                          ("disable_tutorial", ())])
+        self.assertFalse(self.components.extensions["qui-domains"].enabled)
+
+    def test_002_replay_incomplete_sequence(self):
+        result = self.tutorial.replay(["tutorial:next", "tutorial:back"])
+
+        self.assertFalse(result.completed)
+        self.assertEqual(result.steps, ["start", "task-1", "start"])
+        self.assertEqual(self.components.ui.ui_dict, STEPS_DATA[0]["ui"])
+
+    def test_003_replay_is_repeatable(self):
+        first = self.tutorial.replay(["tutorial:skip"])
+        second = self.tutorial.replay(["tutorial:skip"])
+
+        self.assertEqual(first.steps, second.steps)
+        self.assertEqual(first.num_calls, second.num_calls)
+
+    def test_004_failing_extension(self):
+        # GIVEN an extension that doesn't reply
+        tut = simulation.HeadlessTutorial(
+            simulation.RecordingComponents(failing_extensions={"qui-domains"}))
+        tut.load_steps_data(STEPS_DATA)
+
+        result = tut.replay(["tutorial:skip"])
+
+        self.assertFalse(result.completed)
+        self.assertIn("TutorialExtensionsException", result.error)
+
+    def test_010_replay_all_sequences_in_parallel(self):
+        sequences = list(
+            self.tutorial.generate_successful_interaction_sequences())
+
+        results = simulation.replay_sequences(STEPS_DATA, sequences,
+                                              processes=2)
+
+        self.assertEqual([result.sequence for result in results], sequences)
+        self.assertTrue(all(result.completed for result in results))
+
+    def test_011_no_dbus_gtk_nor_qubes_needed(self):
+        # GIVEN a Python where D-Bus, GObject and Qubes OS modules can't be
+        # imported
+        script = "\n".join([
+            "import sys",
+            "for name in ('dbus', 'gi', 'qubesadmin', 'systemd'):",
+            "    sys.modules[name] = None",
+            "import qubes_tutorial.simulation as simulation",
+            "from qubes_tutorial.tests.test_simulation import STEPS_DATA",
+            "tut = simulation.load_headless_tutorial(STEPS_DATA)",
+            "result = tut.replay(['tutorial:skip'])",
+            "assert result.completed, result",
+        ])
+
+        # WHEN replaying a tutorial
+        process = subprocess.run([sys.executable, "-c", script],
+                                 capture_output=True, text=True)
+
+        # THEN it works
+        self.assertEqual(process.returncode, 0, process.stderr)
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import qubes_tutorial.gui.templates as templates
+
+class TestTemplateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.built = []
+        self.evicted = []
+        self.cache = templates.TemplateCache(self.build, max_size=2,
+                                             on_evict=self.evicted.append)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def build(self, path):
+        with open(path) as f:
+            widget_tree = (path, f.read(), len(self.built))
+        self.built.append(widget_tree)
+        return widget_tree
+
+    def write(self, name, content, mtime=1):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_001_reused(self):
+        path_1 = self.write("step_1.ui", "<interface/>")
+        path_2 = self.write("step_2.ui", "<interface/>")
+
+        # WHEN going back and forth between two steps
+        trees = [self.cache.get(path) for path in
+                 [path_1, path_2, path_1, path_2, path_1]]
+
+        # THEN each template is only built once
+        self.assertEqual(len(self.built), 2)
+        self.assertIs(trees[0], trees[2])
+        self.assertEqual(self.cache.get_stats(),
+                         {"hits": 3, "misses": 2, "size": 2})
+
+    def test_002_changed(self):
+        path = self.write("step.ui", "first")
+        self.cache.get(path)
+
+        # WHEN the template is edited
+        self.write("step.ui", "second", mtime=2)
+
+        # THEN it is built again
+        self.assertEqual(self.cache.get(path)[1], "second")
+        self.assertEqual([tree[1] for tree in self.evicted], ["first"])
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_003_lru(self):
+        paths = [self.write("step_{}.ui".format(n), str(n))
+                 for n in range(3)]
+
+        self.cache.get(paths[0])
+        self.cache.get(paths[1])
+        self.cache.get(paths[0])
+        self.cache.get(paths[2])
+
+        # THEN the least recently used template was dropped
+        self.assertEqual([tree[1] for tree in self.evicted], ["1"])
+        self.assertEqual(len(self.cache), 2)
+        self.cache.clear()
+        self.assertEqual(len(self.evicted), 3)
@@ -1,7 +1,8 @@
 import unittest
 import qubes_tutorial.tutorial as tutorial
 import qubes_tutorial.interactions as interactions
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
+from collections import OrderedDict
 import os
 import re
 from queue import Queue
@@ -60,6 +61,29 @@ class TestTutorial(unittest.TestCase):
         next_step = step.next(ignored_interaction)
         self.assertIsNone(next_step)
 
+    def test_013_wildcard_transition(self):
+        step = tutorial.Step("step1")
+        step_any = tutorial.Step("step_any")
+        step_work = tutorial.Step("step_work")
+        step_start = tutorial.Step("step_start")
+
+        step.add_transition("qubes-events:*", step_any)
+        step.add_transition("qubes-events:work:*", step_work)
+        step.add_transition("qubes-events:work:domain-start", step_start)
+
+        # exact transitions take precedence over wildcards
+        self.assertEqual(step.next("qubes-events:work:domain-start"),
+                         step_start)
+        # then the longest matching wildcard
+        self.assertEqual(step.next("qubes-events:work:domain-shutdown"),
+                         step_work)
+        self.assertEqual(step.next("qubes-events:personal:domain-start"),
+                         step_any)
+        # wildcards match at least one more segment
+        self.assertEqual(step.next("qubes-events:work"), step_any)
+        self.assertIsNone(step.next("qubes-events"))
+        self.assertFalse(step.has_transition("tutorial:next"))
+
     def test_050_start_tutorial_linear(self):
         """All interactions move to the next step
 
@@ -160,6 +184,237 @@ class TestTutorial(unittest.TestCase):
             # THEN reached last step
             self.assertEqual(last_step.is_last.call_count, 1)
 
+    def test_060_wakeup_coalesced(self):
+        with patch('gi.repository.GLib.idle_add') as idle_add:
+            # GIVEN several interactions arriving before the loop runs
+            self.tutorial.wakeup()
+            self.tutorial.wakeup()
+
+            # THEN processing is scheduled only once
+            self.assertEqual(idle_add.call_count, 1)
+
+            # WHEN the scheduled processing runs
+            self.tutorial._on_wakeup()
+            self.tutorial.wakeup()
+
+            # THEN the next interaction schedules it again
+            self.assertEqual(idle_add.call_count, 2)
+
+    def test_061_async_transition_buffers_interactions(self):
+        # GIVEN a tutorial start -> step2 -> step3 whose calls reply later
+        steps = [tutorial.Step(name) for name in ["start", "step2", "step3"]]
+        for step in steps:
+            self.tutorial.add_step(step)
+        self.tutorial.add_transition(steps[0], "next", steps[1])
+        self.tutorial.add_transition(steps[1], "next", steps[2])
+        pending_replies = []
+
+        def get_component_method(component_name, function_name):
+            def method(*args, reply_handler, error_handler, timeout):
+                pending_replies.append(reply_handler)
+            return method
+
+        with patch.object(tutorial, 'get_component_method',
+                          get_component_method), \
+                patch('gi.repository.GLib.idle_add'):
+            self.tutorial.current_step = steps[0]
+
+            # WHEN two interactions arrive before step2 was entered
+            self.tutorial.interactions_q.put("next")
+            self.tutorial.interactions_q.put("next")
+            self.tutorial.process_interactions()
+
+            # THEN the second one is kept until the transition completes
+            self.assertEqual(self.tutorial.current_step, steps[1])
+            self.assertEqual(self.tutorial.interactions_q.qsize(), 1)
+
+            for reply_handler in pending_replies:
+                reply_handler()
+            self.assertIsNone(self.tutorial.transition)
+            self.assertIn("step2", self.tutorial.get_transition_latencies())
+
+            self.tutorial.process_interactions()
+            self.assertEqual(self.tutorial.current_step, steps[2])
+
+    def test_062_async_transition_survives_failing_calls(self):
+        # GIVEN a step whose setup calls raise or never reply
+        step = tutorial.Step("start", setup_dicts=[
+            {"component": "broken", "function": "highlight"},
+            {"component": "lost", "function": "highlight"}])
+        entered = []
+
+        def get_method(component_name, function_name):
+            if component_name == "broken":
+                raise KeyError(component_name)
+            return lambda *args, **kwargs: None
+
+        components = Mock()
+        components.get_method = get_method
+        transition = tutorial.StepTransition(None, step, entered.append,
+                                             timeout=1,
+                                             components=components)
+        with patch('gi.repository.GLib.timeout_add') as timeout_add, \
+                patch('gi.repository.GLib.source_remove'):
+            # WHEN entering the step
+            transition.start()
+
+            # THEN the step is only waiting for the calls still pending
+            self.assertFalse(transition.is_done())
+            self.assertEqual(transition.pending_calls, 2)
+            delay, on_deadline, *args = timeout_add.call_args[0]
+            self.assertEqual(delay, 2000)
+
+            # WHEN the deadline passes
+            on_deadline(*args)
+
+        # THEN the step is entered anyway
+        self.assertTrue(transition.is_done())
+        self.assertEqual(entered, [transition])
+
+    def test_063_async_finish(self):
+        # GIVEN a tutorial about to reach its last step, whose calls reply
+        # later
+        steps = [tutorial.Step("start", teardown_dicts=[
+                     {"component": "dom0", "function": "true"}]),
+                 tutorial.Step("end")]
+        for step in steps:
+            self.tutorial.add_step(step)
+        self.tutorial.add_transition(steps[0], "next", steps[1])
+        calls = []
+        pending_replies = []
+
+        def get_component_method(component_name, function_name):
+            def method(*args, reply_handler, error_handler, timeout):
+                calls.append((component_name, function_name))
+                pending_replies.append(reply_handler)
+            return method
+
+        self.tutorial.stop_loop = Mock()
+        with patch.object(tutorial, 'get_component_method',
+                          get_component_method), \
+                patch('gi.repository.GLib.timeout_add'), \
+                patch('gi.repository.GLib.source_remove'):
+            self.tutorial.current_step = steps[0]
+
+            # WHEN the last step is reached
+            self.tutorial.interactions_q.put("next")
+            self.tutorial.process_interactions()
+
+            # THEN the step is torn down without blocking on the calls
+            self.assertEqual(calls, [("dom0", "true"),
+                                     (tutorial.UI_COMPONENT, "teardown_ui")])
+            self.tutorial.stop_loop.assert_not_called()
+
+            # THEN the tutorial ends once they reply
+            for reply_handler in pending_replies:
+                reply_handler()
+            self.tutorial.stop_loop.assert_called_once_with()
+            self.assertEqual(self.tutorial.current_step, steps[1])
+
+    def test_070_enable_extensions_collects_failures(self):
+        # GIVEN two running extensions and two that are not running
+        def get_extension_method(component_name, method_name):
+            def method(reply_handler, error_handler, timeout):
+                if component_name.startswith("running"):
+                    reply_handler()
+                else:
+                    error_handler(Exception("timed out"))
+            return method
+
+        with patch('qubes_tutorial.extensions.get_extension_method',
+                   get_extension_method):
+            # WHEN enabling all of them
+            with self.assertRaises(
+                    tutorial.TutorialExtensionsException) as context:
+                self.tutorial.enable_extensions(
+                    ["running1", "running2", "broken1", "broken2"])
+
+        # THEN all failures are reported at once
+        self.assertEqual(set(context.exception.failures.keys()),
+                         {"broken1", "broken2"})
+        self.assertEqual(self.tutorial.extensions, {"running1", "running2"})
+
+
+class TestTutorialDebuggable(unittest.TestCase):
+
+    def load(self, transitions):
+        """ Loads a tutorial from a list of (step, interaction, next step) """
+        steps_data = OrderedDict()
+        for step_name, interaction, next_step_name in transitions:
+            step_data = steps_data.setdefault(
+                step_name, {"name": step_name, "transitions": []})
+            step_data["transitions"].append({"interaction": interaction,
+                                             "step": next_step_name})
+        tut = tutorial.TutorialDebuggable()
+        tut.load_steps_data(list(steps_data.values()))
+        return tut
+
+    def replay(self, tut, sequence):
+        """ Returns the transitions used by an interaction sequence """
+        step = tut.get_first_step()
+        used = []
+        for interaction in sequence:
+            used.append((step.name, interaction))
+            step = step.next(interaction)
+        self.assertTrue(step.is_last())
+        return used
+
+    def test_001_all_sequences(self):
+        # GIVEN start -> a -> end, start -> b -> end and a -> b
+        tut = self.load([("start", "to-a", "a"), ("start", "to-b", "b"),
+                         ("a", "to-end", "end"), ("a", "to-b", "b"),
+                         ("b", "to-end", "end"), ("b", "to-start", "start")])
+
+        sequences = tut.generate_successful_interaction_sequences()
+
+        self.assertEqual(list(sequences), [["to-a", "to-end"],
+                                           ["to-a", "to-b", "to-end"],
+                                           ["to-b", "to-end"]])
+
+    def test_002_long_tutorial(self):
+        # GIVEN a tutorial longer than the recursion limit
+        num_steps = 5000
+        transitions = [("start", "next", "step-1")]
+        for n in range(1, num_steps):
+            transitions.append(("step-{}".format(n), "next",
+                                "step-{}".format(n + 1)))
+        transitions.append(("step-{}".format(num_steps), "next", "end"))
+        tut = self.load(transitions)
+
+        for covering in [False, True]:
+            sequences = list(tut.generate_successful_interaction_sequences(
+                covering=covering))
+            self.assertEqual(sequences, [["next"] * (num_steps + 1)])
+
+    def test_010_covering_sequences(self):
+        # GIVEN a tutorial of 20 consecutive choices between two steps
+        #   (over a million different sequences)
+        num_choices = 20
+        transitions = []
+        previous_steps = ["start"]
+        for n in range(num_choices):
+            steps = ["left-{}".format(n), "right-{}".format(n)]
+            for previous_step in previous_steps:
+                for step in steps:
+                    transitions.append((previous_step, step, step))
+            previous_steps = steps
+        for previous_step in previous_steps:
+            transitions.append((previous_step, "finish", "end"))
+        tut = self.load(transitions)
+
+        # WHEN asking for sequences covering all transitions
+        sequences = list(tut.generate_successful_interaction_sequences(
+            covering=True))
+
+        # THEN a handful are enough (each choice has 4 transitions)
+        self.assertEqual(len(sequences), 4)
+        # THEN all sequences lead to the end and cover every transition
+        used = set()
+        for sequence in sequences:
+            used.update(self.replay(tut, sequence))
+        self.assertEqual(used, {(step, interaction) for step, interaction, _
+                                in transitions})
+
 
 class TestTutorialSerialization(unittest.TestCase):
 
@@ -230,7 +485,8 @@ class TestTutorialDeserialization(unittest.TestCase):
 
     def test_002_load_from_yaml_simple_file(self):
         test_data_path = self.get_test_data_path(self.test_name, "yaml")
-        self.tut.load_as_file(test_data_path)
+        # without the cache of compiled bundles (see test_bundle.py)
+        self.tut.load_as_file(test_data_path, use_cache=False)
 
 
 class TestTutorialIncluded(unittest.TestCase):
@@ -243,7 +499,7 @@ class TestTutorialIncluded(unittest.TestCase):
         tut_path = os.path.join(cwd, file_path)
         tut_path = os.path.abspath(tut_path)
         tut = tutorial.TutorialDebuggable()
-        tut.load_as_file(tut_path)
+        tut.load_as_file(tut_path, use_cache=False)
         return tut
 
     def test_onboarding_tutorial_1(self):
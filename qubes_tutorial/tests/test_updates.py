@@ -0,0 +1,163 @@
+import unittest
+from unittest.mock import patch
+
+import qubes_tutorial.gui.updates as updates
+
+class TestUIUpdateQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.num_renders = 0
+        self.queue = updates.UIUpdateQueue(self.schedule_render)
+
+    def schedule_render(self):
+        self.num_renders += 1
+
+    def test_001_burst_coalesced(self):
+        # GIVEN a step change (teardown, then setup) and a quick second one
+        self.queue.teardown()
+        self.queue.setup([{"type": "modal", "template": "step1.ui"},
+                          {"type": "step_information", "text": "first"}],
+                         requested_time=1)
+        self.queue.teardown()
+        self.queue.setup([{"type": "modal", "template": "step2.ui"}],
+                         requested_time=2)
+
+        # WHEN rendering
+        update = self.queue.take()
+
+        # THEN a single render was scheduled, showing only the last state
+        self.assertEqual(self.num_renders, 1)
+        self.assertEqual(update.num_requests, 4)
+        self.assertTrue(update.teardown)
+        self.assertEqual(update.items,
+                         {"modal": {"type": "modal", "template": "step2.ui"}})
+        self.assertEqual(update.setup_times, {"modal": 2})
+        self.assertTrue(update.move_task_to_corner)
+        self.assertIsNone(self.queue.take())
+
+    def test_002_setups_merged(self):
+        # setups without a teardown in between add up (latest item wins)
+        self.queue.setup([{"type": "modal", "template": "a.ui"},
+                          {"type": "step_information", "text": "a"}])
+        self.queue.setup([{"type": "modal", "template": "b.ui"}])
+
+        update = self.queue.take()
+
+        self.assertFalse(update.teardown)
+        self.assertEqual(update.items["modal"]["template"], "b.ui")
+        self.assertEqual(update.items["step_information"]["text"], "a")
+
+    def test_003_tasks(self):
+        # GIVEN two new tasks before a render
+        self.queue.setup([{"type": "new_task", "task_description": "1"}])
+        self.queue.teardown()
+        self.queue.setup([{"type": "new_task", "task_description": "2"}])
+
+        update = self.queue.take()
+
+        # THEN both are counted, the current task staying in the center
+        self.assertEqual([task["task_description"]
+                          for task in update.new_tasks], ["1", "2"])
+        self.assertFalse(update.move_task_to_corner)
+        self.assertFalse(update.no_more_tasks)
+
+        # AND rendering again needs a new request
+        self.queue.setup([{"type": "no_more_tasks"}])
+        self.assertEqual(self.num_renders, 2)
+        self.assertTrue(self.queue.take().no_more_tasks)
+
+    def test_004_dict_protocol(self):
+        with self.assertRaises(Exception):
+            self.queue.setup([{"type": "unknown"}])
+        self.queue.setup([{"type": "none"}])
+        self.assertTrue(self.queue.take().forget_shown)
+
+    def test_005_transition(self):
+        # GIVEN a step showing a modal and its information
+        self.queue.setup([{"type": "modal", "template": "a.ui"},
+                          {"type": "step_information", "text": "a"}])
+        self.queue.take()
+
+        # WHEN going to a step only showing a modal
+        self.queue.transition("step-a",
+                              [{"type": "modal", "template": "b.ui"}])
+        update = self.queue.take()
+
+        # THEN it is a single update tearing down what isn't shown anymore
+        self.assertEqual(update.num_requests, 1)
+        self.assertEqual(update.from_step, "step-a")
+        self.assertTrue(update.teardown)
+        self.assertEqual(list(update.items), ["modal"])
+
+
+class FakeWidget:
+    """ Widget whose frame clock ticks only when told to """
+
+    def __init__(self, mapped):
+        self.mapped = mapped
+        self.tick_callbacks = {}
+
+    def get_mapped(self):
+        return self.mapped
+
+    def add_tick_callback(self, callback):
+        tick_id = len(self.tick_callbacks) + 1
+        self.tick_callbacks[tick_id] = callback
+        return tick_id
+
+    def remove_tick_callback(self, tick_id):
+        del self.tick_callbacks[tick_id]
+
+    def tick(self):
+        for tick_id, callback in list(self.tick_callbacks.items()):
+            if not callback(self, None):
+                self.tick_callbacks.pop(tick_id, None)
+
+
+class TestRenderScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.num_renders = 0
+        self.hidden = FakeWidget(mapped=False)
+        self.shown = FakeWidget(mapped=True)
+        self.scheduler = updates.RenderScheduler(
+            self.render, [self.hidden, self.shown])
+
+    def render(self):
+        self.num_renders += 1
+
+    def test_001_rendered_on_next_frame(self):
+        with patch('gi.repository.GLib.timeout_add', return_value=7), \
+                patch('gi.repository.GLib.source_remove') as source_remove:
+            # WHEN several renders are requested before the next frame
+            self.scheduler.schedule()
+            self.scheduler.schedule()
+            self.assertEqual(list(self.hidden.tick_callbacks), [])
+
+            # THEN it is rendered once, on the frame of the widget shown
+            self.shown.tick()
+            self.assertEqual(self.num_renders, 1)
+            self.assertEqual(self.shown.tick_callbacks, {})
+            source_remove.assert_called_once_with(7)
+
+    def test_002_widget_hidden_before_next_frame(self):
+        with patch('gi.repository.GLib.timeout_add') as timeout_add, \
+                patch('gi.repository.GLib.source_remove'):
+            # GIVEN a render waiting for the frame of a widget
+            self.scheduler.schedule()
+            delay, on_timeout = timeout_add.call_args[0]
+            self.assertEqual(delay, updates.FRAME_TIMEOUT)
+
+            # WHEN the widget is hidden, so that the frame never comes
+            self.shown.mapped = False
+            on_timeout()
+
+            # THEN it is rendered anyway
+            self.assertEqual(self.num_renders, 1)
+            self.assertEqual(self.shown.tick_callbacks, {})
+
+            # THEN later requests are rendered too (and not dropped)
+            with patch('gi.repository.GLib.idle_add') as idle_add:
+                self.scheduler.schedule()
+            idle_add.call_args[0][0]()
+            self.assertEqual(self.num_renders, 2)
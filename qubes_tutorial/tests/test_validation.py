@@ -0,0 +1,100 @@
+import unittest
+
+import qubes_tutorial.graph as graph
+import qubes_tutorial.tutorial as tutorial
+import qubes_tutorial.validation as validation
+
+class TestValidation(unittest.TestCase):
+
+    def load(self, steps_data, tutorial_class=tutorial.Tutorial):
+        tut = tutorial_class()
+        tut.load_steps_data(steps_data)
+        return tut
+
+    @staticmethod
+    def step(name, *targets):
+        return {"name": name,
+                "transitions": [{"interaction": "go:" + target,
+                                 "step": target} for target in targets]}
+
+    def test_001_linear_tutorial_is_valid(self):
+        tut = self.load([self.step("start", "middle"),
+                         self.step("middle", "end")])
+
+        self.assertTrue(tut.validation_report.is_valid())
+        self.assertEqual(tut.validation_report.diagnostics, [])
+
+    def test_002_end_unreachable(self):
+        # GIVEN a tutorial whose steps never lead to "end"
+        steps_data = [self.step("start", "middle"),
+                      self.step("middle", "start")]
+
+        # WHEN loading it THEN it is rejected
+        with self.assertRaises(tutorial.TutorialIntegrityException) as context:
+            self.load(steps_data)
+        report = context.exception.report
+        self.assertEqual([d.code for d in report.errors], ["end-unreachable"])
+
+    def test_003_missing_start(self):
+        with self.assertRaises(tutorial.TutorialIntegrityException) as context:
+            self.load([self.step("first", "end")])
+        self.assertEqual([d.code for d in context.exception.report.errors],
+                         ["missing-start"])
+
+    def test_010_warnings(self):
+        # GIVEN a tutorial with
+        #   - an orphan step (unreachable)
+        #   - a dead end
+        #   - a loop that can't be left (trap)
+        tut = self.load([self.step("start", "end", "dead", "trap1"),
+                         self.step("orphan", "end"),
+                         self.step("dead"),
+                         self.step("trap1", "trap2"),
+                         self.step("trap2", "trap1")])
+        report = tut.validation_report
+
+        # THEN the tutorial is still valid, but each problem is reported
+        self.assertTrue(report.is_valid())
+        self.assertEqual(
+            [(d.code, d.steps) for d in report.warnings],
+            [("unreachable", ["orphan"]),
+             ("dead-end", ["dead"]),
+             ("cannot-reach-end", ["trap1"]),
+             ("cannot-reach-end", ["trap2"])])
+        self.assertEqual([d.steps for d in report.get(code="cycle")],
+                         [["trap1", "trap2"]])
+
+    def test_011_cycles(self):
+        # GIVEN a tutorial where the user can go back and retry a step
+        tut = self.load([self.step("start", "step1"),
+                         self.step("step1", "start", "step2"),
+                         self.step("step2", "step2", "end")])
+
+        cycles = tut.validation_report.get(level=validation.INFO,
+                                           code="cycle")
+
+        self.assertEqual(sorted(d.steps for d in cycles),
+                         [["start", "step1"], ["step2"]])
+        self.assertEqual(tut.validation_report.warnings, [])
+
+    def test_012_unknown_step(self):
+        with self.assertRaises(tutorial.TutorialUnknownStepException):
+            self.load([self.step("start", "nowhere")])
+
+    def test_020_long_tutorial(self):
+        # GIVEN a chain of steps much longer than the recursion limit
+        num_steps = 5000
+        steps_data = [self.step("start", "step-1")]
+        for n in range(1, num_steps):
+            steps_data.append(self.step("step-{}".format(n),
+                                        "step-{}".format(n + 1), "start"))
+        steps_data.append(self.step("step-{}".format(num_steps), "end"))
+
+        # WHEN validating it (with either step backend)
+        for tutorial_class in [tutorial.Tutorial, graph.CompactTutorial]:
+            tut = self.load(steps_data, tutorial_class)
+
+            # THEN all steps but the last two form a single cycle
+            cycles = tut.validation_report.get(code="cycle")
+            self.assertEqual(len(cycles), 1)
+            self.assertEqual(len(cycles[0].steps), num_steps)
@@ -0,0 +1,235 @@
+import asyncio
+import fnmatch
+import os
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import qubes_tutorial.analysis as analysis
+import qubes_tutorial.interactions as interactions
+import qubes_tutorial.watchers as watchers
+
+def get_events_filter(tutorial_interactions):
+    """ Returns the events filter of a tutorial with these transitions """
+    index = analysis.TutorialIndex()
+    for interaction in tutorial_interactions:
+        index.add_interaction(
+            interactions.Interaction.from_string(interaction))
+    return index.events_filter
+
+class FakeJournal:
+    """ Journal whose entries are written through a pipe """
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.entries = []
+
+    def write(self, message):
+        self.entries.append({'MESSAGE': message})
+        os.write(self.write_fd, b"\0")
+
+    def fileno(self):
+        return self.read_fd
+
+    def process(self):
+        try:
+            os.read(self.read_fd, 1024)
+        except BlockingIOError:
+            return watchers.systemd.journal.NOP
+        return watchers.systemd.journal.APPEND
+
+    def get_timeout_ms(self):
+        return -1
+
+    def seek_tail(self):
+        pass
+
+    def get_previous(self):
+        pass
+
+    def __iter__(self):
+        entries, self.entries = self.entries, []
+        return iter(entries)
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class TestSysLogWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.journal = FakeJournal()
+        with patch.object(watchers.systemd.journal, 'Reader',
+                          return_value=self.journal, create=True):
+            self.watcher = watchers.AbstractSysLogWatcher()
+        self.received = []
+        self.watcher.generate_interaction = self.on_line
+
+    def tearDown(self):
+        self.journal.close()
+
+    def on_line(self, line):
+        self.received.append((line, time.perf_counter()))
+
+    def test_001_entries_processed_when_written(self):
+        async def scenario():
+            task = self.watcher.get_task()
+            await asyncio.sleep(0)
+
+            # WHEN entries are written while another coroutine is running
+            loop = asyncio.get_running_loop()
+            written_time = time.perf_counter()
+            loop.call_later(0.01, self.journal.write, "first")
+            loop.call_later(0.01, self.journal.write, "second")
+            ticks = 0
+            while len(self.received) < 2:
+                await asyncio.sleep(0.001)
+                ticks += 1
+
+            self.watcher.stop()
+            await asyncio.wait_for(task, 5)
+            return written_time, ticks
+
+        written_time, ticks = asyncio.run(scenario())
+
+        # THEN they're processed together without blocking the loop
+        self.assertEqual([line for line, _ in self.received],
+                         ["first", "second"])
+        self.assertLess(self.received[0][1] - written_time, 0.1)
+        self.assertGreater(ticks, 5)
+
+
+class TestQrexecWatcher(unittest.TestCase):
+
+    def setUp(self):
+        with patch.object(watchers.systemd.journal, 'Reader', Mock(),
+                          create=True):
+            self.watcher = watchers.QrexecWatcher(["work", "personal"])
+
+    def test_001_generate_interaction(self):
+        lines = [
+            "Started Qubes qrexec policy daemon.",
+            "qrexec: qubes.Filecopy+: work -> @default: allowed to personal",
+            "qrexec: qubes.Filecopy+: vault -> @default: allowed to work",
+            "qrexec: qubes.Filecopy+: work -> vault: denied: policy",
+        ]
+
+        with patch.object(watchers.interactions,
+                          'register_interaction') as register_interaction:
+            for line in lines:
+                self.watcher.generate_interaction(line)
+
+        # THEN only the allowed call from a qube in scope is registered
+        self.assertEqual(register_interaction.call_count, 1)
+        interaction = register_interaction.call_args[0][0]
+        self.assertEqual(interaction,
+                         "qubes-qrexec-qubes.Filecopy+:work:personal")
+
+    def test_002_parse_line(self):
+        self.assertIsNone(self.watcher.parse_line("qrexec policy reloaded"))
+        # the prefix starts the journal's MESSAGE field
+        self.assertIsNone(self.watcher.parse_line(
+            "echo qrexec: qubes.Filecopy+: work -> work: allowed to work"))
+        action = self.watcher.parse_line(
+            "qrexec: qubes.Filecopy+: work -> @default: allowed to personal")
+        self.assertEqual(action.group("target"), "personal")
+
+    def test_003_policies(self):
+        # GIVEN a tutorial only transitioning on file copies
+        with patch.object(watchers.systemd.journal, 'Reader', Mock(),
+                          create=True):
+            watcher = watchers.QrexecWatcher(None, {"qubes.Filecopy+"})
+
+        with patch.object(watchers.interactions,
+                          'register_interaction') as register_interaction:
+            watcher.generate_interaction(
+                "qrexec: qubes.OpenURL+: vault -> @default: allowed to work")
+            watcher.generate_interaction(
+                "qrexec: qubes.Filecopy+: vault -> @default: allowed to work")
+
+        # THEN other calls are dropped (from any qube, as no scope is set)
+        self.assertEqual([call[0][0] for call in
+                          register_interaction.call_args_list],
+                         ["qubes-qrexec-qubes.Filecopy+:vault:work"])
+
+
+class FakeDispatcher:
+    """ EventsDispatcher delivering events to the handlers that match """
+
+    def __init__(self):
+        self.handlers = {} # map: event name pattern -> handlers
+
+    def add_handler(self, event_name, handler):
+        self.handlers.setdefault(event_name, []).append(handler)
+
+    def fire(self, subject, event_name):
+        # matched like qubesadmin.events.EventsDispatcher does
+        for pattern, handlers in self.handlers.items():
+            if fnmatch.fnmatch(event_name, pattern):
+                for handler in handlers:
+                    handler(subject, event_name)
+
+
+class TestQubesAdminWatcher(unittest.TestCase):
+
+    def fire_events(self, watcher, events):
+        dispatcher = FakeDispatcher()
+        watcher.add_handlers(dispatcher)
+        with patch.object(watchers.interactions, 'register') as register:
+            for subject, event_name in events:
+                dispatcher.fire(subject, event_name)
+        return dispatcher, [call[0] for call in register.call_args_list]
+
+    def test_002_only_tutorial_events_registered(self):
+        # GIVEN a tutorial transitioning on a single event
+        events_filter = get_events_filter(
+            ["qubes-events:work:domain-start"])
+        watcher = watchers.QubesAdminWatcher(["work", "personal"],
+                                             events_filter)
+
+        # WHEN a storm of events is fired
+        dispatcher, registered = self.fire_events(watcher, [
+            ("work", "property-set:label"),
+            ("personal", "domain-start"),
+            ("work", "domain-start"),
+            ("vault", "domain-start"),
+        ])
+
+        # THEN only a handler for that event was subscribed
+        # AND only its interaction is registered
+        self.assertEqual(list(dispatcher.handlers), ["domain-start"])
+        self.assertEqual(registered,
+                         [("qubes-events", "work", "domain-start")])
+
+    def test_003_scope(self):
+        # GIVEN no filter, events of qubes in scope are all registered
+        watcher = watchers.QubesAdminWatcher(["work"])
+        dispatcher, registered = self.fire_events(watcher, [
+            ("work", "domain-start"),
+            ("vault", "domain-start"),
+        ])
+
+        self.assertEqual(list(dispatcher.handlers), ['*'])
+        self.assertEqual(registered,
+                         [("qubes-events", "work", "domain-start")])
+
+    def test_004_event_wildcard(self):
+        # GIVEN a tutorial transitioning on any property set on a qube
+        events_filter = get_events_filter(
+            ["qubes-events:work:property-set:*"])
+        watcher = watchers.QubesAdminWatcher(["work"], events_filter)
+
+        # WHEN events are fired
+        dispatcher, registered = self.fire_events(watcher, [
+            ("work", "property-set:netvm"),
+            ("work", "property-reset:netvm"),
+            ("work", "domain-start"),
+        ])
+
+        # THEN only the properties set are registered
+        self.assertEqual(list(dispatcher.handlers), ["property-set:*"])
+        self.assertEqual(registered,
+                         [("qubes-events", "work", "property-set:netvm")])
+        self.assertFalse(events_filter.accepts("vault", "property-set:netvm"))
@@ -1,7 +1,6 @@
+import abc
 import argparse
-import asyncio
-from collections import OrderedDict
-import dbus
+from collections import deque, OrderedDict
 import json
 import yaml
 import logging
@@ -9,16 +8,30 @@ from queue import Queue
 import os
 import sys
 import subprocess
+import threading
 import time
 
-from gi.repository import GLib
-
-import qubes_tutorial.utils as utils
-import qubes_tutorial.watchers as watchers
+import qubes_tutorial.analysis as analysis
+import qubes_tutorial.bundle as bundle
 import qubes_tutorial.interactions as interactions
-import qubes_tutorial.extensions as extensions
+import qubes_tutorial.validation as validation
+
+# Modules talking to D-Bus, GLib or Qubes OS are imported where they are
+# used: loading, validating and simulating tutorials (see simulation.py)
+# works without them.
+
+# seconds to wait for each UI/extension call when changing steps
+DEFAULT_TRANSITION_TIMEOUT = 5
+
+# seconds to wait for an extension to enable or disable its tutorial mode
+DEFAULT_EXTENSION_TIMEOUT = 5
 
-def start_tutorial(tutorial_path):
+# seconds to wait for a dom0 command a step waits for ('wait: true', e.g.
+# starting a qube)
+DEFAULT_COMMAND_TIMEOUT = 60
+
+def start_tutorial(tutorial_path,
+                   extension_timeout=DEFAULT_EXTENSION_TIMEOUT):
     try:
         print("staring ui as separate process...")
         tutorial_dir_path = os.path.dirname(tutorial_path)
@@ -34,7 +47,7 @@ def start_tutorial(tutorial_path):
         # start controller only after UI initializes
         time.sleep(0.5)
         print("staring controller...")
-        tutorial = Tutorial()
+        tutorial = Tutorial(extension_timeout=extension_timeout)
         tutorial.load_as_file(tutorial_path)
         tutorial.start()
 
@@ -42,20 +55,23 @@ def start_tutorial(tutorial_path):
         ui.kill()
 
 def create_tutorial(outfile, scope):
+    import qubes_tutorial.watchers as watchers
     interactions_q = Queue()
-    watchers.start_interaction_logger(scope, interactions_q)
+    watchers.start_interaction_logger(scope)
 
     # TODO tutorial creation logic
 
     watchers.stop_interaction_logger(scope)
 
 def create_tutorial(outfile, scope, interactions_q):
+    import qubes_tutorial.utils as utils
+    import qubes_tutorial.watchers as watchers
     logging.info("creating tutorial")
 
     tutorial = Tutorial()
 
     try:
-        watchers.start_interaction_logger(scope, interactions_q)
+        watchers.start_interaction_logger(scope)
         # TODO global logs monitoring
 
         input("Press ctrl+c to stop")
@@ -63,40 +79,262 @@ def create_tutorial(outfile, scope, interactions_q):
     except KeyboardInterrupt:
         utils.gen_report(interactions_q)
 
+def compile_tutorial(tutorial_path, output_path=None):
+    """
+    Compiles a tutorial, writing it to output_path or to the cache
+    """
+    compiled = bundle.compile_tutorial(tutorial_path)
+    if output_path is None:
+        output_path = bundle.get_cache_path(compiled["source_hash"])
+    bundle.save_bundle(compiled, output_path)
+    print("compiled {} steps into {}".format(len(compiled["steps"]),
+                                             output_path))
+
+def validate_tutorial(tutorial_path):
+    """
+    Checks a tutorial without starting the UI or connecting to D-Bus
+
+    :return: True if no errors were found
+    """
+    tutorial = Tutorial()
+    try:
+        tutorial.load_as_file(tutorial_path, use_cache=False)
+    except TutorialIntegrityException as e:
+        print(e.report)
+        return False
+    except (TutorialException, bundle.TutorialFormatException) as e:
+        print("{}: {}".format(validation.ERROR, e))
+        return False
+    print(tutorial.validation_report)
+    return True
+
 def get_ui_proxy_method(method_name):
-        bus = dbus.SessionBus()
-        proxy = bus.get_object('org.qubes.tutorial.ui', '/')
-        return proxy.get_dbus_method(method_name, 'org.qubes.tutorial.ui')
+    import qubes_tutorial.proxies as proxies
+    return proxies.get_method('org.qubes.tutorial.ui', '/',
+                              'org.qubes.tutorial.ui', method_name)
 
-class Step:
-    """ Represents a current step in a tutorial """
+UI_COMPONENT = 'ui'
 
-    def __init__(self, name: str, ui_dict: dict=None, setup_dicts: dict=None,
-                 teardown_dicts: dict=None):
-        self.name = name
-        self.transitions = OrderedDict() # map: interaction -> step
-        self.ui_dict = ui_dict
-        self.setup_dicts = setup_dicts
-        self.teardown_dicts = teardown_dicts
+def get_component_method(component_name, function_name):
+    """
+    Obtains a callable for a function of the tutorial UI, dom0 (shell
+    command) or an extension.
+
+    Like D-Bus proxy methods, the callable accepts the keyword arguments
+    'reply_handler', 'error_handler' and 'timeout' to be called
+    asynchronously.
+    """
+    import qubes_tutorial.extensions as extensions
+    # FIXME check if component is valid
+    if component_name == UI_COMPONENT:
+        return get_ui_proxy_method(function_name)
+    elif component_name == 'dom0':
+        return get_dom0_command_method(function_name)
+    else:
+        return extensions.get_extension_method(component_name, function_name)
+
+def get_dom0_command_method(command: str):
+    """
+    Obtains a callable running a dom0 command (see commands.CommandRunner)
+
+    It replies as soon as the command is started, unless called with
+    wait=True: then it replies once the command has exited successfully
+    and fails if it exited with an error or is still running after the
+    timeout (DEFAULT_COMMAND_TIMEOUT by default). Called with wait=True and
+    without handlers, it blocks until the command exits (or the timeout
+    expires) and returns its CommandResult (None if still running).
+    """
+    import qubes_tutorial.commands as commands
+
+    def run_dom0_command(wait=False, reply_handler=None, error_handler=None,
+                         timeout=None):
+        runner = commands.command_runner
+        if not wait:
+            runner.run(command)
+            if reply_handler:
+                reply_handler()
+            return None
+        if timeout is None:
+            timeout = DEFAULT_COMMAND_TIMEOUT
+        if reply_handler is None and error_handler is None:
+            result = runner.run(command).wait(timeout)
+            if result is None:
+                logging.error("dom0 command '{}' still running after {} s, "
+                              "not waiting for it".format(command, timeout))
+            return result
+
+        answered = False
+        def answer(error=None):
+            nonlocal answered
+            if answered:
+                return
+            answered = True
+            if error is None:
+                if reply_handler:
+                    reply_handler()
+            elif error_handler:
+                error_handler(error)
+
+        def on_done(result):
+            if result.is_success():
+                answer()
+            else:
+                answer(TutorialCommandException(
+                    command, "exited with {}".format(result.returncode)))
+
+        def on_timeout(running):
+            answer(TutorialCommandException(
+                command, "still running after {} s".format(timeout)))
+
+        runner.run(command, on_done, timeout, on_timeout)
+        return None
+    return run_dom0_command
+
+class DBusComponents:
+    """
+    Components (UI, dom0 and extensions) a tutorial talks to, reached over
+    D-Bus (see get_component_method)
+
+    Other implementations of get_method can stand in for the real
+    components (see simulation.RecordingComponents).
+    """
+
+    def get_method(self, component_name, function_name):
+        return get_component_method(component_name, function_name)
+
+class InteractionPrefixMap:
+    """
+    Maps wildcard interactions to values (e.g. steps)
+
+    A wildcard interaction ends with the segment '*' and matches any
+    interaction that starts with the same segments and has at least one
+    more (segments are separated by ':'). For example 'qubes-events:work:*'
+    matches 'qubes-events:work:domain-start'.
+
+    Wildcards are kept in a trie of segments so matching an interaction
+    takes one dict lookup per segment, regardless of how many wildcards
+    there are. The longest matching wildcard wins.
+    """
+
+    SEPARATOR = analysis.SEPARATOR
+    WILDCARD = analysis.WILDCARD
+    _VALUE = None # trie node key holding the value of a wildcard
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    @classmethod
+    def is_wildcard(cls, interaction):
+        if isinstance(interaction, interactions.Interaction):
+            interaction = interaction.string
+        return isinstance(interaction, str) and (
+            interaction == cls.WILDCARD
+            or interaction.endswith(cls.SEPARATOR + cls.WILDCARD))
+
+    def add(self, wildcard: str, value):
+        node = self.root
+        for segment in str(wildcard).split(self.SEPARATOR)[:-1]:
+            node = node.setdefault(segment, {})
+        if self._VALUE not in node:
+            self.size += 1
+        node[self._VALUE] = value
+
+    def match(self, interaction: str):
+        """
+        Returns the value of the longest wildcard matching the interaction
+        """
+        if isinstance(interaction, interactions.Interaction):
+            interaction = interaction.string
+        elif not isinstance(interaction, str):
+            return None
+        match = None
+        node = self.root
+        segments = interaction.split(self.SEPARATOR)
+        for segment in segments:
+            # a wildcard must match at least one segment
+            match = node.get(self._VALUE, match)
+            node = node.get(segment)
+            if node is None:
+                break
+        return match
+
+    def __len__(self):
+        return self.size
+
+class AbstractStep(abc.ABC):
+    """
+    Represents a current step in a tutorial
+
+    Holds the behavior common to all steps, regardless of how they store
+    their transitions.
+    """
+    __slots__ = ()
 
     def execute(self, items_to_execute: dict=None):
         """
         Processes and executes setup or teardown items
         """
-        if items_to_execute is None:
-            return
-        for item in items_to_execute:
-            # FIXME check if component is valid
+        for component_name, function_name, args in \
+                self.get_item_calls(items_to_execute):
+            function = get_component_method(component_name, function_name)
+            function(*args)
+
+    def get_item_calls(self, items: dict=None):
+        """
+        Returns setup or teardown items as (component, function, args) calls
+        """
+        calls = []
+        if items is None:
+            return calls
+        for item in items:
             component_name  = item['component']
             function_name   = item['function']
             if component_name == 'dom0':
-                subprocess.Popen(function_name, shell=True)
+                args = (True,) if item.get('wait') else ()
             else:
-                # Sends a notification to the tutorial UI that it should update
-                args = item.get('parameters', {}).values()
-                function = extensions.get_extension_method(
-                    component_name, function_name)
-                function(*args)
+                args = tuple(item.get('parameters', {}).values())
+            calls.append((component_name, function_name, args))
+        return calls
+
+    def get_setup_calls(self, prerequisites: bool=True, from_step=None):
+        """
+        Returns all calls needed for initializing the step (the
+        prerequisite ones first)
+
+        Coming from another step, its UI is replaced by this step's in a
+        single call (its other teardown calls are in get_teardown_calls).
+        """
+        if from_step is None:
+            ui_call = (UI_COMPONENT, 'setup_ui', (self.get_ui_dict(),))
+        else:
+            ui_call = (UI_COMPONENT, 'transition_ui',
+                       (from_step.name, self.get_ui_dict()))
+        calls = [ui_call] + self.get_item_calls(
+            [item for item in self.setup_dicts or []
+             if not item.get('wait')])
+        if prerequisites:
+            calls = self.get_prerequisite_calls() + calls
+        return calls
+
+    def get_prerequisite_calls(self):
+        """
+        Returns the setup calls that must complete before the step's UI
+        appears (items with 'wait: true', e.g. a dom0 command starting a
+        qube the step is about)
+        """
+        return self.get_item_calls(
+            [item for item in self.setup_dicts or [] if item.get('wait')])
+
+    def get_teardown_calls(self, ui: bool=True):
+        """
+        Returns all calls needed for finishing the step (without tearing
+        down the UI if the next step replaces it, see get_setup_calls)
+        """
+        calls = self.get_item_calls(self.teardown_dicts)
+        if ui:
+            calls.append((UI_COMPONENT, 'teardown_ui', ()))
+        return calls
 
     def setup(self):
         """
@@ -105,18 +343,19 @@ class Step:
         self.setup_ui()
         self.execute(self.setup_dicts)
 
+    def get_ui_dict(self):
+        if self.ui_dict:
+            return self.ui_dict
+        # send "empty" dictionary since dbus yields the error
+        #    ValueError: Unable to guess singature from an empty dict
+        return [{'type': 'none'}]
+
     def setup_ui(self):
         """
         Sends a notification to the tutorial UI that it should update
         """
         setup_ui = get_ui_proxy_method('setup_ui')
-        if self.ui_dict:
-            logging.info(setup_ui(self.ui_dict))
-        else:
-            # send "empty" dictionary since dbus yields the error
-            #    ValueError: Unable to guess singature from an empty dict
-            empty_ui_dict = [{'type': 'none'}]
-            logging.info(setup_ui(empty_ui_dict))
+        logging.info(setup_ui(self.get_ui_dict()))
 
     def teardown_ui(self):
         teardown_ui = get_ui_proxy_method('teardown_ui')
@@ -148,17 +387,68 @@ class Step:
                     return True
         return False
 
+    def get_extensions(self):
+        components = set()
+        if self.setup_dicts:
+            for item in self.setup_dicts:
+                components.add(item['component'])
+
+        # dom0 shell does not count as extension
+        components.discard('dom0')
+        return components
+
+    @abc.abstractmethod
     def add_transition(self, interaction: str, target_step):
-        if self.has_transition(interaction):
-            raise TutorialDuplicateTransitionException(self, target_step)
+        pass
 
-        self.transitions[interaction] = target_step
+    @abc.abstractmethod
+    def next(self, interaction: str):
+        """
+        Returns the step to go to after an interaction (None if ignored)
+        """
+
+    @abc.abstractmethod
+    def get_next_steps(self):
+        """
+        Returns the steps to which the current node can transition.
+        """
+
+    @abc.abstractmethod
+    def get_possible_interactions(self):
+        pass
 
     def has_transition(self, interaction: str):
-        for tentative_interaction in self.transitions.keys():
-            if interaction == tentative_interaction:
-                return True
-        return False
+        return self.next(interaction) is not None
+
+    def dump(self):
+        dump = { "name": self.name }
+        possible_interactions = list(self.get_possible_interactions())
+        if len(possible_interactions) > 0:
+            dump["transitions"] = [t.dump() for t in possible_interactions]
+
+        return dump
+
+class Step(AbstractStep):
+    """ Step storing its transitions in a dict (see AbstractStep) """
+
+    def __init__(self, name: str, ui_dict: dict=None, setup_dicts: dict=None,
+                 teardown_dicts: dict=None):
+        self.name = name
+        self.transitions = OrderedDict() # map: interaction -> step
+        self.wildcard_transitions = None # InteractionPrefixMap, if any
+        self.ui_dict = ui_dict
+        self.setup_dicts = setup_dicts
+        self.teardown_dicts = teardown_dicts
+
+    def add_transition(self, interaction: str, target_step):
+        if interaction in self.transitions:
+            raise TutorialDuplicateTransitionException(self, target_step)
+
+        self.transitions[interaction] = target_step
+        if InteractionPrefixMap.is_wildcard(interaction):
+            if self.wildcard_transitions is None:
+                self.wildcard_transitions = InteractionPrefixMap()
+            self.wildcard_transitions.add(interaction, target_step)
 
     def get_next_steps(self):
         """
@@ -169,28 +459,174 @@ class Step:
     def get_possible_interactions(self):
         return self.transitions.keys()
 
-    def get_extensions(self):
-        components = set()
-        if self.setup_dicts:
-            for item in self.setup_dicts:
-                components.add(item['component'])
+    def next(self, interaction: str):
+        next_step = self.transitions.get(interaction)
+        if next_step is None and self.wildcard_transitions:
+            next_step = self.wildcard_transitions.match(interaction)
+        return next_step
 
-        # dom0 shell does not count as extension
-        components.discard('dom0')
-        return components
+class StepTransition:
+    """
+    Asynchronously leaves a step and enters the next one
+
+    All teardown calls of the previous step and setup calls of the next one
+    are sent at once, without waiting for each other's replies. The next
+    step is only considered entered once every call has replied, failed or
+    timed out, at which point 'on_entered' is called with this transition.
+    Calls that haven't replied after 'deadline' seconds are given up on, so
+    that a lost reply can't keep the step from being entered.
+
+    The UI goes from one step to the other with a single 'transition_ui'
+    call. If the next step has prerequisite calls, its UI and other setup
+    calls are only sent once those (and the teardown calls) are done.
+    Prerequisite dom0 commands (e.g. starting a qube) are waited for up to
+    'command_timeout' instead, and so is the deadline of their calls.
+
+    Going to the last step only tears down the previous one (UI included):
+    the last step ends the tutorial and is never set up.
+    """
 
-    def next(self, interaction: str):
-        for possible_interaction in self.transitions.keys():
-            if possible_interaction == interaction:
-                return self.transitions.get(possible_interaction)
-        return None
+    def __init__(self, from_step, to_step, on_entered,
+                 timeout: float=DEFAULT_TRANSITION_TIMEOUT,
+                 components=None, deadline: float=None,
+                 command_timeout: float=DEFAULT_COMMAND_TIMEOUT):
+        """
+        :param timeout: seconds to wait for each call
+        :param deadline: seconds to wait for all the calls sent at once
+            (twice the timeout by default)
+        :param command_timeout: seconds to wait for each prerequisite dom0
+            command
+        """
+        self.from_step = from_step
+        self.to_step = to_step
+        self.on_entered = on_entered
+        self.timeout = timeout
+        self.deadline = deadline or 2 * timeout
+        self.command_timeout = command_timeout
+        self.components = components or DBusComponents()
+        self.pending_calls = 0
+        self.deferred_calls = [] # sent once the pending ones are done
+        self.calls_sent = 0 # rounds of calls sent (replies to older ones
+                            # are ignored)
+        self.deadline_source = None # GLib source id, while calls are pending
+        self.start_time = None
+        self.latency = None
 
-    def dump(self):
-        dump = { "name": self.name }
-        if len(self.transitions) > 0:
-            dump["transitions"] = [t.dump() for t in self.transitions]
+    def start(self):
+        self.start_time = time.perf_counter()
+        if self.to_step.is_last():
+            self._send(self.from_step.get_teardown_calls())
+            return
 
-        return dump
+        calls = []
+        if self.from_step:
+            calls += self.from_step.get_teardown_calls(ui=False)
+        prerequisite_calls = self.to_step.get_prerequisite_calls()
+        setup_calls = self.to_step.get_setup_calls(prerequisites=False,
+                                                   from_step=self.from_step)
+        if prerequisite_calls:
+            calls += prerequisite_calls
+            self.deferred_calls = setup_calls
+        else:
+            calls += setup_calls
+        self._send(calls)
+
+    def _send(self, calls):
+        self.calls_sent += 1
+        calls_sent = self.calls_sent
+        self.pending_calls = len(calls)
+        deadline = self.deadline
+        for component_name, function_name, args in calls:
+            timeout = self.timeout
+            if self.is_waited_command(component_name, args):
+                timeout = self.command_timeout
+                # the command's own timeout expires first
+                deadline = max(deadline, self.command_timeout + self.timeout)
+            self._call(calls_sent, component_name, function_name, args,
+                       timeout)
+        if self.calls_sent == calls_sent and self.pending_calls > 0:
+            self._set_deadline(calls_sent, deadline)
+
+    @staticmethod
+    def is_waited_command(component_name, args):
+        """
+        Whether a call runs a dom0 command and waits for it to exit
+        """
+        return component_name == 'dom0' and args == (True,)
+
+    def is_done(self):
+        return self.latency is not None
+
+    def _call(self, calls_sent, component_name, function_name, args,
+              timeout):
+        answered = False
+
+        def on_answer():
+            nonlocal answered
+            if answered:
+                return
+            answered = True
+            if calls_sent == self.calls_sent and not self.is_done():
+                self._on_call_done()
+
+        def on_reply(*reply):
+            if reply:
+                logging.info(reply[0])
+            on_answer()
+
+        def on_error(error):
+            logging.error(f"{component_name}.{function_name} failed on step "
+                          + f"'{self.to_step.name}': {error}")
+            on_answer()
+
+        try:
+            function = self.components.get_method(component_name,
+                                                  function_name)
+            function(*args, reply_handler=on_reply, error_handler=on_error,
+                     timeout=timeout)
+        except Exception as error:
+            if answered:
+                # raised while handling the answer (e.g. by on_entered),
+                # not by the call
+                raise
+            on_error(error)
+
+    def _set_deadline(self, calls_sent, deadline):
+        from gi.repository import GLib
+        self.deadline_source = GLib.timeout_add(
+            int(deadline * 1000), self._on_deadline, calls_sent, deadline)
+
+    def _clear_deadline(self):
+        if self.deadline_source is not None:
+            from gi.repository import GLib
+            GLib.source_remove(self.deadline_source)
+            self.deadline_source = None
+
+    def _on_deadline(self, calls_sent, deadline):
+        if calls_sent == self.calls_sent and not self.is_done():
+            logging.error(f"{self.pending_calls} calls didn't reply within "
+                          + f"{deadline} s on step "
+                          + f"'{self.to_step.name}', giving up on them")
+            self.deadline_source = None
+            self.pending_calls = 0
+            self._on_calls_done()
+        return False # only once (as a GLib source)
+
+    def _on_call_done(self):
+        self.pending_calls -= 1
+        if self.pending_calls == 0:
+            self._on_calls_done()
+
+    def _on_calls_done(self):
+        self._clear_deadline()
+        if self.deferred_calls:
+            calls, self.deferred_calls = self.deferred_calls, []
+            self._send(calls)
+        else:
+            self.latency = time.perf_counter() - self.start_time
+            logging.info('entered step "{}" in {:.1f} ms'.format(
+                self.to_step.name, self.latency * 1000))
+            self.on_entered(self)
 
 class Tutorial:
     """ Represents a tutorial's steps and their transitions
@@ -201,129 +637,206 @@ class Tutorial:
     "Steps" are the nodes and "interactions" are the arcs
     """
 
-    def __init__(self, interactions_q=None):
+    def __init__(self, interactions_q=None, async_transitions=True,
+                 transition_timeout=DEFAULT_TRANSITION_TIMEOUT,
+                 extension_timeout=DEFAULT_EXTENSION_TIMEOUT,
+                 extension_timeouts: dict=None, components=None,
+                 admin_client=None):
+        """
+        :param async_transitions: step teardown/setup calls are sent
+            concurrently without blocking the controller (see StepTransition)
+        :param transition_timeout: seconds to wait for each call of a step
+            transition in async mode
+        :param extension_timeout: seconds to wait for an extension to be
+            enabled or disabled
+        :param extension_timeouts: per-extension overrides of
+            extension_timeout (map of extension name -> seconds)
+        :param components: how the UI, dom0 and extensions are reached
+            (DBusComponents by default)
+        :param admin_client: how qubes are changed (admin.AdminClient)
+        """
         self.tutorial_dir = None
+        self.extension_timeout = extension_timeout
+        self.extension_timeouts = extension_timeouts or {}
+        self.components = components or DBusComponents()
+        self._admin_client = admin_client
+        self.current_step = None
+        self.transition = None # ongoing StepTransition
+        self.async_transitions = async_transitions
+        self.transition_timeout = transition_timeout
+        self.transition_latencies = OrderedDict() # step name -> [seconds]
         self.extensions = set()
         self.step_map = OrderedDict() # maps a step's name to a step object
+        self.validation_report = None # of the last integrity check
+        self.tutorial_index = None # see analysis.analyze
         if interactions_q is None:
             self.interactions_q = Queue()
         else:
             self.interactions_q = interactions_q
-        interactions.TutorialInteractionsListener(self.interactions_q)
+        self.interactions_listener = None # created once the tutorial starts
 
         # setup tutorial loop
         #   Currently dbus-python only supports Glib event loop (can't have our own)
         #   https://dbus.freedesktop.org/doc/dbus-python/tutorial.html#setting-up-an-event-loop
         #
         #   Given that we use dbus to handle interactions, we have to use GLib.
-        self.loop = asyncio.SelectorEventLoop()
-        asyncio.set_event_loop(self.loop)
-        self.main_context = GLib.MainContext.default()
+        #   The controller runs entirely on the GLib main loop: it sleeps
+        #   until an interaction is queued, which schedules its processing
+        #   through wakeup(). There is no periodic polling.
+        self._main_loop = None # created when first needed
+        self.wakeup_lock = threading.Lock()
+        self.wakeup_scheduled = False
+
+    @property
+    def main_loop(self):
+        if self._main_loop is None:
+            from gi.repository import GLib
+            self._main_loop = GLib.MainLoop()
+        return self._main_loop
+
+    @property
+    def admin_client(self):
+        if self._admin_client is None:
+            import qubes_tutorial.admin as admin
+            self._admin_client = admin.admin_client
+        return self._admin_client
 
     def check_integrity(self):
         """
-        Checks if the tutorial makes sense
-        """
-        # has a first and last step
-        self.get_step("start")
-        self.get_step("end")
-
-        # TODO last step is reachable from first step
+        Checks if the tutorial makes sense (see validation.validate)
 
-        # TODO is a directed acyclic graph
-
-        # TODO has no dead-ends
-
-        # TODO all steps are reachable
+        Warnings are only logged. Raises TutorialIntegrityException if the
+        tutorial can't be completed.
+        """
+        report = validation.validate(self)
+        self.validation_report = report
+        for diagnostic in report.diagnostics:
+            if diagnostic.level == validation.WARNING:
+                logging.warning(str(diagnostic))
+            elif diagnostic.level == validation.INFO:
+                logging.debug(str(diagnostic))
+        if not report.is_valid():
+            raise TutorialIntegrityException(report)
+        return report
 
     def get_scope(self):
         """
         Returns the list of VMs that are affected by the tutorial
         """
-        # TODO complete function by parsing all VMs and components in all steps
-        return ["personal", "work"]
+        if self.tutorial_index is None:
+            return []
+        return self.tutorial_index.get_scope()
 
     def load_as_yaml(self, yaml_text):
         """
         Loads tutorial data from a list of steps
         """
-        steps_data = yaml.safe_load(yaml_text)
+        self.load_steps_data(bundle.parse_steps("<yaml>", yaml_text))
 
+    def load_steps_data(self, steps_data: list):
+        """
+        Loads tutorial data from an already parsed list of steps
+        """
         # create all steps (nodes)
-        steps = []
         for step_data in steps_data:
-            step = Step(step_data['name'],
-                        step_data.get('ui'),
-                        step_data.get('setup'),
-                        step_data.get('teardown'))
+            step = self.create_step(step_data['name'],
+                                    step_data.get('ui'),
+                                    step_data.get('setup'),
+                                    step_data.get('teardown'))
             self.add_step(step)
-        self.add_step(Step('end'))
+        self.add_step(self.create_step('end'))
 
         # add all transitions (edges)
         for step_data in steps_data:
             current_step = self.get_step(step_data['name'])
             for transition in step_data['transitions']:
                 next_step = self.get_step(transition['step'])
-                interaction = transition['interaction']
+                if next_step is None:
+                    raise TutorialUnknownStepException(current_step.name,
+                                                       transition['step'])
+                interaction = interactions.Interaction.from_string(
+                    transition['interaction'])
                 self.add_transition(current_step, interaction, next_step)
 
         self.check_integrity()
+        self.tutorial_index = analysis.analyze(self)
+        logging.debug(self.tutorial_index)
 
+    def activate(self):
+        """
+        Prepares the UI and extensions for the loaded tutorial
+        """
         # enable all tutorial extensions necessary
-        for step in self.get_steps():
-            for extension in step.get_extensions():
-                self.enable_extension(extension)
+        self.enable_extensions(self.tutorial_index.extensions)
 
-        # count num tasks (assumes tutorial linearity)
-        num_tasks = 0
-        for step in self.get_steps():
-            if step.is_new_task():
-                num_tasks += 1
-        set_num_tasks = get_ui_proxy_method('set_num_tasks')
-        set_num_tasks(num_tasks)
-
-    def load_as_file(self, file_path):
-        if file_path.endswith("yaml") or file_path.endswith("yml"):
-            self.tutorial_dir = os.path.dirname(file_path)
+        # num tasks assumes tutorial linearity
+        set_num_tasks = self.components.get_method(UI_COMPONENT,
+                                                   'set_num_tasks')
+        set_num_tasks(self.tutorial_index.num_tasks)
+
+        self.preload_ui()
+
+    def preload_ui(self):
+        """
+        Sends the UI the templates of all steps, to be loaded while the UI
+        is idle instead of when each step is shown
+        """
+        templates = self.tutorial_index.templates
+        if not templates:
+            return
+
+        def on_reply(*reply):
+            if reply:
+                logging.info(reply[0])
+
+        def on_error(error):
+            logging.warning(f"couldn't preload the UI: {error}")
+
+        try:
+            preload = self.components.get_method(UI_COMPONENT, 'preload')
+            preload(templates, reply_handler=on_reply,
+                    error_handler=on_error, timeout=self.transition_timeout)
+        except Exception as error:
+            on_error(error)
+
+    def load_as_file(self, file_path, use_cache=True):
+        """
+        Loads a tutorial from a .yaml, a literate .md or a compiled bundle
+
+        With use_cache, sources are compiled once and then loaded from the
+        cache of compiled bundles while they remain unchanged.
+        """
+        self.tutorial_dir = os.path.dirname(file_path)
+        if file_path.endswith(bundle.BUNDLE_EXTENSION):
+            self._load_as_file_bundle(file_path)
+        elif use_cache:
+            self.load_steps_data(bundle.load_cached(file_path)["steps"])
+        elif file_path.endswith("yaml") or file_path.endswith("yml"):
             self._load_as_file_yaml(file_path)
         elif file_path.endswith("md"):
-            self.tutorial_dir = os.path.dirname(file_path)
             self._load_as_file_literate_yaml(file_path)
         else:
             raise Exception("File not found: {}".format(file_path))
 
     def _load_as_file_yaml(self, file_path):
-        with open(file_path, 'r') as f:
-            return f.read()
+        self.load_steps_data(bundle.read_steps_data(file_path))
 
     def _load_as_file_literate_yaml(self, file_path):
         """
         Load tutorial from a literate markdown-yaml file
         """
-        md_text = ""
-        yaml_text = ""
-        with open(file_path, 'r') as f:
-            md_text = f.readlines()
-
-        # extract YAML blocks from Markdown
-        in_yaml_block = False
-        for md_line in md_text:
-            if "```yaml" in md_line:
-                in_yaml_block = True
-            elif in_yaml_block:
-                if md_line == "```\n":
-                    in_yaml_block = False
-                else:
-                    if md_line.startswith('name:'):
-                        yaml_text += "- " + md_line
-                    else:
-                        yaml_text += "  " + md_line
+        self.load_steps_data(bundle.read_steps_data(file_path))
 
-        self.load_as_yaml(yaml_text)
+    def _load_as_file_bundle(self, file_path):
+        compiled = bundle.load_bundle(file_path)
+        if compiled is None:
+            raise TutorialException(
+                "Not a valid compiled tutorial: {}".format(file_path))
+        self.load_steps_data(compiled["steps"])
 
     def save_as_text(self):
         tutorial = {
-            "steps": [step.dump() for step in self.step_map.values()]
+            "steps": [step.dump() for step in self.get_steps()]
         }
         return yaml.safe_dump(tutorial)
 
@@ -332,77 +845,222 @@ class Tutorial:
             tutorial_text = self.save_as_text()
             outfile.write(json.dumps(tutorial_text))
 
+    def get_extension_timeout(self, extension):
+        return self.extension_timeouts.get(extension, self.extension_timeout)
+
     def enable_extension(self, extension):
-        if extension in self.extensions:
+        self.enable_extensions([extension])
+
+    def enable_extensions(self, extension_names):
+        """
+        Enables the tutorial mode of several extensions concurrently
+
+        Raises TutorialExtensionsException listing every extension that
+        failed to be enabled (the others stay enabled).
+        """
+        to_enable = set(extension_names) - self.extensions
+        if not to_enable:
             return
-        logging.info(f"enabling extension {extension}")
-        try:
-            extensions.enable_extension(extension)
-            self.extensions.add(extension)
-        except:
-            raise Exception(f"Couldn't enable extension '{extension}'."
-                            + " Maybe it's not running?")
+        logging.info(f"enabling extensions {', '.join(sorted(to_enable))}")
+        failures = self._call_extensions(to_enable, "enable_tutorial")
+        self.extensions.update(to_enable - failures.keys())
+        if failures:
+            raise TutorialExtensionsException("enable", failures)
 
     def disable_extensions(self):
-        for extension in self.extensions.copy():
+        """
+        Disables the tutorial mode of all enabled extensions concurrently
+
+        Raises TutorialExtensionsException listing every extension that
+        failed to be disabled, after trying to disable all of them.
+        """
+        if not self.extensions:
+            return
+        logging.info("disabling extensions "
+                     + ', '.join(sorted(self.extensions)))
+        failures = self._call_extensions(self.extensions, "disable_tutorial")
+        self.extensions.intersection_update(failures.keys())
+        if failures:
+            raise TutorialExtensionsException("disable", failures)
+
+    def _call_extensions(self, extension_names, method_name):
+        import qubes_tutorial.proxies as proxies
+        calls = {}
+        failures = {}
+        for extension in extension_names:
             try:
-                logging.info(f"disabling extension {extension}")
-                extensions.disable_extension(extension)
-                self.extensions.remove(extension)
-            except:
-                raise Exception(f"Couldn't disable extension '{extension}'."
-                                + " Maybe it's not running?")
+                method = self.components.get_method(extension, method_name)
+            except Exception as error:
+                failures[extension] = error
+                continue
+            calls[extension] = \
+                (method, (), self.get_extension_timeout(extension))
+        failures.update(proxies.call_concurrently(calls))
+        return failures
 
     def start(self):
         """
         Plays the tutorial
         """
+        import qubes_tutorial.watchers as watchers
         logging.info("starting tutorial")
 
-        for vm in self.get_scope():
-            subprocess.Popen(["qvm-tags", vm, "add", "tutorial"])
+        self.listen_for_interactions()
+        self.activate()
 
-        self.current_step = self.get_first_step()
-        self.current_step.setup()
+        self.admin_client.add_tag(self.get_scope())
 
-        watchers.start_interaction_logger(self.get_scope())
-        self.glib_update(self.main_context, self.loop)
-        self.loop.run_forever()
+        self.go_to_step(self.get_first_step())
+
+        watchers.start_interaction_logger(
+            self.tutorial_index.get_watched_qubes(),
+            self.tutorial_index.events_filter,
+            self.tutorial_index.qrexec_policies)
+
+        # process anything queued before the loop started
+        self.wakeup()
+        self.main_loop.run()
+
+    def listen_for_interactions(self):
+        """
+        Starts receiving interactions over D-Bus into the interactions queue
+        """
+        import qubes_tutorial.listener as listener
+        if self.interactions_listener is None:
+            self.interactions_listener = \
+                listener.TutorialInteractionsListener(
+                    self.interactions_q, self.wakeup)
 
     def stop_loop(self):
-        self.loop.close()
+        import qubes_tutorial.watchers as watchers
+        self.main_loop.quit()
         watchers.stop_interaction_logger(self.get_scope())
+        self.admin_client.remove_tag(self.get_scope())
 
-        for vm in self.get_scope():
-            subprocess.Popen(["qvm-tags", vm, "remove", "tutorial"])
-
-    def glib_update(self, main_context, loop):
-        while main_context.pending():
-            main_context.iteration(False)
+    def wakeup(self):
+        """
+        Schedules the processing of queued interactions on the main loop
 
+        Safe to call from any thread. Several wakeups before the loop gets
+        to run are coalesced into a single call to process_interactions().
+        """
+        from gi.repository import GLib
+        with self.wakeup_lock:
+            if self.wakeup_scheduled:
+                return
+            self.wakeup_scheduled = True
+        GLib.idle_add(self._on_wakeup)
+
+    def _on_wakeup(self):
+        with self.wakeup_lock:
+            self.wakeup_scheduled = False
         self.process_interactions()
-        self.loop.call_later(.01, self.glib_update, main_context, loop)
+        return False # only once (as a GLib source)
 
     def process_interactions(self):
-        while not self.interactions_q.empty():
+        # while changing steps, interactions wait in the queue until the
+        # next step has been entered
+        while self.transition is None and not self.interactions_q.empty():
             interaction = self.interactions_q.get()
             if not self.current_step.has_transition(interaction):
                 logging.debug(f"[skip interaction] {interaction}")
                 continue
-            logging.info("[good interaction] " + interaction)
+            logging.info(f"[good interaction] {interaction}")
 
-            self.current_step.teardown()
             next_step = self.current_step.next(interaction)
             if next_step.is_last():
-                # TODO close UI process
-                self.disable_extensions()
-                exit()
+                self.finish(next_step)
+                return
             else:
-                logging.info('now on step "{}"'.format(self.current_step.name))
-                self.current_step = next_step
+                self.go_to_step(next_step)
+
+    def finish(self, last_step: Step):
+        """
+        Leaves the current step for the last one and, once the current step
+        is torn down, ends the tutorial
+        """
+        previous_step = self.current_step
+        # the last step has no transitions, so interactions received while
+        # finishing are ignored
+        self.current_step = last_step
+        logging.info("finishing tutorial")
+
+        # TODO close UI process
+        if self.async_transitions:
+            self.transition = StepTransition(previous_step, last_step,
+                                             self.on_finished,
+                                             self.transition_timeout,
+                                             self.components)
+            self.transition.start()
+        else:
+            self.execute_calls(previous_step.get_teardown_calls())
+            self.on_finished(None)
+
+    def on_finished(self, transition: StepTransition):
+        self.transition = None
+        try:
+            self.disable_extensions()
+        finally:
+            self.stop_loop()
+
+    def go_to_step(self, next_step: Step):
+        """
+        Leaves the current step (if any) and enters the next one
+        """
+        previous_step = self.current_step
+        self.current_step = next_step
+        logging.info('now on step "{}"'.format(next_step.name))
+
+        if self.async_transitions:
+            self.transition = StepTransition(previous_step, next_step,
+                                             self.on_step_entered,
+                                             self.transition_timeout,
+                                             self.components)
+            self.transition.start()
+        else:
+            start_time = time.perf_counter()
+            if previous_step:
+                self.execute_calls(previous_step.get_teardown_calls(ui=False))
+            self.execute_calls(next_step.get_setup_calls(
+                from_step=previous_step))
+            self.record_transition_latency(
+                next_step, time.perf_counter() - start_time)
+
+    def execute_calls(self, calls):
+        """
+        Executes (component, function, args) calls one after the other
+        """
+        for component_name, function_name, args in calls:
+            function = self.components.get_method(component_name,
+                                                  function_name)
+            reply = function(*args)
+            if reply is not None:
+                logging.info(reply)
+
+    def on_step_entered(self, transition: StepTransition):
+        self.record_transition_latency(transition.to_step, transition.latency)
+        if self.transition is transition:
+            self.transition = None
+            # process interactions buffered during the transition
+            self.wakeup()
+
+    def record_transition_latency(self, step: Step, latency: float):
+        self.transition_latencies.setdefault(step.name, []).append(latency)
+
+    def get_transition_latencies(self):
+        """
+        Returns how long (in seconds) entering each step took, as a map of
+        step name -> list of latencies (one per time the step was entered)
+        """
+        return self.transition_latencies
 
-                # FIXME add the following to GLib idle
-                self.current_step.setup()
+    def create_step(self, name: str, ui_dict: dict=None,
+                    setup_dicts: dict=None, teardown_dicts: dict=None):
+        """
+        Creates a step of the kind used by this tutorial (to be added with
+        add_step)
+        """
+        return Step(name, ui_dict, setup_dicts, teardown_dicts)
 
     def add_step(self, step: Step) -> None:
         if step.name not in self.step_map.keys():
@@ -412,10 +1070,10 @@ class Tutorial:
             logging.error("Step {} has been defined twice".format(step.name))
 
     def get_first_step(self) -> Step:
-        return self.step_map.get("start")
+        return self.get_step("start")
 
     def get_last_step(self) -> Step:
-        return self.step_map.get("end")
+        return self.get_step("end")
 
     def get_step(self, step_name: str):
         return self.step_map.get(step_name)
@@ -423,6 +1081,15 @@ class Tutorial:
     def get_steps(self):
         return self.step_map.values()
 
+    def get_possible_interactions(self):
+        """
+        Returns all interactions the tutorial has transitions on
+        """
+        possible_interactions = set()
+        for step in self.get_steps():
+            possible_interactions.update(step.get_possible_interactions())
+        return possible_interactions
+
     def add_transition(self, source_step: Step, interaction: str,
                        target_step: Step) -> None:
 
@@ -455,37 +1122,154 @@ class Tutorial:
 
 class TutorialDebuggable(Tutorial):
 
-    def generate_successful_interaction_sequences(self):
+    def generate_successful_interaction_sequences(self, covering=False):
         """
-        Returns the lists with all the possible interaction sequences (excluding
-        cycles) that take the user from the start until the end.
+        Yields the lists of interactions that take the user from the start
+        until the end.
+
+        By default yields all the possible interaction sequences (excluding
+        cycles), which may be exponentially many for tutorials with branches.
+        With covering, yields instead a small set of sequences which
+        together go through every transition (that can lead to the end) at
+        least once.
         """
+        if covering:
+            return self._generate_covering_interaction_sequences()
+        return self._generate_all_interaction_sequences()
 
-        success_interaction_sequences = []
+    def _generate_all_interaction_sequences(self):
         start_step = self.get_first_step()
         end_step = self.get_last_step()
+        if start_step is None or end_step is None:
+            return
+        if start_step is end_step:
+            yield []
+            return
 
-        def find_all_interaction_paths(current_step, visited_steps, path):
-            visited_steps.append(current_step)
-
-            if current_step == end_step:
-                success_interaction_sequences.append(path.copy())
+        # steps from which the end can't be reached lead to no sequence
+        reaches_end = set(self._get_paths_to_end().keys())
+
+        path = [] # interactions from the start to the step on top of stack
+        visited_steps = {start_step}
+        stack = [(start_step, iter(self._get_transitions(start_step)))]
+        while stack:
+            current_step, transitions = stack[-1]
+            for interaction, next_step in transitions:
+                if next_step in visited_steps or next_step not in reaches_end:
+                    continue
+                if next_step is end_step:
+                    yield path + [interaction]
+                    continue
+                visited_steps.add(next_step)
+                path.append(interaction)
+                stack.append((next_step,
+                              iter(self._get_transitions(next_step))))
+                break
             else:
-                for interaction in current_step.get_possible_interactions():
-                    next_step = current_step.next(interaction)
-                    if next_step not in visited_steps:
-                        path.append(interaction)
-                        find_all_interaction_paths(next_step, visited_steps, path)
+                # all transitions of current_step were explored
+                stack.pop()
+                visited_steps.discard(current_step)
+                if path:
+                    path.pop()
+
+    def _generate_covering_interaction_sequences(self):
+        """
+        Greedily covers each transition not yet covered with a path
+        start -> transition -> end, which reaches the transition by a
+        shortest path and then follows transitions not covered yet for as
+        long as possible (not necessarily the smallest set of sequences, but
+        at most one per transition)
+        """
+        start_step = self.get_first_step()
+        end_step = self.get_last_step()
+        if start_step is None or end_step is None:
+            return
+
+        paths_from_start = self._get_paths_from_start()
+        paths_to_end = self._get_paths_to_end()
+        covered = set() # (step, interaction) already in a sequence
+
+        # go through steps closest to the start first, so that each
+        # sequence also covers the transitions leading to later ones
+        for current_step in paths_from_start.keys():
+            for interaction, next_step in self._get_transitions(current_step):
+                if (current_step, interaction) in covered \
+                        or next_step not in paths_to_end:
+                    continue
+
+                sequence = []
+                step = current_step
+                while paths_from_start[step] is not None:
+                    previous_step, previous_interaction = \
+                        paths_from_start[step]
+                    sequence.append((previous_step, previous_interaction))
+                    step = previous_step
+                sequence.reverse()
+                sequence.append((current_step, interaction))
+                covered.update(sequence)
+
+                step = next_step
+                while step is not end_step:
+                    for step_interaction, following_step in \
+                            self._get_transitions(step):
+                        if (step, step_interaction) not in covered \
+                                and following_step in paths_to_end:
+                            break
+                    else:
+                        step_interaction, following_step = paths_to_end[step]
+                    covered.add((step, step_interaction))
+                    sequence.append((step, step_interaction))
+                    step = following_step
+
+                yield [step_interaction for _, step_interaction in sequence]
 
-            if len(path) > 0:
-                path.pop()
-            visited_steps.remove(current_step)
+    def _get_transitions(self, step):
+        """ Returns the (interaction, next step) pairs of a step """
+        return [(interaction, step.next(interaction))
+                for interaction in step.get_possible_interactions()]
 
-        visited = []
-        path = []
-        find_all_interaction_paths(start_step, visited, path)
+    def _get_paths_from_start(self):
+        """
+        Breadth-first search from the start step
 
-        return success_interaction_sequences
+        :return: map of each reachable step -> (previous step, interaction)
+            on a shortest path from the start (None for the start step), in
+            order of distance to the start
+        """
+        start_step = self.get_first_step()
+        paths = OrderedDict([(start_step, None)])
+        queue = deque([start_step])
+        while queue:
+            current_step = queue.popleft()
+            for interaction, next_step in self._get_transitions(current_step):
+                if next_step not in paths:
+                    paths[next_step] = (current_step, interaction)
+                    queue.append(next_step)
+        return paths
+
+    def _get_paths_to_end(self):
+        """
+        Breadth-first search towards the end step, over reversed transitions
+
+        :return: map of each step from which the end can be reached ->
+            (interaction, next step) on a shortest path to the end (None for
+            the end step)
+        """
+        end_step = self.get_last_step()
+        incoming = {} # map: step -> [(previous step, interaction)]
+        for step in self.get_steps():
+            for interaction, next_step in self._get_transitions(step):
+                incoming.setdefault(next_step, []).append((step, interaction))
+
+        paths = {end_step: None}
+        queue = deque([end_step])
+        while queue:
+            current_step = queue.popleft()
+            for previous_step, interaction in incoming.get(current_step, []):
+                if previous_step not in paths:
+                    paths[previous_step] = (interaction, current_step)
+                    queue.append(previous_step)
+        return paths
 
 class TutorialException(Exception):
     def __init__(self, message="Exception occured in the tutorial."):
@@ -502,6 +1286,34 @@ class TutorialDuplicateTransitionException(TutorialException):
             format(source_step.name, target_step.name)
         super().__init__(message)
 
+class TutorialUnknownStepException(TutorialException):
+    def __init__(self, source_step_name: str, target_step_name: str):
+        message = "Step '{}' has a transition to unknown step '{}'".\
+            format(source_step_name, target_step_name)
+        super().__init__(message)
+
+class TutorialIntegrityException(TutorialException):
+    def __init__(self, report):
+        self.report = report # validation.ValidationReport
+        message = "The tutorial can't be completed:"
+        for diagnostic in report.errors:
+            message += "\n  " + diagnostic.message
+        super().__init__(message)
+
+class TutorialCommandException(TutorialException):
+    def __init__(self, command: str, reason: str):
+        message = "dom0 command '{}' {}".format(command, reason)
+        super().__init__(message)
+
+class TutorialExtensionsException(TutorialException):
+    def __init__(self, action: str, failures: dict):
+        self.failures = failures # map: extension name -> error
+        message = "Couldn't {} extensions (maybe they're not running?):"\
+            .format(action)
+        for extension, error in sorted(failures.items()):
+            message += "\n  '{}': {}".format(extension, error)
+        super().__init__(message)
+
 def main():
     logging.basicConfig(
         level=logging.DEBUG,
@@ -516,16 +1328,42 @@ def main():
                         metavar="FILE",
                         help='Create a tutorial')
 
+    action_group.add_argument('--compile',
+                        type=str,
+                        metavar="FILE",
+                        help='Compile a tutorial (.yaml or literate .md) '\
+                            + 'into the cache of compiled tutorials, or '\
+                            + 'into the path given by --output')
+
     action_group.add_argument('--load', '-l',
                         type=str,
                         metavar="FILE",
                         help='Load a tutorial from a .yaml or literate .md.'\
                             + "\nFor example 'qubes_tutorial/included_tutorials/onboarding-tutorial-1/README.md'")
 
+    action_group.add_argument('--validate',
+                        type=str,
+                        metavar="FILE",
+                        help='Check a tutorial for unreachable steps, dead '\
+                            + 'ends and cycles (without starting it)')
+
     parser.add_argument('--scope', '-s',
                         type=str,
                         help='qubes affected (e.g. --scope=personal,work)')
 
+    parser.add_argument('--output', '-o',
+                        type=str,
+                        metavar="FILE",
+                        help='where to write the compiled tutorial '\
+                            + '(with --compile)')
+
+    parser.add_argument('--extension-timeout',
+                        type=float,
+                        default=DEFAULT_EXTENSION_TIMEOUT,
+                        metavar="SECONDS",
+                        help='how long to wait for each extension to be '\
+                            + 'enabled or disabled')
+
     args = parser.parse_args()
 
     scope = list()
@@ -534,8 +1372,13 @@ def main():
 
     if args.create:
         create_tutorial(args.create, scope)
+    elif args.compile:
+        compile_tutorial(args.compile, args.output)
+    elif args.validate:
+        if not validate_tutorial(args.validate):
+            sys.exit(1)
     elif args.load:
-        start_tutorial(args.load)
+        start_tutorial(args.load, args.extension_timeout)
 
 
 if __name__ == '__main__':
@@ -35,25 +35,19 @@ def get_window_title(winid):
     # FIXME add "<unnamed window>" case
     return re.search('"([^"]+)', str(untrusted_wininfo)).group(1)
 
-def enable_vm_debug(vm):
-    """ enables debug mode for VM """
-
-    try:
-        command = ["qvm-prefs", "--set", vm, "debug", "True"]
-        subprocess.check_output(command)
-        logging.debug("enabled debug mode for qube {}".format(vm))
-    except subprocess.CalledProcessError:
-        logging.error("failed to enable debug mode for qube {}".format(vm))
-
-def disable_vm_debug(vm):
-    """ enables debug mode for VM """
-
-    try:
-        command = ["qvm-prefs", "--set", vm, "debug", "False"]
-        subprocess.check_output(command)
-        logging.debug("disabled debug mode for qube {}".format(vm))
-    except subprocess.CalledProcessError:
-        logging.error("failed to disable debug mode for qube {}".format(vm))
+def enable_vm_debug(*vms):
+    """ enables debug mode for VMs (concurrently) """
+    import qubes_tutorial.admin as admin
+
+    if not admin.admin_client.set_property(vms, "debug", True):
+        logging.debug("enabled debug mode for qubes {}".format(vms))
+
+def disable_vm_debug(*vms):
+    """ disables debug mode for VMs (concurrently) """
+    import qubes_tutorial.admin as admin
+
+    if not admin.admin_client.set_property(vms, "debug", False):
+        logging.debug("disabled debug mode for qubes {}".format(vms))
 
 def window_viewable(winid):
     """ Checks if an windows is viewable """
@@ -0,0 +1,189 @@
+from collections import deque
+
+ERROR = "error"
+WARNING = "warning"
+INFO = "info"
+
+class Diagnostic:
+    """
+    Problem (or noteworthy fact) found while validating a tutorial
+    """
+
+    def __init__(self, level: str, code: str, message: str, steps=()):
+        self.level = level
+        self.code = code # machine-readable kind of problem
+        self.message = message
+        self.steps = list(steps) # names of the steps concerned
+
+    def __str__(self):
+        return "{}: [{}] {}".format(self.level, self.code, self.message)
+
+    def __repr__(self):
+        return "Diagnostic({!r}, {!r}, {!r}, {!r})".format(
+            self.level, self.code, self.message, self.steps)
+
+class ValidationReport:
+
+    def __init__(self):
+        self.diagnostics = []
+
+    def add(self, level: str, code: str, message: str, steps=()):
+        self.diagnostics.append(Diagnostic(level, code, message, steps))
+
+    def get(self, level: str=None, code: str=None):
+        return [d for d in self.diagnostics
+                if (level is None or d.level == level)
+                and (code is None or d.code == code)]
+
+    @property
+    def errors(self):
+        return self.get(level=ERROR)
+
+    @property
+    def warnings(self):
+        return self.get(level=WARNING)
+
+    def is_valid(self):
+        return len(self.errors) == 0
+
+    def __str__(self):
+        if not self.diagnostics:
+            return "no problems found"
+        return "\n".join(str(d) for d in self.diagnostics)
+
+def validate(tutorial) -> ValidationReport:
+    """
+    Checks the structure of a tutorial's step graph
+
+    Runs in O(steps + transitions) and reports:
+      - errors: missing "start" or "end" step, "end" unreachable from "start"
+      - warnings: steps unreachable from "start", dead ends (steps without
+        transitions other than "end") and steps from which "end" can't be
+        reached
+      - info: cycles (e.g. going back to a previous step)
+    """
+    report = ValidationReport()
+    steps = list(tutorial.get_steps())
+    start_step = tutorial.get_first_step()
+    end_step = tutorial.get_last_step()
+
+    if start_step is None:
+        report.add(ERROR, "missing-start", 'there is no "start" step')
+    if end_step is None:
+        report.add(ERROR, "missing-end", 'there is no "end" step')
+
+    # steps as indexes, transitions as adjacency lists
+    index = {id(step): n for n, step in enumerate(steps)}
+    successors = [[] for _ in steps]
+    predecessors = [[] for _ in steps]
+    for n, step in enumerate(steps):
+        for next_step in step.get_next_steps():
+            next_n = index.get(id(next_step))
+            if next_n is None:
+                report.add(ERROR, "unknown-step",
+                           "step '{}' has a transition to a step that is not "
+                           "part of the tutorial".format(step.name),
+                           [step.name])
+                continue
+            successors[n].append(next_n)
+            predecessors[next_n].append(n)
+
+    reachable = _reachable(successors, index.get(id(start_step)))
+    reaches_end = _reachable(predecessors, index.get(id(end_step)))
+
+    if start_step is not None and end_step is not None \
+            and not reaches_end[index[id(start_step)]]:
+        report.add(ERROR, "end-unreachable",
+                   'the "end" step can\'t be reached from the "start" step')
+
+    for n, step in enumerate(steps):
+        if step is end_step:
+            continue
+        if start_step is not None and not reachable[n]:
+            report.add(WARNING, "unreachable",
+                       "step '{}' can't be reached from the \"start\" step"
+                       .format(step.name), [step.name])
+        elif not successors[n]:
+            report.add(WARNING, "dead-end",
+                       "step '{}' has no transitions".format(step.name),
+                       [step.name])
+        elif end_step is not None and not reaches_end[n]:
+            report.add(WARNING, "cannot-reach-end",
+                       "the \"end\" step can't be reached from step '{}'"
+                       .format(step.name), [step.name])
+
+    for component in _strongly_connected_components(successors):
+        n = component[0]
+        if len(component) > 1 or n in successors[n]:
+            names = [steps[n].name for n in sorted(component)]
+            report.add(INFO, "cycle",
+                       "steps form a cycle: {}".format(", ".join(names)),
+                       names)
+
+    return report
+
+def _reachable(adjacency, origin):
+    """ Breadth-first search returning which nodes are reachable """
+    reachable = [False] * len(adjacency)
+    if origin is None:
+        return reachable
+    reachable[origin] = True
+    queue = deque([origin])
+    while queue:
+        node = queue.popleft()
+        for next_node in adjacency[node]:
+            if not reachable[next_node]:
+                reachable[next_node] = True
+                queue.append(next_node)
+    return reachable
+
+def _strongly_connected_components(adjacency):
+    """
+    Tarjan's algorithm, iterative so that long chains of steps don't hit
+    the recursion limit. Returns a list of components (lists of nodes).
+    """
+    num_nodes = len(adjacency)
+    order = [None] * num_nodes # discovery order of each node
+    lowlink = [0] * num_nodes
+    on_stack = [False] * num_nodes
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(num_nodes):
+        if order[root] is not None:
+            continue
+        work = [(root, 0)] # (node, index of next successor to visit)
+        while work:
+            node, successor_n = work[-1]
+            if successor_n == 0:
+                order[node] = lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+
+            if successor_n < len(adjacency[node]):
+                work[-1] = (node, successor_n + 1)
+                next_node = adjacency[node][successor_n]
+                if order[next_node] is None:
+                    work.append((next_node, 0))
+                elif on_stack[next_node]:
+                    lowlink[node] = min(lowlink[node], order[next_node])
+                continue
+
+            # all successors visited
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+
+    return components
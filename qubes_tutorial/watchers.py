@@ -9,6 +9,7 @@ import asyncio
 import qubesadmin.events
 import qubesadmin.tools
 
+import qubes_tutorial.analysis as analysis
 import qubes_tutorial.utils as utils
 import qubes_tutorial.interactions as interactions
 
@@ -21,10 +22,19 @@ logging.basicConfig(level=logging.DEBUG, format=log_fmt)
 class InteractionLogger:
     """Singleton class manging all watchers"""
 
-    def __init__(self, scope: list):
+    def __init__(self, scope: list,
+                 events_filter: analysis.QubesEventsFilter=None,
+                 qrexec_policies=None):
+        """
+        :param scope: qubes whose interactions are watched (None for all)
+        :param events_filter: Qubes Admin events the tutorial can
+            transition on, to only watch for those (None watches for all,
+            see analysis.TutorialIndex)
+        :param qrexec_policies: qrexec policies watched (None for all)
+        """
         self.watchers = [
-            QrexecWatcher(scope),
-            QubesAdminWatcher(scope)
+            QrexecWatcher(scope, qrexec_policies),
+            QubesAdminWatcher(scope, events_filter)
         ]
 
     def run(self):
@@ -40,16 +50,16 @@ class InteractionLogger:
     def get_interaction(self):
         """gets the next interaction """
 
-def start_interaction_logger(scope):
+def start_interaction_logger(scope, events_filter=None,
+                             qrexec_policies=None):
     global interactor
-    interactor = InteractionLogger(scope)
+    interactor = InteractionLogger(scope, events_filter, qrexec_policies)
 
     interactor_thread = threading.Thread(target=interactor.run, daemon=True)
     interactor_thread.start()
 
 def stop_interaction_logger(scope: list):
-    for vm in scope:
-        utils.disable_vm_debug(vm)
+    utils.disable_vm_debug(*scope)
 
 
 class AbstractWatcher:
@@ -73,52 +83,49 @@ class QubesAdminWatcher(AbstractWatcher):
     """
     Watcher for Qubes Admin events
     """
-    def __init__(self, scope):
-        # FIXME apply scope to interaction generation
-        self.scope = scope
+    INTERACTION_NAME = analysis.QUBES_EVENTS
+
+    def __init__(self, scope,
+                 events_filter: analysis.QubesEventsFilter=None):
+        """
+        :param scope: qubes whose events are registered (all if None)
+        :param events_filter: only the events it accepts are registered
+            (all events if None)
+        """
+        self.scope = None if scope is None else frozenset(scope)
+        self.events_filter = events_filter
         super().__init__()
 
     def get_task(self):
         logging.info("running qubes admin watcher")
         qapp = qubesadmin.Qubes()
         dispatcher = qubesadmin.events.EventsDispatcher(qapp)
-        dispatcher.add_handler('*', self.register_event)
+        self.add_handlers(dispatcher)
         events_listener = asyncio.ensure_future(dispatcher.listen_for_events())
         return events_listener
 
-    def register_event(self, subject, event_name, **kwargs):
-        interactions.register("qubes-events:{}:{}".format(subject, event_name))
-
-
-class LogWatcher(AbstractWatcher):
-    """ Reads logs from a file """
-
-    log_file_path = "/dev/null"
-    def __init__(self, log_file_path):
-        self.log_file_path = log_file_path
-        logging.info("Watching log {}".format(self.log_file_path))
-        super().__init__()
+    def add_handlers(self, dispatcher):
+        """
+        Subscribes only to the events the tutorial can transition on
+        """
+        event_names = None
+        if self.events_filter is not None:
+            event_names = self.events_filter.get_event_names()
+        if event_names is None:
+            dispatcher.add_handler('*', self.register_event)
+        else:
+            for event_name in sorted(event_names):
+                dispatcher.add_handler(event_name, self.register_event)
 
-    def run(self):
-        while not os.path.exists(self.log_file_path):
-            logging.info("Non-existant log file: {}".format(self.log_file_path))
-            logging.info("  waiting for it to be created")
-
-        with open(self.log_file_path, 'r') as f:
-            f.seek(0, os.SEEK_END) # ignore old logs (start from end)
-            while not self.terminate:
-                line = self.loop(f)
-                self.generate_interaction(line)
-
-    def loop(self, file):
-            line = ''
-            while not self.terminate and (len(line) == 0 or line[-1] != '\n'):
-                tail = file.readline()
-                if tail == '':
-                    #time.sleep(0.01)
-                    continue
-                line += tail
-            return line
+    def register_event(self, subject, event_name, **kwargs):
+        subject_name = str(subject)
+        if self.scope is not None and subject_name not in self.scope:
+            return
+        if self.events_filter is not None \
+                and not self.events_filter.accepts(subject_name, event_name):
+            return
+        interactions.register(self.INTERACTION_NAME, subject_name,
+                              event_name)
 
 
 class AbstractSysLogWatcher(AbstractWatcher):
@@ -127,58 +134,131 @@ class AbstractSysLogWatcher(AbstractWatcher):
     def __init__(self):
         super().__init__()
         self.journal = systemd.journal.Reader()
+        self.loop = None
+        self.finished = None # future set once the watcher is stopped
+        self.timeout_handle = None
 
     async def process_lines(self):
+        """
+        Processes new journal entries as soon as they are written
+
+        The journal's file descriptor is watched by the event loop, so
+        nothing blocks or sleeps while waiting for entries.
+        """
         self.journal.seek_tail()
         self.journal.get_previous()
-        while not self.terminate:
-            event = self.journal.wait(100)
-            if event == systemd.journal.APPEND:
-                for entry in self.journal:
-                    self.generate_interaction(entry['MESSAGE'])
-            await asyncio.sleep(0.1)
+        self.loop = asyncio.get_running_loop()
+        self.finished = self.loop.create_future()
+
+        journal_fd = self.journal.fileno()
+        self.loop.add_reader(journal_fd, self.on_journal_changed)
+        try:
+            # entries written before the reader was registered
+            self.on_journal_changed()
+            await self.finished
+        finally:
+            self.loop.remove_reader(journal_fd)
+            if self.timeout_handle:
+                self.timeout_handle.cancel()
+
+    def on_journal_changed(self):
+        # acknowledges the wakeup, as needed before waiting on the fd again
+        self.journal.process()
+        # drain all new entries at once (also after the journal files
+        # changed, i.e. on INVALIDATE)
+        for entry in self.journal:
+            self.generate_interaction(entry['MESSAGE'])
+        self.schedule_timeout()
+
+    def schedule_timeout(self):
+        """
+        Wakes up after the timeout the journal asks for, in case its file
+        descriptor can't reliably signal changes (see sd_journal_get_fd)
+        """
+        if self.timeout_handle:
+            self.timeout_handle.cancel()
+            self.timeout_handle = None
+        timeout_ms = self.journal.get_timeout_ms()
+        if timeout_ms >= 0:
+            self.timeout_handle = self.loop.call_later(
+                timeout_ms / 1000, self.on_journal_changed)
 
     def get_task(self):
         loop = asyncio.get_event_loop()
         return loop.create_task(self.process_lines())
 
+    def stop(self):
+        super().stop()
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._finish)
+
+    def _finish(self):
+        if not self.finished.done():
+            self.finished.set_result(None)
+
 class QrexecWatcher(AbstractSysLogWatcher):
     """ Reads Qrexec policy log from syslog """
 
-    def __init__(self, scope):
+    # every line about a qrexec call has it, so others are dropped before
+    # running the regex
+    LOG_PREFIX = "qrexec: "
+
+    # VM name regex: https://github.com/QubesOS/qubes-core-admin/blob/df6407/qubes/vm/__init__.py#L56
+    VM_NAME_RE = r"[a-zA-Z][a-zA-Z0-9_\-]*"
+    POLICY_RE = r"[\.a-zA-Z0-9_\-]+\+[\.a-zA-Z0-9_\-]*"
+    QREXEC_SUCCESS_RE = r"allowed to (?P<target>{})".format(VM_NAME_RE)
+    QREXEC_FAIL_RE = r"(?P<fail_reason>.*)"
+
+    # anchored at the prefix (see parse_line)
+    qrexec_re = re.compile(
+        r"qrexec: (?P<policy>{}): (?P<source>{}) -> [@]?{}: ({}|{})".format(
+            POLICY_RE, VM_NAME_RE, VM_NAME_RE, QREXEC_SUCCESS_RE,
+            QREXEC_FAIL_RE))
+
+    def __init__(self, scope, policies=None):
+        """
+        :param scope: qubes whose calls are registered (all if None)
+        :param policies: qrexec policies registered (all if None)
+        """
         super().__init__()
+        # the journal can only match whole field values, so lines are only
+        # filtered by unit there (MESSAGE is filtered by parse_line)
         self.journal.add_match(_SYSTEMD_UNIT="qubes-qrexec-policy-daemon.service")
-        self.scope = scope
+        self.scope = None if scope is None else frozenset(scope)
+        self.policies = None if policies is None else frozenset(policies)
 
-        # VM name regex: https://github.com/QubesOS/qubes-core-admin/blob/df6407/qubes/vm/__init__.py#L56
-        vm_name_re = "[a-zA-Z][a-zA-Z0-9_\-]*"
-        policy_re = "[\\.a-zA-Z0-9_\-]+\+[\\.a-zA-Z0-9_\-]*"
-        qrexec_success_re = "allowed to (?P<target>{})".format(vm_name_re)
-        qrexec_fail_re = "(?P<fail_reason>.*)"
+    @classmethod
+    def parse_line(cls, line):
+        """
+        Returns the regex match of a qrexec call log line (None for others)
 
-        self.qrexec_re = re.compile("qrexec: (?P<policy>{}): (?P<source>{}) -> [@]?{}: ({}|{})"\
-            .format(policy_re, vm_name_re, vm_name_re, qrexec_success_re, qrexec_fail_re))
+        :param line: MESSAGE field of a journal entry of the policy daemon
+        """
+        if not line.startswith(cls.LOG_PREFIX):
+            return None
+        return cls.qrexec_re.match(line)
 
     def generate_interaction(self, line):
-        logging.info(line)
-        try:
-            action = self.qrexec_re.search(line)
-            untrusted_policy = action.group("policy")
-            untrusted_source = action.group("source")
-            untrusted_target = action.group("target")
-            fail_reason = action.group("fail_reason")
-        except:
-            # ignore if pattern not matched
+        action = self.parse_line(line)
+        if action is None:
             return
 
         # FIXME sanitize untrusted args (if needed)
+        untrusted_source = action.group("source")
+
+        if self.policies is not None \
+                and action.group("policy") not in self.policies:
+            return
 
-        if untrusted_source in self.scope: # only consider in scope actions initiated by vm in scope
-            if fail_reason:
+        if self.scope is None or untrusted_source in self.scope: # only consider in scope actions initiated by vm in scope
+            logging.debug(line)
+            if action.group("fail_reason"):
                 # FIXME the target may be None. Instead replace by the intended target
                 #yield QrexecPolicyInteraction(False, policy, untrusted_source, target)
                 # TODO generate interaction when policy is denied
                 pass
             else:
-                #yield QrexecPolicyInteraction(True, policy, untrusted_source, target)
-                interactions.register("qubes-qrexec-{}".format(untrusted_policy), untrusted_source, untrusted_target)
+                interactions.register_interaction(
+                    interactions.QrexecPolicyInteraction(
+                        True, action.group("policy"), untrusted_source,
+                        action.group("target")))